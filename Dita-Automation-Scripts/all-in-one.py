@@ -2,59 +2,68 @@ encoding = 'utf-8'
 from lxml import etree
 import json
 import os
-import shutil
-import re
-
-PLATFORM_FILES = {
-    "android": "RTC_NG_API_Android.ditamap",
-    "ios": "RTC_NG_API_iOS.ditamap",
-    "windows": "RTC_NG_API_CPP.ditamap",
-    "macos": "RTC_NG_API_macOS.ditamap",
-    "flutter": "RTC_NG_API_Flutter.ditamap",
-    "unity": "RTC_NG_API_Unity.ditamap",
-    "electron": "RTC_NG_API_Electron.ditamap",
-    "rn": "RTC_NG_API_RN.ditamap",
-    "unreal": "RTC_NG_API_Unreal.ditamap",
-    "cs": "RTC_NG_API_CS.ditamap"
-}
-
-PLATFORM_TO_KEYSMAP = {
-    "android": "java",
-    "windows": "cpp",
-    "ios": "ios",
-    "macos": "macos",
-    "unity": "unity",
-    "unreal": "unreal",
-    "cs": "cs",
-    "electron": "electron",
-    "flutter": "flutter",
-    "rn": "rn"
-}
+from topictemplates import (new_from_template, forget_templates, compile_template, Raw, REMOVE, SlotValues,
+                            TemplateNotSupported)
+import io
+import argparse
+import contextlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from workspace import DitaWorkspace
+from ordering import insert_sorted
+from topicpatch import TopicPatch
+from instrument import recorder
+from changefeed import ChangeFeed, ChangeSet
+from platforms import PLATFORMS, PLATFORM_CONFIGS, keysmap_name, platform_mask
+from manifest import RunManifest, MANIFEST_NAME
+from keyindex import KeyIndex, KEY_INDEX_NAME
+from watcher import make_watcher
 
 # 获取基础目录路径
 base_dir = 'E:/AgoraTWrepo/python-script/Dita-Automation-Scripts/dita'
 
-# 读取 JSON 数据
-with open('data.json', 'r', encoding='utf-8') as file:
-    json_data = json.load(file)
+# 变更数据：map 阶段用到的字段保存在内存中，新建和修改 topic 时从文件流式读取完整记录
+json_data = ChangeSet(())
 
-def create_dita_file(template_path, new_file_path):
-    """创建新的 dita 文件"""
+# 新建 topic 时优先使用预编译的字符串模板，--tree-render 时关闭
+fast_render = True
+
+# 增量运行时需要按修改后的记录重新生成的 topic（绝对路径），这些文件已存在也不跳过
+regenerate_topics = set()
+
+def topic_exists(path, workspace):
+    """新建 topic 前检查文件是否已存在；需要重新生成的 topic 视为不存在"""
+    return workspace.exists(path) and os.path.normpath(path) not in regenerate_topics
+
+def create_dita_file(template_path, new_file_path, workspace):
+    """从缓存的模板创建新 dita 文件的内存树，文件已存在时返回 None"""
     # 检查文件是否已存在
-    if os.path.exists(new_file_path):
+    if topic_exists(new_file_path, workspace):
         print(f"警告：文件已存在，跳过创建：{new_file_path}")
-        return False
+        return None
 
     try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        with open(new_file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-            print(f"成功创建文件：{new_file_path}")
-        return True
+        return new_from_template(template_path)
     except Exception as e:
         print(f"创建文件时出错：{str(e)}")
-        return False
+        return None
+
+def write_dita_file(tree, new_file_path, workspace):
+    """将填充好的 dita 文件一次性写入磁盘"""
+    save_dita_file(etree.tostring(tree, encoding='UTF-8', xml_declaration=True, pretty_print=True),
+                   new_file_path, workspace)
+
+def save_dita_file(data, new_file_path, workspace):
+    """将已序列化的 dita 文件交给 workspace 写入"""
+    # 每个 topic 只重新生成一次，之后的同名记录与已存在的文件一样跳过
+    regenerated = os.path.normpath(new_file_path) in regenerate_topics
+    regenerate_topics.discard(os.path.normpath(new_file_path))
+    workspace.save(new_file_path, data)
+    action = '重新生成' if regenerated else '创建'
+    if workspace.dry_run:
+        print(f"dry-run：将{action}文件：{new_file_path}")
+    else:
+        print(f"成功{action}文件：{new_file_path}")
 
 def get_platform_prop(platform, platform_configs):
     """根据平台获取对应的 platform3 值"""
@@ -63,113 +72,147 @@ def get_platform_prop(platform, platform_configs):
             return config['platform3']
     return platform
 
-def update_parameters_section(parameters_section, params_data, platform, platform_configs):
-    """更新参数部分"""
-    if not params_data or platform not in params_data:
+# 参数部分中反复使用的查找，预先编译
+find_plentries = etree.XPath('plentry')
+find_pts = etree.XPath('pt')
+find_pds = etree.XPath('pd')
+find_all_pts = etree.XPath('.//pt')
+
+def is_empty_plentry(plentry):
+    """模板中的空 plentry：缺少 pt 或 pd，或者 pt 和 pd 都没有文本内容"""
+    pts = find_pts(plentry)
+    pds = find_pds(plentry)
+    if not pts or not pds:
+        return True
+    return all(not pt.text for pt in pts) and all(not pd.text for pd in pds)
+
+def indent_plentry(plentry):
+    """为 plentry 及其子元素设置统一的缩进"""
+    plentry.tail = '\n            '
+    for elem in plentry:
+        elem.tail = '\n                '
+    # 最后一个元素的 tail 需要调整缩进级别
+    if len(plentry) > 0:
+        plentry[-1].tail = '\n            '
+
+def update_parameters_section(parameters_section, params_data, platform_configs):
+    """依次将各平台的参数合并到参数部分
+
+    parml 中已有的 plentry 只在处理第一个平台时清理、整理缩进并按参数名建立索引，
+    之后的平台直接按参数名查找，只重新整理上一个平台修改过的 plentry。
+    """
+    if not params_data:
         return
 
-    platform_prop = get_platform_prop(platform, platform_configs)
+    parml = None
     existing_params = {}
+    touched = []
 
-    # 找到 parml 元素
-    parml = parameters_section.find('parml')
-    if parml is None:
-        parml = etree.SubElement(parameters_section, 'parml')
-    else:
-        # 清除模板中的空 plentry
-        for empty_plentry in parml.findall('plentry'):
-            if not empty_plentry.findall('pt') or not empty_plentry.findall('pd'):
-                parml.remove(empty_plentry)
-            else:
-                # 检查 pt 和 pd 是否为空（没有文本内容）
-                pts = empty_plentry.findall('pt')
-                pds = empty_plentry.findall('pd')
-                if all(not pt.text for pt in pts) and all(not pd.text for pd in pds):
-                    parml.remove(empty_plentry)
-
-    # 添加换行和缩进
-    parml.text = '\n            '  # parml 后的首次换行
-
-    # 收集现有参数信息
-    for plentry in parml.findall('plentry'):
-        pts = plentry.findall('pt')
-        for pt in pts:
-            name = pt.text
-            if name:  # 只处理非空参数名
-                existing_params[name] = plentry
-
-        # 为现有的 plentry 添加合适的缩进
-        plentry.tail = '\n            '
-        for elem in plentry:
-            elem.tail = '\n                '
-        # 最后一个元素的 tail 需要调整缩进级别
-        if len(plentry) > 0:
-            plentry[-1].tail = '\n            '
+    for platform in params_data:
+        platform_prop = get_platform_prop(platform, platform_configs)
 
-    # 处理新参数
-    for param in params_data[platform]:
-        if param['change_type'] != 'create':
-            continue
+        if parml is None:
+            # 找到 parml 元素
+            parml = parameters_section.find('parml')
+            if parml is None:
+                parml = etree.SubElement(parameters_section, 'parml')
+            else:
+                # 清除模板中的空 plentry
+                for empty_plentry in find_plentries(parml):
+                    if is_empty_plentry(empty_plentry):
+                        parml.remove(empty_plentry)
 
-        param_name = param['name']
-        param_desc = param['desc']
-
-        if param_name in existing_params:
-            # 更新现有参数
-            plentry = existing_params[param_name]
-            pt_found = False
-            pd_found = False
-
-            for pt in plentry.findall('pt'):
-                if pt.text == param_name:
-                    props = pt.get('props', '').split()
-                    if platform_prop not in props:
-                        props.append(platform_prop)
-                        pt.set('props', ' '.join(props))
-                    pt_found = True
-
-            for pd in plentry.findall('pd'):
-                if pd.text == param_desc:
-                    props = pd.get('props', '').split()
-                    if platform_prop not in props:
-                        props.append(platform_prop)
-                        pd.set('props', ' '.join(props))
-                    pd_found = True
-
-            if not pt_found:
-                new_pt = etree.SubElement(plentry, 'pt')
-                new_pt.text = param_name
-                new_pt.set('props', platform_prop)
-                new_pt.tail = '\n                '
-
-            if not pd_found:
-                new_pd = etree.SubElement(plentry, 'pd')
-                new_pd.text = param_desc
-                new_pd.set('props', platform_prop)
-                new_pd.tail = '\n            '
+            # 收集现有参数信息，并为现有的 plentry 添加合适的缩进
+            for plentry in find_plentries(parml):
+                for pt in find_pts(plentry):
+                    name = pt.text
+                    if name:  # 只处理非空参数名
+                        existing_params[name] = plentry
+                indent_plentry(plentry)
         else:
-            # 创建新参数
-            plentry = etree.SubElement(parml, 'plentry')
-            plentry.text = '\n                '
-            plentry.tail = '\n            '
+            # 上一个平台修改过的 plentry 重新清理和整理缩进，其余 plentry 不变
+            for plentry in touched:
+                if plentry.getparent() is not parml:
+                    continue
+                if is_empty_plentry(plentry):
+                    parml.remove(plentry)
+                else:
+                    indent_plentry(plentry)
+            # 索引中只保留非空参数名
+            existing_params.pop('', None)
+            existing_params.pop(None, None)
+        touched = []
+
+        # 添加换行和缩进
+        parml.text = '\n            '  # parml 后的首次换行
+
+        # 处理新参数
+        for param in params_data[platform]:
+            if param['change_type'] != 'create':
+                continue
 
-            pt = etree.SubElement(plentry, 'pt')
-            pt.text = param_name
-            pt.set('props', platform_prop)
-            pt.tail = '\n                '
+            param_name = param['name']
+            param_desc = param['desc']
+
+            if param_name in existing_params:
+                # 更新现有参数
+                plentry = existing_params[param_name]
+                pt_found = False
+                pd_found = False
+
+                for pt in find_pts(plentry):
+                    if pt.text == param_name:
+                        props = pt.get('props', '').split()
+                        if platform_prop not in props:
+                            props.append(platform_prop)
+                            pt.set('props', ' '.join(props))
+                        pt_found = True
+
+                for pd in find_pds(plentry):
+                    if pd.text == param_desc:
+                        props = pd.get('props', '').split()
+                        if platform_prop not in props:
+                            props.append(platform_prop)
+                            pd.set('props', ' '.join(props))
+                        pd_found = True
+
+                if not pt_found:
+                    new_pt = etree.SubElement(plentry, 'pt')
+                    new_pt.text = param_name
+                    new_pt.set('props', platform_prop)
+                    new_pt.tail = '\n                '
+
+                if not pd_found:
+                    new_pd = etree.SubElement(plentry, 'pd')
+                    new_pd.text = param_desc
+                    new_pd.set('props', platform_prop)
+                    new_pd.tail = '\n            '
+            else:
+                # 创建新参数
+                plentry = etree.SubElement(parml, 'plentry')
+                plentry.text = '\n                '
+                plentry.tail = '\n            '
 
-            pd = etree.SubElement(plentry, 'pd')
-            pd.text = param_desc
-            pd.set('props', platform_prop)
-            pd.tail = '\n            '
+                pt = etree.SubElement(plentry, 'pt')
+                pt.text = param_name
+                pt.set('props', platform_prop)
+                pt.tail = '\n                '
 
-            existing_params[param_name] = plentry
+                pd = etree.SubElement(plentry, 'pd')
+                pd.text = param_desc
+                pd.set('props', platform_prop)
+                pd.tail = '\n            '
 
-    # 调整最后一个 plentry 的缩进
-    if len(parml) > 0:
-        parml[-1].tail = '\n        '
+                existing_params[param_name] = plentry
+            touched.append(plentry)
 
-def process_api_change(change_item, templates, platform_configs, new_file_path):
+        # 调整最后一个 plentry 的缩进
+        if len(parml) > 0:
+            parml[-1].tail = '\n        '
+            if parml[-1].tag == 'plentry':
+                touched.append(parml[-1])
+
+def process_api_change(change_item, templates, platform_configs, new_file_path, workspace):
     """处理单个 API 变更"""
     if change_item['change_type'] != 'create':
         return
@@ -182,12 +225,17 @@ def process_api_change(change_item, templates, platform_configs, new_file_path):
     file_name = f"{prefix}_{change_item['parentclass']}_{change_item['key']}.dita".lower()
     full_file_path = os.path.join(new_file_path, file_name)
 
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(template_path, full_file_path):
+    # 优先用预编译的字符串模板直接生成
+    if render_new_topic(render_api_topic, template_path, change_item, file_name, platform_configs,
+                        full_file_path, workspace):
         return
 
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(template_path, full_file_path, workspace)
+    if tree is None:
+        return
+
+    # 在内存中更新文件
     root = tree.getroot()
 
     # 更新各个字段，添加错误检查
@@ -303,8 +351,7 @@ def process_api_change(change_item, templates, platform_configs, new_file_path):
     if 'parameters' in desc:
         parameters_section = root.find('.//section[@id="parameters"]')
         if parameters_section is not None:
-            for platform in desc['parameters'].keys():
-                update_parameters_section(parameters_section, desc['parameters'], platform, platform_configs)
+            update_parameters_section(parameters_section, desc['parameters'], platform_configs)
 
     # 获取描述相关字段
     desc = change_item.get('description', {})
@@ -349,9 +396,75 @@ def process_api_change(change_item, templates, platform_configs, new_file_path):
             restriction_section.text = restriction_content
 
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path, workspace)
+
+def fill_enumerations(parml, enumerations, platform_configs):
+    """清除 parml 中模板的空 plentry，按 alias 为各平台的新建枚举值创建 plentry"""
+    # 清除模板中的空 plentry
+    for empty_plentry in find_plentries(parml):
+        if is_empty_plentry(empty_plentry):
+            parml.remove(empty_plentry)
 
-def process_enum_change(change_item, templates, platform_configs, new_file_path):
+    # 添加换行和缩进
+    parml.text = '\n            '
+
+    # 按 alias 组织枚举值
+    enum_groups = {}
+    for platform, enums in enumerations.items():
+        platform_prop = get_platform_prop(platform, platform_configs)
+        for enum in enums:
+            if enum['change_type'] != 'create':
+                continue
+
+            alias = enum['alias']
+            if alias not in enum_groups:
+                enum_groups[alias] = {}
+
+            if platform not in enum_groups[alias]:
+                enum_groups[alias][platform] = {
+                    'value': enum['value'],
+                    'desc': enum['desc'],
+                    'platform_prop': platform_prop
+                }
+
+    # 创建枚举值条目
+    for alias, platforms in enum_groups.items():
+        plentry = etree.SubElement(parml, 'plentry')
+        plentry.text = '\n                '
+        plentry.tail = '\n            '
+
+        # 收集所有平台的值和描述
+        values = {}
+        descs = {}
+        platform_props = set()
+
+        for platform, info in platforms.items():
+            values[info['value']] = info['platform_prop']
+            descs[info['desc']] = info['platform_prop']
+            platform_props.add(info['platform_prop'])
+
+        # 先创建所有的 pt 元素
+        for value, prop in values.items():
+            pt = etree.SubElement(plentry, 'pt')
+            pt.text = value
+            pt.set('props', prop)
+            pt.tail = '\n                '
+
+        # 再创建 pd 元素
+        for desc in set(info['desc'] for info in platforms.values()):
+            pd = etree.SubElement(plentry, 'pd')
+            pd.text = desc
+            pd.set('props', ' '.join(platform_props))
+            pd.tail = '\n            '
+
+        # 调整最后一个元素的缩进
+        if len(plentry) > 0:
+            plentry[-1].tail = '\n            '
+
+    # 调整 parml 的缩进
+    parml.tail = '\n        '
+
+def process_enum_change(change_item, templates, platform_configs, new_file_path, workspace):
     """处理单个枚举变更"""
     if change_item['change_type'] != 'create':
         return
@@ -361,12 +474,17 @@ def process_enum_change(change_item, templates, platform_configs, new_file_path)
     file_name = f"enum_{enum_key}.dita"
     full_file_path = os.path.join(new_file_path, file_name)
 
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(templates['enum'], full_file_path):
+    # 优先用预编译的字符串模板直接生成
+    if render_new_topic(render_enum_topic, templates['enum'], change_item, file_name, platform_configs,
+                        full_file_path, workspace):
         return
 
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(templates['enum'], full_file_path, workspace)
+    if tree is None:
+        return
+
+    # 在内存中更新文件
     root = tree.getroot()
 
     # 更新各个字段，添加错误检查
@@ -421,79 +539,12 @@ def process_enum_change(change_item, templates, platform_configs, new_file_path)
             if parml is None:
                 parml = etree.SubElement(enums_section, 'parml')
 
-            # 清除模板中的空 plentry
-            for empty_plentry in parml.findall('plentry'):
-                if not empty_plentry.findall('pt') or not empty_plentry.findall('pd'):
-                    parml.remove(empty_plentry)
-                else:
-                    pts = empty_plentry.findall('pt')
-                    pds = empty_plentry.findall('pd')
-                    if all(not pt.text for pt in pts) and all(not pd.text for pd in pds):
-                        parml.remove(empty_plentry)
-
-            # 添加换行和缩进
-            parml.text = '\n            '
-
-            # 按 alias 组织枚举值
-            enum_groups = {}
-            for platform, enums in change_item['description']['enumerations'].items():
-                platform_prop = get_platform_prop(platform, platform_configs)
-                for enum in enums:
-                    if enum['change_type'] != 'create':
-                        continue
-
-                    alias = enum['alias']
-                    if alias not in enum_groups:
-                        enum_groups[alias] = {}
-
-                    if platform not in enum_groups[alias]:
-                        enum_groups[alias][platform] = {
-                            'value': enum['value'],
-                            'desc': enum['desc'],
-                            'platform_prop': platform_prop
-                        }
-
-            # 创建枚举值条目
-            for alias, platforms in enum_groups.items():
-                plentry = etree.SubElement(parml, 'plentry')
-                plentry.text = '\n                '
-                plentry.tail = '\n            '
-
-                # 收集所有平台的值和描述
-                values = {}
-                descs = {}
-                platform_props = set()
-
-                for platform, info in platforms.items():
-                    values[info['value']] = info['platform_prop']
-                    descs[info['desc']] = info['platform_prop']
-                    platform_props.add(info['platform_prop'])
-
-                # 先创建所有的 pt 元素
-                for value, prop in values.items():
-                    pt = etree.SubElement(plentry, 'pt')
-                    pt.text = value
-                    pt.set('props', prop)
-                    pt.tail = '\n                '
-
-                # 再创建 pd 元素
-                for desc in set(info['desc'] for info in platforms.values()):
-                    pd = etree.SubElement(plentry, 'pd')
-                    pd.text = desc
-                    pd.set('props', ' '.join(platform_props))
-                    pd.tail = '\n            '
-
-                # 调整最后一个元素的缩进
-                if len(plentry) > 0:
-                    plentry[-1].tail = '\n            '
-
-            # 调整 parml 的缩进
-            parml.tail = '\n        '
+            fill_enumerations(parml, change_item['description']['enumerations'], platform_configs)
 
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path, workspace)
 
-def process_class_change(change_item, templates, platform_configs, new_file_path):
+def process_class_change(change_item, templates, platform_configs, new_file_path, workspace):
     """处理单个类变更"""
     if change_item['change_type'] != 'create':
         return
@@ -503,12 +554,17 @@ def process_class_change(change_item, templates, platform_configs, new_file_path
     file_name = f"class_{class_key}.dita"
     full_file_path = os.path.join(new_file_path, file_name)
 
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(templates['class'], full_file_path):
+    # 优先用预编译的字符串模板直接生成
+    if render_new_topic(render_class_topic, templates['class'], change_item, file_name, platform_configs,
+                        full_file_path, workspace):
         return
 
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(templates['class'], full_file_path, workspace)
+    if tree is None:
+        return
+
+    # 在内存中更新文件
     root = tree.getroot()
 
     # 更新各个字段
@@ -564,53 +620,230 @@ def process_class_change(change_item, templates, platform_configs, new_file_path
     if 'parameters' in change_item.get('description', {}):
         parameters_section = root.find('.//section[@id="parameters"]')
         if parameters_section is not None:
-            for platform in change_item['description']['parameters']:
-                update_parameters_section(parameters_section,
-                                       change_item['description']['parameters'],
-                                       platform,
-                                       platform_configs)
+            update_parameters_section(parameters_section, change_item['description']['parameters'], platform_configs)
 
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path, workspace)
 
-def create_dita_files(json_file_path, templates, platform_configs, new_file_path):
-    """创建 DITA 文件的主函数"""
-    print(f"尝试读取文件：{json_file_path}")
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            print(f"成功读取 JSON 文件")
-            changes = json.loads(content)
-
-            # 检查变更数据
-            print("\n变更数据统计：")
-            print(f"API 变更数量: {len(changes.get('api_changes', []))}")
-            print(f"枚举变更数量: {len(changes.get('enum_changes', []))}")
-            print(f"类变更数量: {len(changes.get('struct_changes', []))}")
-
-            # 检查是否有 create 类型的变更
-            create_apis = [c for c in changes.get('api_changes', []) if c.get('change_type') == 'create']
-            create_enums = [c for c in changes.get('enum_changes', []) if c.get('change_type') == 'create']
-            create_structs = [c for c in changes.get('struct_changes', []) if c.get('change_type') == 'create']
-
-            print("\n新建类型的变更数量：")
-            print(f"新建 API 数量: {len(create_apis)}")
-            print(f"新建枚举数量: {len(create_enums)}")
-            print(f"新建类数量: {len(create_structs)}")
-
-    except FileNotFoundError:
-        print(f"错误：找不到文件 {json_file_path}")
-        return
-    except json.JSONDecodeError as e:
-        print(f"错误：JSON 文件格式不正确: {str(e)}")
-        print(f"错误位置附近的内容：{content[max(0, e.pos-50):e.pos+50]}")
+def topic_template_slots(root):
+    """Method、Callback、Enum、Class 模板中由字符串模板填写的位置
+
+    返回 CompiledTemplate 所需的 (attributes, elements)；模板结构与 process_*_change 的
+    处理方式对应不上时（如 section id 重复、要填写的元素带有子元素）返回 None。
+    """
+    if root.tag != 'reference':
+        return None
+    title_ph = root.find('.//ph[@keyref]')
+    shortdesc_ph = root.find('.//shortdesc/ph')
+    if title_ph is None or shortdesc_ph is None:
+        return None
+
+    attributes = {'id': (root, 'id'), 'title': (title_ph, 'keyref')}
+    elements = {'shortdesc': shortdesc_ph}
+    indexterm = root.find('.//indexterm')
+    if indexterm is not None:
+        attributes['indexterm'] = (indexterm, 'keyref')
+
+    for section in root.iter('section'):
+        section_id = section.get('id')
+        if section_id is None:
+            continue
+        if f'section:{section_id}' in elements:
+            return None
+        elements[f'section:{section_id}'] = section
+        if section_id in ('detailed_desc', 'scenario', 'timing', 'restriction', 'related'):
+            p = section.find('p')
+            if p is not None:
+                elements[f'p:{section_id}'] = p
+
+    detailed_desc_section = elements.get('section:detailed_desc')
+    if detailed_desc_section is not None:
+        dd = detailed_desc_section.find('.//dlentry/dd')
+        if dd is not None:
+            elements['dd'] = dd
+
+    prototype_section = elements.get('section:prototype')
+    if prototype_section is not None:
+        for codeblock in prototype_section.iter('codeblock'):
+            # 与 find 一致，相同 props 取第一个
+            if codeblock.get('props') is not None:
+                elements.setdefault(f"codeblock:{codeblock.get('props')}", codeblock)
+
+    parameters_section = elements.get('section:parameters')
+    if parameters_section is not None:
+        parml = parameters_section.find('parml')
+        # 模板中的 plentry 必须全部是会被清除的空 plentry
+        if parml is None or not all(child.tag == 'plentry' and is_empty_plentry(child) for child in parml):
+            return None
+        elements['parml'] = parml
+
+    # 填写文本的元素不能带有子元素（shortdesc 中的 oxy-placeholder 会被删除）
+    for name, element in elements.items():
+        if not name.startswith('section:') and name not in ('shortdesc', 'parml') and len(element):
+            return None
+    return attributes, elements
+
+def render_parameters(params_data, platform_configs):
+    """在空 parml 上执行 update_parameters_section，返回 parml 的内容"""
+    parml = etree.SubElement(etree.Element('section'), 'parml')
+    update_parameters_section(parml.getparent(), params_data, platform_configs)
+    return Raw(etree.tostring(parml, encoding='unicode', with_tail=False)[len('<parml>'):-len('</parml>')])
+
+def render_detailed_desc(compiled, desc, values):
+    """与 process_*_change 中更新 detailed_desc 部分的处理一致"""
+    if 'section:detailed_desc' not in compiled:
         return
+    if 'detailed_desc' in desc and isinstance(desc['detailed_desc'], list) and desc['detailed_desc']:
+        if 'dd' in compiled and 'since' in desc['detailed_desc'][0]:
+            values['dd'] = f"v{desc['detailed_desc'][0]['since']}"
+        if 'p:detailed_desc' in compiled and 'desc' in desc['detailed_desc'][0]:
+            values['p:detailed_desc'] = desc['detailed_desc'][0]['desc']
+
+def render_header(change_item, file_name, values, messages):
+    """id、title、shortdesc"""
+    values['id'] = file_name[:-5]
+    values['title'] = change_item['key']
+    values['shortdesc'] = change_item['description']['shortdesc']
+    messages.append("成功更新 shortdesc")
+
+def render_api_topic(compiled, change_item, file_name, platform_configs, messages):
+    """按 process_api_change 的处理顺序计算各插槽的值并生成 topic"""
+    values = SlotValues()
+    render_header(change_item, file_name, values, messages)
+
+    if 'section:prototype' in compiled and 'api_signature' in change_item:
+        for platform, signature in change_item['api_signature'].items():
+            platform_prop = get_platform_prop(platform, platform_configs)
+            if platform == 'windows':
+                props = 'cpp unreal'
+            elif platform in ('macos', 'ios'):
+                props = 'ios mac'
+            else:
+                props = platform_prop
+            if '"' in props:
+                raise ValueError(f"无法按 props 查找 codeblock：{props}")
+            if f'codeblock:{props}' in compiled:
+                values[f'codeblock:{props}'] = signature
+            else:
+                messages.append(f"警告：找不到 {platform} 平台的 codeblock")
+
+    desc = change_item.get('description', {})
+    render_detailed_desc(compiled, desc, values)
+    if 'p:restriction' in compiled and 'restrictions' in desc:
+        values['p:restriction'] = desc['restrictions']
+    if 'p:related' in compiled and 'related' in desc:
+        values['p:related'] = desc['related']
+
+    if 'indexterm' not in compiled:
+        raise ValueError("模板中没有 indexterm")
+    values['indexterm'] = change_item['key']
+
+    desc = change_item['description']
+    if 'dd' in compiled and 'since' in desc:
+        values['dd'] = f"v{desc['since']}"
+    if 'detailed_desc' in desc and 'desc' in desc['detailed_desc'] and 'p:detailed_desc' in compiled:
+        values['p:detailed_desc'] = desc['detailed_desc']['desc']
+    for json_field, section_id in [('scenarios', 'scenario'), ('timing', 'timing'),
+                                   ('restriction', 'restriction'), ('related', 'related')]:
+        if json_field in desc and f'p:{section_id}' in compiled:
+            values[f'p:{section_id}'] = desc[json_field]
+    if 'parameters' in desc and 'section:parameters' in compiled and desc['parameters']:
+        values['parml'] = render_parameters(desc['parameters'], platform_configs)
+
+    desc = change_item.get('description', {})
+    sections_to_check = {
+        'scenario': desc.get('scenarios', ''),
+        'related': desc.get('related', ''),
+        'parameters': desc.get('parameters', {})
+    }
+    for section_id, content in sections_to_check.items():
+        if f'section:{section_id}' not in compiled:
+            continue
+        if not content:
+            values[f'section:{section_id}'] = REMOVE
+            messages.append(f"已删除空的 {section_id} section")
+        elif section_id == 'parameters' and not any(content.values()):
+            values[f'section:{section_id}'] = REMOVE
+            messages.append("已删除空的 parameters section")
+
+    if 'p:timing' in compiled:
+        values['p:timing'] = desc.get('timing', '') or "加入频道前后均可调用。"
+        if not desc.get('timing', ''):
+            messages.append("已设置默认的 timing 内容")
+    if 'p:restriction' in compiled:
+        values['p:restriction'] = desc.get('restrictions', '') or "无。"
+        if not desc.get('restrictions', ''):
+            messages.append("已设置默认的 restriction 内容")
+
+    return compiled.render(values)
+
+def render_enum_topic(compiled, change_item, file_name, platform_configs, messages):
+    """按 process_enum_change 的处理顺序计算各插槽的值并生成 topic"""
+    values = SlotValues()
+    render_header(change_item, file_name, values, messages)
+    render_detailed_desc(compiled, change_item.get('description', {}), values)
+
+    if 'enumerations' in change_item['description'] and 'section:parameters' in compiled:
+        parml = etree.SubElement(etree.Element('section'), 'parml')
+        fill_enumerations(parml, change_item['description']['enumerations'], platform_configs)
+        values['parml'] = Raw(etree.tostring(parml, encoding='unicode', with_tail=False)[len('<parml>'):-len('</parml>')],
+                              parml.tail)
+
+    return compiled.render(values)
+
+def render_class_topic(compiled, change_item, file_name, platform_configs, messages):
+    """按 process_class_change 的处理顺序计算各插槽的值并生成 topic"""
+    values = SlotValues()
+    render_header(change_item, file_name, values, messages)
+    render_detailed_desc(compiled, change_item.get('description', {}), values)
+
+    for section_id in ['sub-class', 'sub-method']:
+        if f'section:{section_id}' in compiled:
+            values[f'section:{section_id}'] = REMOVE
+
+    params_data = change_item.get('description', {}).get('parameters')
+    if params_data and 'section:parameters' in compiled:
+        values['parml'] = render_parameters(params_data, platform_configs)
+
+    return compiled.render(values)
+
+def render_new_topic(render, template_path, change_item, file_name, platform_configs, full_file_path, workspace):
+    """用预编译的字符串模板直接生成新 topic，成功时返回 True
+
+    模板结构无法预编译、预编译结果与模板树不一致，或本次取值无法用字符串模板生成时
+    （compile_template 返回 None，或抛出 TemplateNotSupported）直接返回 False；
+    生成过程中出现其他错误（多为原处理方式同样会出错的记录）时输出错误原因后返回 False。
+    两种情况都由调用方按原有的方式处理，生成的文件与原来一致。
+    """
+    if not fast_render or topic_exists(full_file_path, workspace):
+        return False
+    messages = []
+    try:
+        compiled = compile_template(template_path, topic_template_slots)
+        if compiled is None:
+            return False
+        data = render(compiled, change_item, file_name, platform_configs, messages)
+    except TemplateNotSupported:
+        return False
     except Exception as e:
-        print(f"发生未预期的错误：{str(e)}")
+        # 多数是变更记录不完整，原处理方式会给出同样的错误；输出原因，字符串模板本身的问题不会被掩盖
+        print(f"无法用预编译模板生成 {file_name}，改用原有方式：{type(e).__name__}: {str(e)}")
+        return False
+
+    for message in messages:
+        print(message)
+    save_dita_file(data, full_file_path, workspace)
+    return True
+
+def create_dita_files(json_file_path, templates, platform_configs, new_file_path, workspace):
+    """创建 DITA 文件的主函数，逐条读取变更数据并立即处理"""
+    print(f"尝试读取文件：{json_file_path}")
+    if not os.path.exists(json_file_path):
+        print(f"错误：找不到文件 {json_file_path}")
         return
 
     # 检查输出目录
-    if not os.path.exists(new_file_path):
+    if not os.path.exists(new_file_path) and not workspace.dry_run:
         print("输出目录不存在，尝试创建...")
         try:
             os.makedirs(new_file_path)
@@ -619,42 +852,207 @@ def create_dita_files(json_file_path, templates, platform_configs, new_file_path
             print(f"创建输出目录失败：{str(e)}")
             return
 
-    # 处理变更
-    if create_apis:
-        print("\n开始处理 API 变更...")
-        for change in create_apis:
-            try:
-                process_api_change(change, templates, platform_configs, new_file_path)
-            except Exception as e:
-                print(f"处理 API {change.get('key', '未知')} 时出错：{str(e)}")
+    # (变更类型, 开始提示, 出错提示, 处理函数)
+    handlers = [
+        ('api_changes', "\n开始处理 API 变更...", "处理 API", process_api_change),
+        ('enum_changes', "\n开始处理枚举变更...", "处理枚举", process_enum_change),
+        ('struct_changes', "\n开始处理类变更...", "处理类", process_class_change),
+    ]
+    total_counts = {}
+    create_counts = {}
 
-    if create_enums:
-        print("\n开始处理枚举变更...")
-        for change in create_enums:
-            try:
-                process_enum_change(change, templates, platform_configs, new_file_path)
-            except Exception as e:
-                print(f"处理枚举 {change.get('key', '未知')} 时出错：{str(e)}")
+    # 处理变更，增量运行时 json_data 只包含需要处理的记录
+    try:
+        for change_type, start_message, error_prefix, handler in handlers:
+            total_counts[change_type] = 0
+            create_counts[change_type] = 0
+            for change in json_data.get(change_type):
+                total_counts[change_type] += 1
+                # 只处理 create 类型的变更
+                if change.get('change_type') != 'create':
+                    continue
+                if create_counts[change_type] == 0:
+                    print(start_message)
+                create_counts[change_type] += 1
+                try:
+                    with recorder.file(change.get('key', '未知')):
+                        handler(change, templates, platform_configs, new_file_path, workspace)
+                except Exception as e:
+                    print(f"{error_prefix} {change.get('key', '未知')} 时出错：{str(e)}")
+    except json.JSONDecodeError as e:
+        print(f"错误：JSON 文件格式不正确: {str(e)}")
+        return
+    except Exception as e:
+        print(f"发生未预期的错误：{str(e)}")
+        return
 
-    if create_structs:
-        print("\n开始处理类变更...")
-        for change in create_structs:
-            try:
-                process_class_change(change, templates, platform_configs, new_file_path)
-            except Exception as e:
-                print(f"处理类 {change.get('key', '未知')} 时出错：{str(e)}")
+    # 变更数据统计
+    print("\n变更数据统计：")
+    print(f"API 变更数量: {total_counts['api_changes']}")
+    print(f"枚举变更数量: {total_counts['enum_changes']}")
+    print(f"类变更数量: {total_counts['struct_changes']}")
+
+    print("\n新建类型的变更数量：")
+    print(f"新建 API 数量: {create_counts['api_changes']}")
+    print(f"新建枚举数量: {create_counts['enum_changes']}")
+    print(f"新建类数量: {create_counts['struct_changes']}")
+
+def patch_parameters_section(patch, parameters_tree, item):
+    """将单条变更中的参数和枚举值以 plentry 追加到 parameters section"""
+    # 找到 <parml>
+    parml = parameters_tree.find("parml")
+
+    if parml is not None:
+        # 获取 <parml> 内现有 plentry 的缩进
+        existing_plentries = find_plentries(parml)
+        if existing_plentries:
+            last_plentry = existing_plentries[-1]
+            indent = last_plentry.tail if last_plentry.tail else '\n        '
+            child_indent = ' ' * (len(indent) + 4)
+        else:
+            # 默认缩进
+            indent = '\n        '
+            child_indent = indent + '    '
+
+        target_parent = parml
+    else:
+        # 如果没有 <parml>，则直接在 section 下添加 plentry
+        existing_plentries = find_plentries(parameters_tree)
+        if existing_plentries:
+            last_plentry = existing_plentries[-1]
+            indent = last_plentry.tail if last_plentry.tail else '\n        '
+            child_indent = ' ' * (len(indent) + 4)
+        else:
+            # 默认缩进
+            indent = '\n        '
+            child_indent = indent + '    '
+
+        target_parent = parameters_tree
+
+    # 处理参数
+    params = item['description'].get('parameters', {})
+    if 'parameters' in item['description']:
+        params = item['description']['parameters']
+
+        # 按参数名组织数据
+        param_data = {}
+        for platform, param_list in params.items():
+            for param in param_list:
+                name = param['name']
+                if name not in param_data:
+                    param_data[name] = {
+                        'platforms': [],
+                        'desc': param.get('desc', ''),  # 保存第一个遇到的描述
+                        'platform_names': {}  # 存储每个平台对应的参数名
+                    }
+                param_data[name]['platforms'].append(platform)
+                param_data[name]['platform_names'][platform] = name
+
+        # 已有的参数名，整个 section 只查找一次
+        existing_names = {pt.text for pt in find_all_pts(parameters_tree)}
+
+        # 为每个唯一参数创建 plentry
+        for param_name, data in param_data.items():
+            # 检查是否已存在相同的参数
+            if param_name in existing_names:
+                continue
+
+            # 创建新的 plentry 结构
+            plentry = patch.append(target_parent, 'plentry')
+            plentry.tail = indent  # 设置 plentry 的 tail 以保持缩进
+
+            # 设置 plentry 的 text 为换行加缩进
+            plentry.text = '\n' + child_indent
+
+            pt = etree.SubElement(plentry, 'pt')
+            # 设置 <pt> 的 text 和换行缩进
+            pt.text = param_name
+            pt.tail = '\n' + child_indent
+
+            pd = etree.SubElement(plentry, 'pd')
+            pd.text = data['desc']
+            # 移除换行符
+            pd.tail = indent  # 设置 <pd> 的 tail 为 plentry 的缩进，让 </plentry> 直接跟随
+
+            # 设置平台属性
+            if data['platforms']:
+                platform_values = []
+                for platform in data['platforms']:
+                    platform_values.append(keysmap_name(platform))
+                pt.set('props', ' '.join(platform_values))
+
+    # 处理 enums
+    if item['attributes'] == 'enum' and 'enumerations' in item['description']:
+        enumerations = item['description']['enumerations']
+
+        # 按 alias 组织数据
+        enum_data = {}
+        for platform, enum_list in enumerations.items():
+            for enum in enum_list:
+                alias = enum['alias']
+                desc = enum.get('desc', '')
+                if alias not in enum_data:
+                    enum_data[alias] = {
+                        'platforms': [],
+                        'desc': desc
+                    }
+                enum_data[alias]['platforms'].append(platform)
+
+        # 已有枚举值的 keyref（pt 下的第一个 ph），整个 section 只查找一次
+        existing_aliases = set()
+        for existing_pt in find_all_pts(parameters_tree):
+            ph = existing_pt.find('ph')
+            if ph is not None:
+                existing_aliases.add(ph.get('keyref'))
+
+        # 为每个唯一枚举创建 plentry
+        for alias, data in enum_data.items():
+            # 检查是否已存在相同的枚举
+            if alias in existing_aliases:
+                continue
+
+            # 创建新的 plentry 结构
+            plentry = patch.append(target_parent, 'plentry')
+            plentry.tail = indent  # 设置 plentry 的 tail 以保持缩进
 
-def modify_dita_files():
-    """根据 JSON 数据修改 DITA 文件，同时保持原有格式和缩进一致。"""
+            # 设置 plentry 的 text 为换行加缩进
+            plentry.text = '\n' + child_indent
+
+            pt = etree.SubElement(plentry, 'pt')
+            # 创建 <ph> 元素并设置 keyref
+            ph = etree.SubElement(pt, 'ph')
+            ph.set('keyref', alias)
+            # 设置 <pt> 的 tail
+            pt.tail = '\n' + child_indent
+
+            pd = etree.SubElement(plentry, 'pd')
+            pd.text = data['desc']
+            # 设置 <pd> 的 tail 为 plentry 的缩进
+            pd.tail = indent
+
+            # 设置平台属性
+            if data['platforms']:
+                platform_values = []
+                for platform in data['platforms']:
+                    platform_values.append(keysmap_name(platform))
+                pt.set('props', ' '.join(platform_values))
+
+def modify_dita_files(workspace):
+    """根据 JSON 数据修改 DITA 文件，同时保持原有格式和缩进一致。
+
+    变更按目标文件分组，每个文件只读写一次；只在被修改的元素内插入新内容，
+    文件其余部分保持原样。
+    """
     api_dir = os.path.join(base_dir, 'RTC-NG', 'API')
 
     # 初始化成功和错误信息列表
     success_messages = []
     error_messages = []
 
-    # 遍历 data.json 中的数据
+    # 遍历 data.json 中的数据，按目标文件分组
+    changes_by_file = {}
     for change_type in ['api_changes', 'struct_changes', 'enum_changes']:
-        for item in json_data.get(change_type, []):
+        for item in json_data.get(change_type):
             # 只处理 modify 类型且 attributes 为 api、callback、enum 或 class 的 API
             if item['change_type'] == 'modify' and item['attributes'] in ['api', 'callback', 'enum', 'class']:
                 # 根据 attributes 类型构建 DITA 文件路径
@@ -666,195 +1064,45 @@ def modify_dita_files():
                     error_messages.append(f"Unsupported attribute type: {item['attributes']}")
                     continue
 
-                dita_path = os.path.join(api_dir, filename)
+                changes_by_file.setdefault(os.path.join(api_dir, filename), []).append(item)
 
-                if not os.path.exists(dita_path):
-                    error_messages.append(f"文件未找到: {dita_path}")
-                    continue
-
-                # 读取原始文件内容
-                try:
-                    with open(dita_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except Exception as e:
-                    error_messages.append(f"Error reading {dita_path}: {str(e)}")
-                    continue
+    for dita_path, items in changes_by_file.items():
+        if not workspace.exists(dita_path):
+            error_messages.append(f"文件未找到: {dita_path}")
+            continue
 
-                # 使用正则表达式提取 <section id="parameters">
-                pattern = re.compile(r'(<section\s+id="parameters">.*?</section>)', re.DOTALL)
-                match = pattern.search(content)
-                if not match:
-                    error_messages.append(f"在 {dita_path} 中未找到 parameters section")
-                    continue
+        # 读取原始文件内容并建立元素位置索引
+        try:
+            patch = TopicPatch(dita_path, workspace)
+        except Exception as e:
+            error_messages.append(f"Error reading {dita_path}: {str(e)}")
+            continue
 
-                parameters_section = match.group(1)
+        # 解析 <section id="parameters">
+        try:
+            parameters_tree = patch.section('parameters')
+        except etree.XMLSyntaxError as e:
+            error_messages.append(f"解析 {dita_path} 中的 parameters section 时出错: {e}")
+            continue
+        if parameters_tree is None:
+            error_messages.append(f"在 {dita_path} 中未找到 parameters section")
+            continue
 
-                # 解析 parameters_section
-                parser = etree.XMLParser(remove_blank_text=False, resolve_entities=False)
-                try:
-                    parameters_tree = etree.fromstring(parameters_section, parser)
-                except etree.XMLSyntaxError as e:
-                    error_messages.append(f"解析 {dita_path} 中的 parameters section 时出错: {e}")
-                    continue
+        # 同一文件的所有变更依次应用到同一棵片段树上
+        with recorder.file(dita_path):
+            for item in items:
+                patch_parameters_section(patch, parameters_tree, item)
 
-                # 找到 <parml>
-                parml = parameters_tree.find("parml")
-
-                if parml is not None:
-                    # 获取 <parml> 内现有 plentry 的缩进
-                    existing_plentries = parml.findall('plentry')
-                    if existing_plentries:
-                        last_plentry = existing_plentries[-1]
-                        indent = last_plentry.tail if last_plentry.tail else '\n        '
-                        child_indent = ' ' * (len(indent) + 4)
-                    else:
-                        # 默认缩进
-                        indent = '\n        '
-                        child_indent = indent + '    '
-
-                    target_parent = parml
-                else:
-                    # 如果没有 <parml>，则直接在 section 下添加 plentry
-                    existing_plentries = parameters_tree.findall('plentry')
-                    if existing_plentries:
-                        last_plentry = existing_plentries[-1]
-                        indent = last_plentry.tail if last_plentry.tail else '\n        '
-                        child_indent = ' ' * (len(indent) + 4)
-                    else:
-                        # 默认缩进
-                        indent = '\n        '
-                        child_indent = indent + '    '
-
-                    target_parent = parameters_tree
-
-                # 处理参数
-                params = item['description'].get('parameters', {})
-                if 'parameters' in item['description']:
-                    params = item['description']['parameters']
-
-                    # 按参数名组织数据
-                    param_data = {}
-                    for platform, param_list in params.items():
-                        for param in param_list:
-                            name = param['name']
-                            if name not in param_data:
-                                param_data[name] = {
-                                    'platforms': [],
-                                    'desc': param.get('desc', ''),  # 保存第一个遇到的描述
-                                    'platform_names': {}  # 存储每个平台对应的参数名
-                                }
-                            param_data[name]['platforms'].append(platform)
-                            param_data[name]['platform_names'][platform] = name
-
-                    # 为每个唯一参数创建 plentry
-                    for param_name, data in param_data.items():
-                        # 检查是否已存在相同的参数
-                        exists = False
-                        for existing_pt in parameters_tree.findall(".//pt"):
-                            if existing_pt.text == param_name:
-                                exists = True
-                                break
-
-                        if exists:
-                            continue
-
-                        # 创建新的 plentry 结构
-                        plentry = etree.SubElement(target_parent, 'plentry')
-                        plentry.tail = indent  # 设置 plentry 的 tail 以保持缩进
-
-                        # 设置 plentry 的 text 为换行加缩进
-                        plentry.text = '\n' + child_indent
-
-                        pt = etree.SubElement(plentry, 'pt')
-                        # 设置 <pt> 的 text 和换行缩进
-                        pt.text = param_name
-                        pt.tail = '\n' + child_indent
-
-                        pd = etree.SubElement(plentry, 'pd')
-                        pd.text = data['desc']
-                        # 移除换行符
-                        pd.tail = indent  # 设置 <pd> 的 tail 为 plentry 的缩进，让 </plentry> 直接跟随
-
-                        # 设置平台属性
-                        if data['platforms']:
-                            platform_values = []
-                            for platform in data['platforms']:
-                                # windows 对应的值为 cpp
-                                platform_value = 'cpp' if platform == 'windows' else PLATFORM_TO_KEYSMAP.get(platform, platform)
-                                platform_values.append(platform_value)
-                            pt.set('props', ' '.join(platform_values))
-
-                # 处理 enums
-                if item['attributes'] == 'enum' and 'enumerations' in item['description']:
-                    enumerations = item['description']['enumerations']
-
-                    # 按 alias 组织数据
-                    enum_data = {}
-                    for platform, enum_list in enumerations.items():
-                        for enum in enum_list:
-                            alias = enum['alias']
-                            desc = enum.get('desc', '')
-                            if alias not in enum_data:
-                                enum_data[alias] = {
-                                    'platforms': [],
-                                    'desc': desc
-                                }
-                            enum_data[alias]['platforms'].append(platform)
-
-                    # 为每个唯一枚举创建 plentry
-                    for alias, data in enum_data.items():
-                        # 检查是否已存在相同的枚举
-                        exists = False
-                        for existing_pt in parameters_tree.findall(".//pt"):
-                            ph = existing_pt.find('ph')
-                            if ph is not None and ph.get('keyref') == alias:
-                                exists = True
-                                break
-
-                        if exists:
-                            continue
-
-                        # 创建新的 plentry 结构
-                        plentry = etree.SubElement(target_parent, 'plentry')
-                        plentry.tail = indent  # 设置 plentry 的 tail 以保持缩进
-
-                        # 设置 plentry 的 text 为换行加缩进
-                        plentry.text = '\n' + child_indent
-
-                        pt = etree.SubElement(plentry, 'pt')
-                        # 创建 <ph> 元素并设置 keyref
-                        ph = etree.SubElement(pt, 'ph')
-                        ph.set('keyref', alias)
-                        # 设置 <pt> 的 tail
-                        pt.tail = '\n' + child_indent
-
-                        pd = etree.SubElement(plentry, 'pd')
-                        pd.text = data['desc']
-                        # 设置 <pd> 的 tail 为 plentry 的缩进
-                        pd.tail = indent
-
-                        # 设置平台属性
-                        if data['platforms']:
-                            platform_values = []
-                            for platform in data['platforms']:
-                                # windows 对应的值为 cpp
-                                platform_value = 'cpp' if platform == 'windows' else PLATFORM_TO_KEYSMAP.get(platform, platform)
-                                platform_values.append(platform_value)
-                            pt.set('props', ' '.join(platform_values))
-
-                # 序列化修改后的 parameters_section
-                modified_parameters = etree.tostring(parameters_tree, encoding='unicode', pretty_print=False)
-
-                # 替换原始的 parameters_section 为修改后的部分
-                new_content = pattern.sub(modified_parameters, content)
-
-                # 写回修改后的内容到文件
-                try:
-                    with open(dita_path, 'w', encoding='utf-8') as f:
-                        f.write(new_content)
-                    success_messages.append(f"Successfully updated {dita_path}")
-                except Exception as e:
-                    error_messages.append(f"Error writing to {dita_path}: {str(e)}")
+        # 写回修改后的内容到文件
+        if not patch.changed:
+            success_messages.append(f"No changes made to {dita_path}")
+            continue
+        try:
+            patch.save()
+            recorder.inserted(patch.inserted)
+            success_messages.append(f"Successfully updated {dita_path}")
+        except Exception as e:
+            error_messages.append(f"Error writing to {dita_path}: {str(e)}")
 
     # 打印成功和错误信息
     if success_messages:
@@ -864,7 +1112,22 @@ def modify_dita_files():
         print("\n=== 修改 DITA 文件错误信息 ===")
         print("\n".join(error_messages))
 
-def parse_ditamap(ditamap_path, platform_apis):
+def topicref_index(root):
+    """href → [(topicref, 深度)]，按文档顺序排列；map 根元素的深度为 0"""
+    index = {}
+    depths = {root: 0}
+    for element in root.iter(etree.Element):
+        parent = element.getparent()
+        if parent is None:
+            continue
+        depth = depths[element] = depths[parent] + 1
+        if element.tag == 'topicref':
+            href = element.get('href')
+            if href is not None:
+                index.setdefault(href, []).append((element, depth))
+    return index
+
+def parse_ditamap(ditamap_path, platform_apis, workspace):
     """处理单个 ditamap 文件"""
     success_messages = []
     error_messages = []
@@ -873,8 +1136,7 @@ def parse_ditamap(ditamap_path, platform_apis):
     print(f"Total APIs to process: {len(platform_apis)}")
 
     try:
-        tree = etree.parse(ditamap_path)
-        root = tree.getroot()
+        root = workspace.load(ditamap_path).getroot()
     except Exception as e:
         error_messages.append(f"Error parsing ditamap {ditamap_path}: {str(e)}")
         print("\n".join(error_messages))
@@ -882,8 +1144,13 @@ def parse_ditamap(ditamap_path, platform_apis):
 
     changes_made = 0
 
-    # 记录需要重新排序的 topicref父元素
-    modified_parents = set()
+    # href → [(topicref, 深度)]，整个文件只遍历一次
+    index = topicref_index(root)
+
+    # 记录每个父元素待插入的 topicref 及其深度，最后按父元素批量有序插入
+    pending_inserts = {}
+    # 每个父元素下已有（含待插入）的 keyref，重复运行同一条记录时不再重复添加
+    parent_keyrefs = {}
 
     # 遍历该平台需要处理的 API 数据
     for api_data in platform_apis:
@@ -898,57 +1165,41 @@ def parse_ditamap(ditamap_path, platform_apis):
         api_key = api_data['key']
 
         # 查找目标位置并添加新的 topicref
-        for topicref in root.iter('topicref'):
-            if topicref.get('href') == target_href:
-                # 获取当前 topicref 的缩进级别
-                current_indent = ''
-                parent = topicref
-                while parent is not None:
-                    current_indent += '    '
-                    parent = parent.getparent()
-
-                # 先添加一个换行和缩进
-                topicref.tail = '\n' + current_indent
-
-                new_topicref = etree.Element('topicref')
-                new_topicref.set('keyref', api_key)
-                new_topicref.set('toc', 'no')
-                # 设置新元素的缩进
-                new_topicref.tail = '\n' + current_indent
-
-                topicref.append(new_topicref)
-                changes_made += 1
-                success_messages.append(f"Added new topicref with keyref='{api_key}' under {target_href}")
-
-                # 将修改过的父元素添加到集合中
-                modified_parents.add(topicref)
-
-    # 对所有修改过的父元素进行子元素排序
-    for parent in modified_parents:
-        # 获取所有子元素
-        children = list(parent)
-        if children:
-            # 按字母顺序排序
-            children.sort(key=lambda x: x.get('keyref', '').lower())
-
-            # 重新设置子元素的顺序
-            for i, child in enumerate(children):
-                # 如果不是最后一个元素，设置换行和缩进
-                if i < len(children) - 1:
-                    child.tail = '\n' + current_indent
-                # 如果是最后一个元素，设置换行和父级缩进
-                else:
-                    child.tail = '\n' + current_indent[:-4]
-                # 把元素加到正确的位置
-                parent.append(child)
-
-    # 如果有修改，写入文件
+        for topicref, depth in index.get(target_href, ()):
+            keyrefs = parent_keyrefs.get(topicref)
+            if keyrefs is None:
+                keyrefs = parent_keyrefs[topicref] = {child.get('keyref') for child in topicref
+                                                      if child.tag == 'topicref'}
+            if api_key in keyrefs:
+                success_messages.append(f"Skipping topicref with keyref='{api_key}' under {target_href}: already exists")
+                continue
+            keyrefs.add(api_key)
+
+            new_topicref = etree.Element('topicref')
+            new_topicref.set('keyref', api_key)
+            new_topicref.set('toc', 'no')
+
+            new_topicrefs, _ = pending_inserts.setdefault(topicref, ([], depth))
+            new_topicrefs.append(new_topicref)
+            changes_made += 1
+            success_messages.append(f"Added new topicref with keyref='{api_key}' under {target_href}")
+
+    # 按字母顺序将新的 topicref 合并插入各父元素，缩进由各父元素自己的深度决定
+    for parent, (new_topicrefs, depth) in pending_inserts.items():
+        child_indent = '\n' + '    ' * (depth + 1)
+        if len(parent) == 0 and not (parent.text or '').strip():
+            # 原本没有子元素的 topicref，第一个子元素另起一行
+            parent.text = child_indent
+        insert_sorted(parent, new_topicrefs,
+                      sort_key=lambda x: (x.get('keyref') or '').lower(),
+                      indent=child_indent,
+                      last_indent='\n' + '    ' * depth)
+
+    # 如果有修改，标记文件待写回
+    recorder.inserted(changes_made)
     if changes_made > 0:
-        try:
-            tree.write(ditamap_path, encoding='UTF-8', xml_declaration=True)
-            success_messages.append(f"Writing {changes_made} changes to {ditamap_path}")
-        except Exception as e:
-            error_messages.append(f"Error writing to ditamap {ditamap_path}: {str(e)}")
+        workspace.mark_dirty(ditamap_path)
+        success_messages.append(f"Staged {changes_made} changes to {ditamap_path}")
     else:
         success_messages.append(f"No changes made to {ditamap_path}")
 
@@ -960,7 +1211,28 @@ def parse_ditamap(ditamap_path, platform_apis):
         print("\n=== 处理 ditamap 错误信息 ===")
         print("\n".join(error_messages))
 
-def process_all_ditamaps():
+def run_in_worker(task, *args):
+    """在子进程中独立执行单个平台任务，修改后的文件内容交回主进程统一提交，返回结构化的结果记录"""
+    workspace = DitaWorkspace(dry_run=True)
+    output = io.StringIO()
+    record = {'result': None, 'output': '', 'success_messages': [], 'error_messages': []}
+
+    # 子进程单独统计，由主进程合并到当前阶段
+    recorder.reset()
+    with contextlib.redirect_stdout(output), recorder.stage(task.__name__):
+        try:
+            with recorder.file(args[0]):
+                record['result'] = task(*args, workspace)
+                record['success_messages'], record['error_messages'] = workspace.flush()
+        except Exception as e:
+            record['error_messages'].append(f"Error in worker for {args[0]}: {str(e)}")
+
+    record['output'] = output.getvalue()
+    record['files'] = workspace.staged()
+    record['metrics'] = recorder.snapshot()
+    return record
+
+def process_all_ditamaps(workspace, executor=None):
     """处理所有平台的 ditamap 文件"""
     ditamap_base_dir = os.path.join(base_dir, 'RTC-NG')
 
@@ -968,42 +1240,35 @@ def process_all_ditamaps():
     success_messages = []
     error_messages = []
 
-    # 首先按平台组织 API 数据
-    platform_api_map = {platform: [] for platform in PLATFORM_FILES.keys()}
-
-    # 遍历所有 API 数据，按平台分组
-    for change_type in ['api_changes', 'struct_changes', 'enum_changes']:
-        for api_data in json_data.get(change_type, []):
-            platforms = api_data.get('platforms', [])
-
-            # 如果platforms是"all"，则添加到所有平台
-            if "all" in platforms:
-                for platform in PLATFORM_FILES.keys():
-                    platform_api_map[platform].append(api_data)
-            else:
-                # 否则只添加到指定的平台
-                for platform in platforms:
-                    if platform in platform_api_map:
-                        platform_api_map[platform].append(api_data)
-
-    # 解析 RTC-NG/config 路径下所有的 keys-rtc-ng-api-{platform}.ditamap 文件
-    keysmaps_dir = os.path.join(base_dir, 'RTC-NG','config')
-
-    # 遍历每个平台
-    for platform, apis in platform_api_map.items():
-        keysmap_platform = PLATFORM_TO_KEYSMAP.get(platform)
-        if not keysmap_platform:
-            error_messages.append(f"Warning: No keysmap mapping found for platform {platform}")
-            continue
-
-        ditamap_path = os.path.join(ditamap_base_dir, PLATFORM_FILES.get(platform, ''))
+    # 遍历每个平台，各平台的记录是共享变更数据上按位掩码筛选的视图
+    tasks = []
+    for platform in PLATFORMS:
+        ditamap_path = os.path.join(ditamap_base_dir, platform.ditamap)
         if not os.path.exists(ditamap_path):
-            error_messages.append(f"Warning: Ditamap file not found for platform {platform}: {ditamap_path}")
+            error_messages.append(f"Warning: Ditamap file not found for platform {platform.name}: {ditamap_path}")
             continue
 
+        tasks.append((platform.name, ditamap_path, json_data.for_platform(platform)))
+
+    if executor is None:
         # 处理该平台的 ditamap
-        parse_ditamap(ditamap_path, apis)
-        success_messages.append(f"Processed ditamap for platform {platform}")
+        for platform, ditamap_path, apis in tasks:
+            with recorder.file(ditamap_path):
+                parse_ditamap(ditamap_path, apis, workspace)
+            success_messages.append(f"Processed ditamap for platform {platform}")
+    else:
+        # 每个平台的 ditamap 互不依赖，分发到子进程并按平台顺序合并结果；子进程只接收该平台的记录
+        futures = [(platform, executor.submit(run_in_worker, parse_ditamap, ditamap_path, list(apis)))
+                   for platform, ditamap_path, apis in tasks]
+        for platform, future in futures:
+            record = future.result()
+            recorder.merge(record['metrics'])
+            for path, data in record['files'].items():
+                workspace.save(path, data)
+            print(record['output'], end='')
+            success_messages.extend(record['success_messages'])
+            error_messages.extend(record['error_messages'])
+            success_messages.append(f"Processed ditamap for platform {platform}")
 
     # 打印成功和错误信息
     if success_messages:
@@ -1013,21 +1278,49 @@ def process_all_ditamaps():
         print("\n=== 处理所有 ditamap 错误信息 ===")
         print("\n".join(error_messages))
 
-def create_and_insert_keydef(root, api_data, platform):
+class KeysmapIndex:
+    """keysmap 的查找索引：navtitle → topichead、已有 keys 集合和基础缩进，每次解析只构建一次"""
+
+    def __init__(self, root):
+        self.topicheads = {}
+        self.keys = set()
+        self.base_indent = None
+
+        for elem in root.iter('topichead', 'keydef'):
+            if elem.tag == 'topichead':
+                navtitle = elem.get('navtitle')
+                # 与 root.iter 的查找顺序一致，同名 navtitle 取第一个
+                if navtitle and navtitle not in self.topicheads:
+                    self.topicheads[navtitle] = elem
+            else:
+                self.keys.update((elem.get('keys') or '').split())
+                # 第一个 topichead 下的第一个 keydef 作为缩进参考
+                if self.base_indent is None and elem.getparent().tag == 'topichead':
+                    self.base_indent = (elem.tail or '').rpartition('\n')[2]
+
+    def find_topichead(self, navtitle):
+        return self.topicheads.get(navtitle)
+
+    def has_key(self, key):
+        return key in self.keys
+
+    def append(self, topichead, keydef):
+        """插入 keydef 并同步更新索引"""
+        topichead.append(keydef)
+        self.keys.update((keydef.get('keys') or '').split())
+
+def create_and_insert_keydef(index, api_data, platform):
     """创建并插入新的 keydef 元素"""
     success_messages = []
     error_messages = []
 
-    # 获取第一个 topichead 下的第一个 keydef 作为参考
-    reference_keydef = root.find('.//topichead/keydef')
-    if reference_keydef is None:
+    # 获取基础缩进（第一个 topichead 下第一个 keydef 的缩进）
+    base_indent = index.base_indent
+    if base_indent is None:
         error_messages.append("Warning: No reference keydef found for indentation")
         print("\n".join(error_messages))
         return False
 
-    # 获取基础缩进（keydef 元素的缩进）
-    base_indent = (reference_keydef.tail or '').rpartition('\n')[2]
-
     # 检查是否为 enum 类型
     if api_data.get('attributes') == 'enum' and 'enumerations' in api_data['description']:
         # 插入 enum keydef
@@ -1037,63 +1330,78 @@ def create_and_insert_keydef(root, api_data, platform):
             print("\n".join(error_messages))
             return False
 
-        # 为枚举创建 keydef
-        enum_keydef = etree.Element('keydef')
-        enum_keydef.set('keys', api_data['keyword'].get(platform, api_data['key']))
-        # 移除 href 里面的下划线
-        enum_keydef.set('href', f"../API/enum_{api_data['key'].lower().replace('_', '')}.dita")
-        enum_keydef.text = '\n' + base_indent + '    '
-        enum_keydef.tail = '\n' + base_indent
-
-        topicmeta = etree.SubElement(enum_keydef, 'topicmeta')
-        topicmeta.text = '\n' + base_indent + '        '
-        topicmeta.tail = '\n' + base_indent + '    '
-
-        keywords = etree.SubElement(topicmeta, 'keywords')
-        keywords.text = '\n' + base_indent + '            '
-        keywords.tail = '\n' + base_indent + '        '
-
-        keyword = etree.SubElement(keywords, 'keyword')
-        keyword.text = api_data['keyword'].get(platform, api_data['key'])
-        keyword.tail = '\n' + base_indent + '        '
+        topichead = index.find_topichead(target_navtitle)
+        if topichead is not None:
+            changes_made = 0
 
-        # 插入枚举 keydef
-        for topichead in root.iter('topichead'):
-            if topichead.get('navtitle') == target_navtitle:
-                topichead.append(enum_keydef)
+            # 为枚举创建 keydef；keysmap 中已有该 key 时跳过（重复运行同一条记录时不再重复添加）
+            enum_key = api_data['keyword'].get(platform, api_data['key'])
+            if index.has_key(enum_key):
+                error_messages.append(f"Warning: Keydef with key '{enum_key}' already exists in {target_navtitle}")
+            else:
+                enum_keydef = etree.Element('keydef')
+                enum_keydef.set('keys', enum_key)
+                # 移除 href 里面的下划线
+                enum_keydef.set('href', f"../API/enum_{api_data['key'].lower().replace('_', '')}.dita")
+                enum_keydef.text = '\n' + base_indent + '    '
+                enum_keydef.tail = '\n' + base_indent
+
+                topicmeta = etree.SubElement(enum_keydef, 'topicmeta')
+                topicmeta.text = '\n' + base_indent + '        '
+                topicmeta.tail = '\n' + base_indent + '    '
+
+                keywords = etree.SubElement(topicmeta, 'keywords')
+                keywords.text = '\n' + base_indent + '            '
+                keywords.tail = '\n' + base_indent + '        '
+
+                keyword = etree.SubElement(keywords, 'keyword')
+                keyword.text = enum_key
+                keyword.tail = '\n' + base_indent + '        '
+
+                # 插入枚举 keydef
+                index.append(topichead, enum_keydef)
+                changes_made += 1
                 success_messages.append(f"Added enum keydef for API {api_data['key']} to navtitle '{target_navtitle}'")
 
-                # 添加枚举值 keydef
-                for enum_platform, enums in api_data['description']['enumerations'].items():
-                    if platform == enum_platform:
-                        for enum in enums:
-                            alias = enum.get('alias')
-                            value = enum.get('value')
-                            if alias and value:
-                                # 为每个枚举创建 keydef
-                                enum_value_keydef = etree.Element('keydef')
-                                enum_value_keydef.set('keys', alias)  # 设置 keys 为 alias
-                                enum_value_keydef.text = '\n' + base_indent + '    '
-                                enum_value_keydef.tail = '\n' + base_indent
-
-                                topicmeta = etree.SubElement(enum_value_keydef, 'topicmeta')
-                                topicmeta.text = '\n' + base_indent + '        '
-                                topicmeta.tail = '\n' + base_indent + '    '
-
-                                keywords = etree.SubElement(topicmeta, 'keywords')
-                                keywords.text = '\n' + base_indent + '            '
-                                keywords.tail = '\n' + base_indent + '        '
-
-                                keyword = etree.SubElement(keywords, 'keyword')
-                                keyword.text = value  # Set keyword to value
-                                keyword.tail = '\n' + base_indent + '        '
-
-                                # 插入枚举值 keydef
-                                topichead.append(enum_value_keydef)
-                                success_messages.append(f"Added enum value keydef '{alias}' with value '{value}'")
-
+            # 添加枚举值 keydef
+            for enum_platform, enums in api_data['description']['enumerations'].items():
+                if platform == enum_platform:
+                    for enum in enums:
+                        alias = enum.get('alias')
+                        value = enum.get('value')
+                        if alias and value:
+                            if index.has_key(alias):
+                                error_messages.append(f"Warning: Keydef with key '{alias}' already exists in {target_navtitle}")
+                                continue
+
+                            # 为每个枚举创建 keydef
+                            enum_value_keydef = etree.Element('keydef')
+                            enum_value_keydef.set('keys', alias)  # 设置 keys 为 alias
+                            enum_value_keydef.text = '\n' + base_indent + '    '
+                            enum_value_keydef.tail = '\n' + base_indent
+
+                            topicmeta = etree.SubElement(enum_value_keydef, 'topicmeta')
+                            topicmeta.text = '\n' + base_indent + '        '
+                            topicmeta.tail = '\n' + base_indent + '    '
+
+                            keywords = etree.SubElement(topicmeta, 'keywords')
+                            keywords.text = '\n' + base_indent + '            '
+                            keywords.tail = '\n' + base_indent + '        '
+
+                            keyword = etree.SubElement(keywords, 'keyword')
+                            keyword.text = value  # Set keyword to value
+                            keyword.tail = '\n' + base_indent + '        '
+
+                            # 插入枚举值 keydef
+                            index.append(topichead, enum_value_keydef)
+                            changes_made += 1
+                            success_messages.append(f"Added enum value keydef '{alias}' with value '{value}'")
+
+            if success_messages:
                 print("\n".join(success_messages))
-                return True
+            if error_messages:
+                print("\n".join(error_messages))
+            return changes_made > 0
 
         error_messages.append(f"Warning: No matching topichead found for navtitle '{target_navtitle}'")
         print("\n".join(error_messages))
@@ -1146,58 +1454,72 @@ def create_and_insert_keydef(root, api_data, platform):
         print("\n".join(error_messages))
         return False
 
-    for topichead in root.iter('topichead'):
-        if topichead.get('navtitle') == target_navtitle:
-            # 检查是否已存在相同的 keydef
-            exists = False
-            for existing_keydef in topichead.findall('keydef'):
-                if existing_keydef.get('keys') == api_data['key']:
-                    exists = True
-                    break
-            if exists:
-                error_messages.append(f"Warning: Keydef with key '{api_data['key']}' already exists in {target_navtitle}")
-                print("\n".join(error_messages))
-                return False
+    topichead = index.find_topichead(target_navtitle)
+    if topichead is not None:
+        # 检查 keysmap 中是否已存在相同的 key
+        if index.has_key(api_data['key']):
+            error_messages.append(f"Warning: Keydef with key '{api_data['key']}' already exists in {target_navtitle}")
+            print("\n".join(error_messages))
+            return False
 
-            # 添加元素
-            topichead.append(new_keydef)
-            success_messages.append(f"Added keydef for API {api_data['key']} to navtitle '{target_navtitle}'")
-            print("\n".join(success_messages))
-            return True
+        # 添加元素
+        index.append(topichead, new_keydef)
+        success_messages.append(f"Added keydef for API {api_data['key']} to navtitle '{target_navtitle}'")
+        print("\n".join(success_messages))
+        return True
 
     error_messages.append(f"Warning: No matching topichead found for navtitle '{target_navtitle}'")
     print("\n".join(error_messages))
     return False
 
-def parse_keysmaps():
-    """处理所有平台的 keysmaps 文件"""
-    # 创建平台到API的映射
-    platform_apis = {
-        'android': [],
-        'ios': [],
-        'windows': [],
-        'macos': [],
-        'unreal': [],
-        'cs': [],
-        'electron': [],
-        'flutter': [],
-        'rn': [],
-        'unity': []
-    }
-    # 将 API 按平台分类
-    for change_type in ['api_changes', 'struct_changes', 'enum_changes']:
-        for api_data in json_data.get(change_type, []):
-            platforms = api_data.get('platforms', [])
-            # 如果platforms是"all"，添加到所有平台
-            if "all" in platforms:
-                for platform in platform_apis.keys():
-                    platform_apis[platform].append(api_data)
-            else:
-                # 否则只添加到指定的平台
-                for platform in platforms:
-                    if platform in platform_apis:
-                        platform_apis[platform].append(api_data)
+def process_keysmap(keysmap_file, json_platform, apis, workspace):
+    """处理单个平台的 keysmap 文件，返回成功和错误信息列表"""
+    success_messages = []
+    error_messages = []
+
+    root = workspace.load(keysmap_file).getroot()
+    index = KeysmapIndex(root)
+    changes_made = 0
+
+    # 处理该平台的所有API
+    for api_data in apis:
+        if create_and_insert_keydef(index, api_data, json_platform):
+            changes_made += 1
+            success_messages.append(f"Added keydef for API {api_data['key']} to {json_platform}")
 
+    # 如果有修改，标记文件待写回
+    recorder.inserted(changes_made)
+    if changes_made > 0:
+        workspace.mark_dirty(keysmap_file)
+        success_messages.append(f"Staged {changes_made} changes to {keysmap_file}")
+    else:
+        success_messages.append(f"No changes made to {keysmap_file}")
+
+    return success_messages, error_messages
+
+def record_keys(api_data, platform):
+    """create_and_insert_keydef 会为记录插入的 key；无法确定时（如 keyword 不是字典）返回 None"""
+    if api_data.get('attributes') == 'enum' and 'enumerations' in api_data.get('description', {}):
+        if not isinstance(api_data.get('keyword'), dict):
+            return None
+        keys = [api_data['keyword'].get(platform, api_data['key'])]
+        for enum in api_data['description']['enumerations'].get(platform, []):
+            if enum.get('alias') and enum.get('value'):
+                keys.append(enum['alias'])
+        return keys
+    return [api_data['key']]
+
+def keysmap_up_to_date(key_index, keysmap_file, platform, apis):
+    """根据 key 索引判断 keysmap 是否已包含所有记录的 key（enum 记录包括枚举值的 alias），无需解析"""
+    file_name = os.path.basename(keysmap_file)
+    for api_data in apis:
+        keys = record_keys(api_data, platform)
+        if keys is None or not all(key_index.has_key(file_name, key) for key in keys):
+            return False
+    return True
+
+def parse_keysmaps(workspace, executor=None, key_index=None):
+    """处理所有平台的 keysmaps 文件；提供 key_index 时跳过已包含所有 key 的 keysmap"""
     # 解析 RTC-NG/config 路径下所有的 keys-rtc-ng-api-{platform}.ditamap 文件
     keysmaps_dir = os.path.join(base_dir, 'RTC-NG','config')
 
@@ -1206,38 +1528,50 @@ def parse_keysmaps():
     error_messages = []
 
     # 遍历每个平台
-    for json_platform, keysmap_platform in PLATFORM_TO_KEYSMAP.items():
-        keysmap_file = os.path.join(keysmaps_dir, f'keys-rtc-ng-api-{keysmap_platform}.ditamap')
+    futures = []
+    for platform in PLATFORMS:
+        json_platform = platform.name
+        apis = json_data.for_platform(platform)
+        keysmap_file = os.path.join(keysmaps_dir, f'keys-rtc-ng-api-{platform.keysmap}.ditamap')
         if not os.path.exists(keysmap_file):
             error_messages.append(f"Warning: Keymap file not found: {keysmap_file}")
             continue
 
-        print(f"\nProcessing keymap for platform: {json_platform}")
-
         # 检查该平台是否有需要处理的API
-        if not platform_apis[json_platform]:
+        if not apis:
+            print(f"\nProcessing keymap for platform: {json_platform}")
             success_messages.append(f"No APIs to process for platform {json_platform}")
             continue
 
-        tree = etree.parse(keysmap_file)
-        root = tree.getroot()
-        changes_made = 0
-
-        # 处理该平台的所有API
-        for api_data in platform_apis[json_platform]:
-            if create_and_insert_keydef(root, api_data, json_platform):
-                changes_made += 1
-                success_messages.append(f"Added keydef for API {api_data['key']} to {json_platform}")
+        if key_index is not None and keysmap_up_to_date(key_index, keysmap_file, json_platform, apis):
+            print(f"\nProcessing keymap for platform: {json_platform}")
+            success_messages.append(f"All keys already defined in {keysmap_file}, skipped")
+            continue
 
-        # 如果有修改，保存文件
-        if changes_made > 0:
-            try:
-                tree.write(keysmap_file, encoding='UTF-8', xml_declaration=True)
-                success_messages.append(f"Writing {changes_made} changes to {keysmap_file}")
-            except Exception as e:
-                error_messages.append(f"Error writing to keymap {keysmap_file}: {str(e)}")
+        if executor is None:
+            print(f"\nProcessing keymap for platform: {json_platform}")
+            with recorder.file(keysmap_file):
+                keysmap_success, keysmap_errors = process_keysmap(keysmap_file, json_platform, apis, workspace)
+            success_messages.extend(keysmap_success)
+            error_messages.extend(keysmap_errors)
         else:
-            success_messages.append(f"No changes made to {keysmap_file}")
+            # 每个平台的 keysmap 互不依赖，分发到子进程处理
+            futures.append((json_platform, executor.submit(run_in_worker, process_keysmap, keysmap_file,
+                                                           json_platform, list(apis))))
+
+    # 按平台顺序合并子进程的结果
+    for json_platform, future in futures:
+        record = future.result()
+        recorder.merge(record['metrics'])
+        for path, data in record['files'].items():
+            workspace.save(path, data)
+        print(f"\nProcessing keymap for platform: {json_platform}")
+        print(record['output'], end='')
+        if record['result'] is not None:
+            success_messages.extend(record['result'][0])
+            error_messages.extend(record['result'][1])
+        success_messages.extend(record['success_messages'])
+        error_messages.extend(record['error_messages'])
 
     # 打印成功和错误信息
     if success_messages:
@@ -1247,25 +1581,88 @@ def parse_keysmaps():
         print("\n=== 处理 keysmaps 错误信息 ===")
         print("\n".join(error_messages))
 
-def insert_relations(relations_path):
+class RelationsIndex:
+    """relations reltable 的反向索引：keyref → 所在 relrow 及 relcell，一次遍历构建"""
+
+    def __init__(self, root):
+        # keyref -> [(relrow 序号, relrow, relcell, 祖先是否带 props)]，按文档顺序排列
+        self.rows = {}
+        # relcell -> 该单元格下 topicref 的 keyref 集合
+        self.cell_keyrefs = {}
+        self.row_positions = {}
+
+        for position, relrow in enumerate(root.iter('relrow')):
+            self.row_positions[relrow] = position
+            for relcell in relrow.findall('relcell'):
+                keyrefs = self._collect_cell(relcell)
+                for keyref in keyrefs:
+                    self._add_row(keyref, relrow, relcell)
+
+    def _collect_cell(self, relcell):
+        keyrefs = set()
+        for topicref in relcell.findall('topicref'):
+            keyref = topicref.get('keyref')
+            if keyref:
+                keyrefs.add(keyref)
+        self.cell_keyrefs[relcell] = keyrefs
+        return keyrefs
+
+    def _add_row(self, keyref, relrow, relcell):
+        """每个 relrow 只记录 keyref 第一次出现的 relcell"""
+        entries = self.rows.setdefault(keyref, [])
+        position = self.row_positions[relrow]
+        # 构建索引时 relrow 按文档顺序到达，直接追加即可
+        if not entries or entries[-1][0] < position:
+            entries.append((position, relrow, relcell, self._has_props(relcell)))
+            return
+        for i, entry in enumerate(entries):
+            if entry[0] == position:
+                # 同一 relrow 中位置更靠前的 relcell 优先
+                if list(relrow).index(relcell) < list(relrow).index(entry[2]):
+                    entries[i] = (position, relrow, relcell, self._has_props(relcell))
+                return
+            if entry[0] > position:
+                entries.insert(i, (position, relrow, relcell, self._has_props(relcell)))
+                return
+        entries.append((position, relrow, relcell, self._has_props(relcell)))
+
+    @staticmethod
+    def _has_props(relcell):
+        # topicref 的任一祖先（relcell、relrow、reltable……）带有 props 属性
+        for ancestor in [relcell] + list(relcell.iterancestors()):
+            if ancestor.get('props') is not None:
+                return True
+        return False
+
+    def find_rows(self, keyref):
+        """返回包含 keyref 的 (relrow, relcell, 祖先是否带 props) 列表"""
+        return [(relrow, relcell, has_props) for _, relrow, relcell, has_props in self.rows.get(keyref, [])]
+
+    def cell_has(self, relcell, keyref):
+        return keyref in self.cell_keyrefs.get(relcell, ())
+
+    def add(self, relrow, relcell, keyref):
+        """记录新插入的 topicref，保持索引与树一致"""
+        self.cell_keyrefs.setdefault(relcell, set()).add(keyref)
+        self._add_row(keyref, relrow, relcell)
+
+def insert_relations(relations_path, workspace):
     """处理 relations 文件，插入 API 关系"""
     print(f"\nProcessing relations file: {relations_path}")
 
     # 解析 relations 文件
-    tree = etree.parse(relations_path)
-    root = tree.getroot()
+    root = workspace.load(relations_path).getroot()
+    index = RelationsIndex(root)
     changes_made = 0
 
-    # 创建平台映射字典
-    platform_map = {config['platform']: config['platform1'] for config in platform_configs}
+    # 每个 relcell 待插入的 topicref 及其缩进
+    pending_inserts = {}
 
     # 遍历所有类型的变更
     for change_type in ['api_changes']:
         # struct_changes 和 enum_changes 不需要处理 relations
-        if change_type not in json_data:
-            continue
-
-        for change_item in json_data[change_type]:
+        for record in json_data.records(change_type):
+            change_item = record.data
             # 检查是否需要处理该 API
             if change_item.get('attributes') not in ['api', 'callback']:
                 continue
@@ -1273,12 +1670,11 @@ def insert_relations(relations_path):
             # 获取必要的数据
             key = change_item['key']
             parentclass = change_item.get('parentclass')
-            platforms = change_item.get('platforms', [])
 
             # 转换平台名称
             props = []
-            if "all" not in platforms:  # 只有当不是 "all" 时才添加 props
-                props = [platform_map[p] for p in platforms if p in platform_map]
+            if not record.all_platforms:  # 只有当不是 "all" 时才添加 props
+                props = record.platform_values('platform1')
 
             if not parentclass:
                 continue
@@ -1286,42 +1682,19 @@ def insert_relations(relations_path):
             # 构建 props 属性字符串
             props_str = ' '.join(props)
 
-            # 在 reltable 中查找对应的 parentclass
-            for relrow in root.findall('.//relrow'):
-                found = False
-                has_props = False
-                target_cell = None
-
-                # 查找包含目标 parentclass 的 relcell
-                for relcell in relrow.findall('relcell'):
-                    for topicref in relcell.findall('topicref'):
-                        if topicref.get('keyref') == parentclass:
-                            # 检查是否有任何 props 属性
-                            for ancestor in topicref.iterancestors():
-                                if ancestor.get('props') is not None:
-                                    has_props = True
-                                    print(f"Skipping API {key} as its parent has props attribute")
-                                    break
-
-                            if has_props:
-                                break
-
-                            # 找到目标 relcell，获取另一个 relcell
-                            target_cell = relrow.findall('relcell')[0]
-                            found = True
-                            break
-                    if found or has_props:
-                        break
-
-                if found and target_cell is not None and not has_props:
-                    # 检查是否已存在相同的 keyref
-                    exists = False
-                    for existing_topicref in target_cell.findall('topicref'):
-                        if existing_topicref.get('keyref') == key:
-                            exists = True
-                            break
+            # 在 reltable 索引中查找包含 parentclass 的 relrow
+            for relrow, relcell, has_props in index.find_rows(parentclass):
+                # 检查是否有任何 props 属性
+                if has_props:
+                    print(f"Skipping API {key} as its parent has props attribute")
+                    continue
+
+                # 找到目标 relcell，获取另一个 relcell
+                target_cell = relrow.find('relcell')
 
-                    if not exists:
+                if target_cell is not None:
+                    # 检查是否已存在相同的 keyref
+                    if not index.cell_has(target_cell, key):
                         # 创建新的 topicref 元素
                         new_topicref = etree.Element('topicref')
                         new_topicref.set('keyref', key)
@@ -1335,61 +1708,51 @@ def insert_relations(relations_path):
                             current_indent += '    '
                             parent = parent.getparent()
 
-                        # 设置新元素的缩进
-                        new_topicref.tail = '\n' + current_indent
-
-                        # 添加到目标 relcell 并按字母顺序排序
-                        target_cell.append(new_topicref)
+                        # 记录到目标 relcell 的待插入列表，最后统一按字母顺序插入
+                        new_topicrefs, _ = pending_inserts.setdefault(target_cell, ([], current_indent))
+                        new_topicrefs.append(new_topicref)
+                        index.add(relrow, target_cell, key)
                         changes_made += 1
                         print(f"Added relation for API {key} under {parentclass}")
 
-                        # 获取所有 topicref 元素并排序
-                        topicrefs = target_cell.findall('topicref')
-                        sorted_topicrefs = sorted(topicrefs, key=lambda x: x.get('keyref', ''))
-
-                        # 清空 relcell
-                        for child in list(target_cell):
-                            target_cell.remove(child)
+    # 将新的 topicref 按字母顺序合并插入各 relcell
+    for target_cell, (new_topicrefs, indent) in pending_inserts.items():
+        insert_sorted(target_cell, new_topicrefs,
+                      sort_key=lambda x: x.get('keyref', ''),
+                      indent='\n' + indent,
+                      last_indent='\n' + indent[:-4],
+                      select=lambda x: x.tag == 'topicref')
 
-                        # 重新按顺序添加元素
-                        for i, topicref in enumerate(sorted_topicrefs):
-                            if i < len(sorted_topicrefs) - 1:
-                                topicref.tail = '\n' + current_indent
-                            else:
-                                topicref.tail = '\n' + current_indent[:-4]
-                            target_cell.append(topicref)
-
-    # 如果有修改，保存文件
+    # 如果有修改，标记文件待写回
+    recorder.inserted(changes_made)
     if changes_made > 0:
-        print(f"Writing {changes_made} changes to {relations_path}")
-        tree.write(relations_path, encoding='UTF-8', xml_declaration=True)
+        print(f"Staged {changes_made} changes to {relations_path}")
+        workspace.mark_dirty(relations_path)
     else:
         print(f"No changes made to {relations_path}")
 
-def insert_datatype(datatype_path):
+def insert_datatype(datatype_path, workspace):
     """处理 datatype 文件，插入类和枚举的引用"""
     print(f"\n处理 datatype 文件: {datatype_path}")
 
     # 解析 datatype 文件
-    tree = etree.parse(datatype_path)
-    root = tree.getroot()
+    root = workspace.load(datatype_path).getroot()
     changes_made = 0
 
-    # 创建平台映射字典
-    platform_map = {config['platform']: config['platform3'] for config in platform_configs}
+    # 每个 ul 已有的 xref keyref 和待插入的 li
+    ul_keyrefs = {}
+    pending_inserts = {}
+
+    def li_sort_key(li):
+        xref = li.find('xref')
+        return xref.get('keyref', '') if xref is not None else ''
 
     # 遍历所有类型的变更
     for change_type, section_id in [('struct_changes', 'class'), ('enum_changes', 'enum')]:
-        if change_type not in json_data:
-            continue
-
-        for change_item in json_data[change_type]:
-            platforms = change_item.get('platforms', [])
-            props = []
-            if "all" in platforms:
-                props = [platform_map[p] for p in platform_map.keys()]
-            else:
-                props = [platform_map[p] for p in platforms if p in platform_map]
+        for record in json_data.records(change_type):
+            change_item = record.data
+            # platforms 为 "all" 时包含所有平台
+            props = record.platform_values('platform3')
 
             if not props:
                 continue
@@ -1412,51 +1775,262 @@ def insert_datatype(datatype_path):
                     ul.tail = '\n            '
 
                 # 检查是否已存在相同的 xref
-                exists = False
-                for li in ul.findall('li'):
-                    xref = li.find('xref')
-                    if xref is not None and xref.get('keyref') == change_item['key']:
-                        exists = True
-                        break
-
-                if not exists:
-                    # 创建新的 li 和 xref 元素
-                    new_li = etree.SubElement(ul, 'li')
+                if ul not in ul_keyrefs:
+                    ul_keyrefs[ul] = {li_sort_key(li) for li in ul.findall('li')}
+
+                if change_item['key'] not in ul_keyrefs[ul]:
+                    # 创建新的 li 和 xref 元素，最后统一有序插入
+                    new_li = etree.Element('li')
                     new_xref = etree.SubElement(new_li, 'xref')
                     new_xref.set('keyref', change_item['key'])
 
-                    # 设置缩进
-                    new_li.tail = '\n            '
+                    ul_keyrefs[ul].add(change_item['key'])
+                    pending_inserts.setdefault(ul, []).append(new_li)
 
                     changes_in_api += 1
                     print(f"添加了 {change_item['key']} 到 {prop} 平台的 {section_id} 部分")
 
-                    # 对 li 元素进行排序
-                    lis = ul.findall('li')
-                    sorted_lis = sorted(lis, key=lambda x: x.find('xref').get('keyref', ''))
-
-                    # 清空 ul
-                    for child in list(ul):
-                        ul.remove(child)
-
-                    # 重新按顺序添加元素
-                    for i, li in enumerate(sorted_lis):
-                        if i < len(sorted_lis) - 1:
-                            li.tail = '\n            '
-                        else:
-                            li.tail = '\n        '
-                        ul.append(li)
-
             changes_made += changes_in_api
 
-    # 如果有修改，保存文件
+    # 对 li 元素进行有序插入
+    for ul, new_lis in pending_inserts.items():
+        insert_sorted(ul, new_lis,
+                      sort_key=li_sort_key,
+                      indent='\n            ',
+                      last_indent='\n        ',
+                      select=lambda x: x.tag == 'li')
+
+    # 如果有修改，标记文件待写回
+    recorder.inserted(changes_made)
     if changes_made > 0:
         print(f"总共向 {datatype_path} 添加了 {changes_made} 处修改")
-        tree.write(datatype_path, encoding='UTF-8', xml_declaration=True)
+        workspace.mark_dirty(datatype_path)
     else:
         print(f"未对 {datatype_path} 进行任何修改")
 
+def record_topic(change_type, record):
+    """变更记录新建或修改的 topic 文件（相对 base_dir），没有时返回 None；只有文件名转换为小写"""
+    attributes = record.get('attributes')
+    key = record.get('key', '')
+    if record.get('change_type') == 'create':
+        if change_type == 'api_changes':
+            prefix = 'callback' if attributes == 'callback' else 'api'
+            return "RTC-NG/API/" + f"{prefix}_{record.get('parentclass')}_{key}.dita".lower()
+        elif change_type == 'enum_changes':
+            return f"RTC-NG/API/enum_{key.replace('-', '').lower()}.dita"
+        return f"RTC-NG/API/class_{key.lower()}.dita"
+    elif record.get('change_type') == 'modify':
+        if attributes in ['api', 'callback']:
+            return "RTC-NG/API/" + f"{attributes}_{record.get('parentclass')}_{key}.dita".lower()
+        elif attributes in ['enum', 'class']:
+            return "RTC-NG/API/" + f"{attributes}_{key.replace('_', '')}.dita".lower()
+    return None
+
+def record_targets(change_type, record):
+    """变更记录可能修改的文件（相对 base_dir），增量运行时据此判断记录能否跳过"""
+    targets = []
+
+    # 新建或修改的 topic 文件
+    topic = record_topic(change_type, record)
+    if topic is not None:
+        targets.append(topic)
+
+    # 各平台的 ditamap 和 keysmap
+    mask = platform_mask(record.get('platforms', []))
+    for platform in PLATFORMS:
+        if mask & platform.bit:
+            targets.append(f"RTC-NG/{platform.ditamap}")
+            targets.append(f"RTC-NG/config/keys-rtc-ng-api-{platform.keysmap}.ditamap")
+
+    # API 写入 relations，类和枚举写入 datatype
+    if change_type == 'api_changes':
+        targets.append("RTC-NG/config/relations-rtc-ng-api.ditamap")
+    else:
+        targets.append("RTC-NG/API/rtc_api_data_type.dita")
+    return targets
+
+def report_changed(pending):
+    """打印内容有变化的 create 记录的处理方式"""
+    for change_type, record, regenerated in pending.changed:
+        topic = record_topic(change_type, record)
+        if regenerated:
+            print(f"记录 {record.get('key')} 的内容有变化，将重新生成 {topic}")
+        else:
+            print(f"警告：记录 {record.get('key')} 的内容有变化，但 {topic} 在上次运行后已被修改，"
+                  f"不会重新生成，请手动更新")
+
+def write_dry_run_diffs(workspace, output):
+    """将 dry-run 的 unified diff 输出到标准输出（output 为 '-'）或文件"""
+    diffs = list(workspace.diffs(base_dir))
+    if output == '-':
+        print("\n=== dry-run 差异 ===")
+        for diff in diffs:
+            print(diff, end='')
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.writelines(diffs)
+    print(f"\ndry-run：共 {len(diffs)} 个文件将被修改，未写入磁盘" + ('' if output == '-' else f"，diff 已写入 {output}"))
+
+def apply_changes(workspace, args, templates, platform_configs, new_file_path, relations_path, datatype_path):
+    """依次执行所有阶段，将 json_data 中的记录应用到 DITA 文件并提交"""
+    dry_run = workspace.dry_run
+
+    # 创建新的 DITA 文件
+    with recorder.stage('create_dita_files'):
+        create_dita_files(args.feed, templates, platform_configs, new_file_path, workspace)
+
+    # --jobs 大于 1 时，各平台的 ditamap 和 keysmap 由子进程各自解析和修改，结果交回主进程写回
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+    try:
+        with recorder.stage('parse_ditamap'):
+            process_all_ditamaps(workspace, executor)
+        with recorder.stage('parse_keysmaps'):
+            if args.key_index:
+                # 索引按文件 mtime 和哈希增量更新；dry-run 时不写回磁盘
+                with KeyIndex(os.path.join(base_dir, KEY_INDEX_NAME), os.path.join(base_dir, 'RTC-NG', 'config'),
+                              persist=not dry_run) as key_index:
+                    reparsed = key_index.refresh()
+                    print(f"key 索引：重新解析 {len(reparsed)} 个 keys map")
+                    parse_keysmaps(workspace, executor, key_index)
+            else:
+                parse_keysmaps(workspace, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    with recorder.stage('insert_relations'):
+        insert_relations(relations_path, workspace)
+    with recorder.stage('insert_datatype'):
+        insert_datatype(datatype_path, workspace)
+
+    # 所有 map 修改完成后统一序列化，后台写入临时文件的同时继续修改 topic
+    with recorder.stage('write_back'):
+        success_messages, error_messages = workspace.flush()
+    if success_messages:
+        print("\n=== 写回文件成功信息 ===")
+        print("\n".join(success_messages))
+    if error_messages:
+        print("\n=== 写回文件错误信息 ===")
+        print("\n".join(error_messages))
+
+    with recorder.stage('modify_dita_files'):
+        modify_dita_files(workspace)
+
+    if dry_run:
+        # dry-run：输出所有将被修改的文件的 diff，不写入磁盘
+        write_dry_run_diffs(workspace, args.dry_run)
+    else:
+        # 唯一的提交点：所有文件在这里一次性原子替换，失败时全部回滚
+        with recorder.stage('commit'):
+            success_messages, error_messages = workspace.commit()
+        if success_messages:
+            print("\n=== 提交文件成功信息 ===")
+            print("\n".join(success_messages))
+        if error_messages:
+            print("\n=== 提交文件错误信息 ===")
+            print("\n".join(error_messages))
+            raise RuntimeError("提交失败，所有文件已回滚")
+
+def watch(watcher, workspace, manifest, args, templates, platform_configs, new_file_path, relations_path, datatype_path):
+    """监视变更数据和模板，每次修改后只把新增或内容变化的记录应用到已加载的树上
+
+    manifest 记录上次应用后的记录及其涉及文件的哈希，与 --incremental 一样判断哪些记录需要
+    重新应用、哪些 topic 需要重新生成。从变更数据中删除的记录不会撤销已经做出的修改。
+    """
+    global json_data, regenerate_topics
+    print(f"\n正在监视变更数据和模板（{type(watcher).__name__}），按 Ctrl+C 退出")
+    try:
+        while True:
+            changed = watcher.wait()
+            started = time.perf_counter()
+
+            changed_templates = [path for path in templates.values() if os.path.abspath(path) in changed]
+            if changed_templates:
+                # 模板只影响之后新建的 topic
+                forget_templates(changed_templates)
+                print(f"\n模板已更新：{', '.join(changed_templates)}")
+            if os.path.abspath(args.feed) not in changed:
+                continue
+
+            try:
+                # 以本次读取到的快照为准，应用期间的修改留给下一次处理
+                records = ChangeSet(ChangeFeed(args.feed))
+            except (OSError, ValueError) as e:
+                # 文件可能正在保存，等待下一次修改
+                print(f"\n无法读取变更数据，等待下一次修改：{str(e)}")
+                continue
+            pending = manifest.pending(records, record_targets, record_topic)
+            pending_count = len(records) - pending.skipped_count
+            if pending_count == 0:
+                print("\n变更数据中没有新增或修改的记录")
+                continue
+
+            print(f"\n检测到 {pending_count} 条需要应用的记录（新增、内容修改或涉及的文件已变化）")
+            report_changed(pending)
+            regenerate_topics = pending.regenerate
+            json_data = ChangeSet(pending)
+            # 其他程序修改过的文件重新读取，其余文件沿用已加载的树
+            for path in workspace.discard_changed():
+                print(f"文件已在外部修改，重新读取：{path}")
+
+            recorder.reset()
+            try:
+                apply_changes(workspace, args, templates, platform_configs, new_file_path, relations_path, datatype_path)
+            except Exception as e:
+                # 本次修改全部作废，下一次修改时重新应用这些记录
+                workspace.rollback()
+                print(f"执行过程中发生错误：{str(e)}")
+                continue
+
+            manifest.refresh(records, record_targets)
+            manifest.save()
+            print(f"已应用 {pending_count} 条记录，用时 {time.perf_counter() - started:.2f} 秒")
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+    finally:
+        watcher.close()
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='根据 data.json 更新 RTC-NG DITA 文件')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='并行处理各平台 ditamap 和 keysmap 的进程数，默认为 1（串行）')
+    parser.add_argument('--feed', default='data.json',
+                        help='变更数据文件，支持 data.json 格式和 JSON Lines（.jsonl），均为流式读取')
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'增量运行：跳过内容及涉及文件都未变化的变更记录，清单保存在 DITA 目录下的 {MANIFEST_NAME}')
+    parser.add_argument('--dry-run', nargs='?', const='-', metavar='DIFF_FILE',
+                        help='只在内存中修改，最后输出将要产生的 unified diff（默认输出到标准输出，可指定文件）')
+    parser.add_argument('--key-index', action='store_true',
+                        help=f'使用 DITA 目录下的 {KEY_INDEX_NAME} key 索引，跳过已包含所有 key 的 keysmap')
+    parser.add_argument('--watch', action='store_true',
+                        help='完成一次运行后持续监视变更数据和模板，只应用新增或修改的记录（Linux 下使用 inotify，否则轮询）')
+    parser.add_argument('--report', help='将各阶段的耗时、文件读写量和插入元素数写入 JSON 运行报告')
+    parser.add_argument('--trace', help='输出 Chrome trace 文件，可在 chrome://tracing 或 Perfetto 中查看')
+    parser.add_argument('--tree-render', action='store_true',
+                        help='新建 topic 时按原有方式逐个解析和修改模板，不使用预编译的字符串模板（用于核对输出）')
+    args = parser.parse_args()
+    if args.watch and args.dry_run is not None:
+        parser.error('--watch 不能与 --dry-run 同时使用')
+    return args
+
 def main():
+    global json_data, fast_render, regenerate_topics
+    args = parse_args()
+    fast_render = not args.tree_render
+    # 变更数据只读取一次，各阶段和运行后的增量清单都使用同一份快照，运行期间的修改留给下一次处理
+    records = ChangeSet(ChangeFeed(args.feed))
+    json_data = records
+
+    # 增量运行时只处理新增或变化的记录；--watch 没有指定 --incremental 时清单只保存在内存中
+    manifest = None
+    if args.incremental or args.watch:
+        manifest = RunManifest(os.path.join(base_dir, MANIFEST_NAME) if args.incremental else None, base_dir)
+    if args.incremental:
+        pending = manifest.pending(records, record_targets, record_topic)
+        regenerate_topics = pending.regenerate
+        print(f"增量运行：跳过 {pending.skipped_count} 条未变化的变更记录")
+        report_changed(pending)
+        json_data = ChangeSet(pending)
 
     # 定义模板文件路径
     templates = {
@@ -1467,16 +2041,7 @@ def main():
     }
 
     # 定义平台配置
-    platform_configs = [
-        {'platform': 'android', 'platform1': 'java', 'platform2': 'Android', 'platform3': 'android'},
-        {'platform': 'ios', 'platform1': 'ios', 'platform2': 'iOS', 'platform3': 'ios'},
-        {'platform': 'macos', 'platform1': 'macos', 'platform2': 'macOS', 'platform3': 'mac'},
-        {'platform': 'windows', 'platform1': 'cpp', 'platform2': 'CPP', 'platform3': 'cpp'},
-        {'platform': 'flutter', 'platform1': 'flutter', 'platform2': 'Flutter', 'platform3': 'flutter'},
-        {'platform': 'unity', 'platform1': 'unity', 'platform2': 'Unity', 'platform3': 'unity'},
-        {'platform': 'electron', 'platform1': 'electron', 'platform2': 'Electron', 'platform3': 'electron'},
-        {'platform': 'rn', 'platform1': 'rn', 'platform2': 'RN', 'platform3': 'rn'},
-    ]
+    platform_configs = PLATFORM_CONFIGS
 
     # 定义输出目录
     new_file_path = os.path.join(base_dir, 'RTC-NG/API')
@@ -1484,27 +2049,51 @@ def main():
     relations_path = os.path.join(base_dir, 'RTC-NG/config/relations-rtc-ng-api.ditamap')
     datatype_path = os.path.join(base_dir, 'RTC-NG/API/rtc_api_data_type.dita')
 
+    dry_run = args.dry_run is not None
+
     # 检查并创建输出目录
-    os.makedirs(new_file_path, exist_ok=True)
+    if not dry_run:
+        os.makedirs(new_file_path, exist_ok=True)
+
+    # 各阶段共享同一个 workspace，每个文件只解析一次；dry-run 时所有写入只保留在内存中
+    workspace = DitaWorkspace(dry_run=dry_run)
 
-    # 读取 JSON 数据
-    json_file_path = 'data.json'
+    # 监视从第一次运行开始前就生效，运行期间的修改不会遗漏
+    watcher = None
+    if args.watch:
+        watcher = make_watcher([args.feed] + list(templates.values()))
 
+    recorder.reset()
     try:
-        # 创建新的 DITA 文件
-        create_dita_files(json_file_path, templates, platform_configs, new_file_path)
+        apply_changes(workspace, args, templates, platform_configs, new_file_path, relations_path, datatype_path)
 
-        process_all_ditamaps()
-        parse_keysmaps()
-        insert_relations(relations_path)
-        insert_datatype(datatype_path)
-        modify_dita_files()
+        # 按本次应用的快照和运行后的文件内容更新增量清单
+        if manifest is not None and not dry_run:
+            manifest.refresh(records, record_targets)
+            manifest.save()
+            if manifest.path is not None:
+                print(f"已更新增量清单：{manifest.path}")
 
         print("所有操作已完成")
 
+        if watcher is not None:
+            watch(watcher, workspace, manifest, args, templates, platform_configs,
+                  new_file_path, relations_path, datatype_path)
+
     except Exception as e:
+        # 未提交的写入全部作废，磁盘上的文件保持运行前的状态
+        workspace.rollback()
         print(f"执行过程中发生错误：{str(e)}")
         raise
 
+    finally:
+        # 运行报告在出错时同样输出，便于定位耗时
+        if args.report:
+            recorder.write_report(args.report)
+            print(f"运行报告已写入：{args.report}")
+        if args.trace:
+            recorder.write_trace(args.trace)
+            print(f"Chrome trace 已写入：{args.trace}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,451 @@
+encoding = 'utf-8'
+# 性能基准：按 dita/RTC-NG 的结构生成放大后的语料和变更数据，分阶段统计耗时和峰值内存
+#
+# 用法：
+#     python bench.py                          # 默认 1×、10×、50× 三档
+#     python bench.py --scales 1 10 --output bench.json
+#     python bench.py --jobs 4 --tracemalloc
+#
+# 每一档在独立的子进程中运行，峰值内存互不影响；结果以 JSON 写入 --output。
+from lxml import etree
+import argparse
+import contextlib
+import copy
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，不统计 RSS
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DITA = os.path.join(SCRIPT_DIR, 'dita')
+
+RESULT_VERSION = 2
+
+# all-in-one.py main() 中依次执行的阶段
+ALL_IN_ONE_STAGES = ['create_dita_files', 'process_all_ditamaps', 'parse_keysmaps',
+                     'insert_relations', 'insert_datatype', 'modify_dita_files']
+# create-files.py main() 中逐条调用的处理函数
+CREATE_FILES_STAGES = ['process_api_change', 'process_enum_change', 'process_class_change']
+
+PLATFORMS = ['android', 'ios', 'windows', 'macos', 'flutter', 'unity', 'electron', 'rn']
+
+
+def replica_suffix(n):
+    return f"_b{n}"
+
+
+def replicate_topics(source_api_dir, target_api_dir, scale):
+    """复制 API 目录，每个 topic 额外生成 scale-1 份副本"""
+    os.makedirs(target_api_dir, exist_ok=True)
+    count = 0
+    for name in sorted(os.listdir(source_api_dir)):
+        source = os.path.join(source_api_dir, name)
+        if not os.path.isfile(source):
+            continue
+        shutil.copyfile(source, os.path.join(target_api_dir, name))
+        count += 1
+        if not name.endswith('.dita') or name == 'rtc_api_data_type.dita':
+            continue
+        stem = name[:-len('.dita')]
+        for n in range(1, scale):
+            shutil.copyfile(source, os.path.join(target_api_dir, f"{stem}{replica_suffix(n)}.dita"))
+            count += 1
+    return count
+
+
+def _suffix_href(href, suffix):
+    if href and href.startswith('../API/') and href.endswith('.dita'):
+        return href[:-len('.dita')] + suffix + '.dita'
+    return href
+
+
+def replicate_elements(path, tag, scale, rename, is_leaf=lambda element: True):
+    """将文件中的 tag 元素各复制 scale-1 份，插在原元素之后，返回原有元素数量"""
+    tree = etree.parse(path)
+    originals = [element for element in tree.getroot().iter(tag) if is_leaf(element)]
+    for element in originals:
+        anchor = element
+        for n in range(1, scale):
+            clone = copy.deepcopy(element)
+            rename(clone, replica_suffix(n))
+            anchor.addnext(clone)
+            anchor = clone
+    if scale > 1:
+        tree.write(path, encoding='UTF-8', xml_declaration=True)
+    return len(originals)
+
+
+def _rename_keydef(keydef, suffix):
+    keydef.set('keys', ' '.join(key + suffix for key in keydef.get('keys', '').split()))
+    if keydef.get('href'):
+        keydef.set('href', _suffix_href(keydef.get('href'), suffix))
+
+
+def _rename_keyrefs(element, suffix):
+    for child in element.iter():
+        if isinstance(child.tag, str) and child.get('keyref'):
+            child.set('keyref', child.get('keyref') + suffix)
+
+
+def generate_corpus(target_dir, scale):
+    """生成 scale 倍大小的语料，返回语料的规模统计"""
+    source_rtc = os.path.join(SOURCE_DITA, 'RTC-NG')
+    target_dita = os.path.join(target_dir, 'dita')
+    target_rtc = os.path.join(target_dita, 'RTC-NG')
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+
+    shutil.copytree(os.path.join(SOURCE_DITA, 'templates-cn'), os.path.join(target_dita, 'templates-cn'))
+    shutil.copytree(os.path.join(source_rtc, 'config'), os.path.join(target_rtc, 'config'))
+    for name in os.listdir(source_rtc):
+        if name.endswith('.ditamap'):
+            shutil.copyfile(os.path.join(source_rtc, name), os.path.join(target_rtc, name))
+
+    stats = {'scale': scale}
+    stats['topics'] = replicate_topics(os.path.join(source_rtc, 'API'), os.path.join(target_rtc, 'API'), scale)
+
+    config_dir = os.path.join(target_rtc, 'config')
+    keysmaps = sorted(name for name in os.listdir(config_dir) if name.startswith('keys-rtc-ng-api-'))
+    stats['keysmaps'] = len(keysmaps)
+    stats['keydefs'] = 0
+    for name in keysmaps:
+        stats['keydefs'] += scale * replicate_elements(os.path.join(config_dir, name), 'keydef', scale, _rename_keydef)
+
+    relations = os.path.join(config_dir, 'relations-rtc-ng-api.ditamap')
+    stats['relrows'] = scale * replicate_elements(relations, 'relrow', scale, _rename_keyrefs)
+
+    # ditamap 中只复制叶子 topicref，toc_href 对应的目录节点保持不变
+    stats['topicrefs'] = 0
+    for name in sorted(os.listdir(target_rtc)):
+        if name.startswith('RTC_NG_API_') and name.endswith('.ditamap'):
+            stats['topicrefs'] += scale * replicate_elements(
+                os.path.join(target_rtc, name), 'topicref', scale, _rename_keyrefs,
+                is_leaf=lambda element: element.get('keyref') and len(element) == 0)
+    return stats
+
+
+def _params(names, platforms):
+    return {p: [{"name": name, "type": "int", "desc": f"{name} desc", "change_type": "create"} for name in names]
+            for p in platforms}
+
+
+def generate_feed(dita_dir, records, seed=0):
+    """按 data.json 的格式生成变更数据：新建 API、类和枚举，以及修改已有 topic 的参数"""
+    rng = random.Random(seed)
+    rtc_dir = os.path.join(dita_dir, 'RTC-NG')
+
+    ios_map = etree.parse(os.path.join(rtc_dir, 'RTC_NG_API_iOS.ditamap')).getroot()
+    toc_hrefs = sorted({topicref.get('href') for topicref in ios_map.iter('topicref')
+                        if (topicref.get('href') or '').startswith('API/toc_')})
+    keysmap = etree.parse(os.path.join(rtc_dir, 'config', 'keys-rtc-ng-api-java.ditamap')).getroot()
+    navtitles = sorted({topichead.get('navtitle') for topichead in keysmap.iter('topichead')
+                        if topichead.get('navtitle')})
+
+    # 可被修改的已有 topic，文件名需要能反推出 key
+    api_topics = []
+    class_topics = []
+    for name in sorted(os.listdir(os.path.join(rtc_dir, 'API'))):
+        parts = name[:-len('.dita')].split('_')
+        if parts[0] == 'api' and len(parts) == 3:
+            api_topics.append(parts)
+        elif parts[0] == 'class' and len(parts) == 2:
+            class_topics.append(parts)
+
+    def platforms_for(i):
+        return ['all'] if i % 4 == 0 else rng.sample(PLATFORMS, 1 + i % 3)
+
+    feed = {'api_changes': [], 'struct_changes': [], 'enum_changes': []}
+    for i in range(records):
+        kind = i % 10
+        if kind < 5:
+            feed['api_changes'].append({
+                'key': f"benchApi{i}",
+                'api_signature': {p: f"void benchApi{i}()" for p in PLATFORMS},
+                'keyword': {p: f"benchApi{i}" for p in PLATFORMS},
+                'change_type': 'create',
+                'toc_href': rng.choice(toc_hrefs),
+                'parentclass': 'IRtcEngine',
+                'platforms': platforms_for(i),
+                'navtitle': rng.choice(navtitles),
+                'attributes': 'callback' if kind == 4 else 'api',
+                'description': {'shortdesc': f"bench api {i}",
+                                'detailed_desc': [{'since': '4.5', 'desc': f"detail {i}"}],
+                                'parameters': _params([f"p{i}", 'common'], ['ios', 'windows'])},
+            })
+        elif kind == 5:
+            feed['struct_changes'].append({
+                'key': f"BenchConfig{i}", 'change_type': 'create', 'toc_href': 'none', 'parentclass': 'none',
+                'platforms': platforms_for(i), 'navtitle': 'Classes', 'attributes': 'class',
+                'keyword': {p: f"BenchConfig{i}" for p in PLATFORMS},
+                'description': {'shortdesc': f"bench class {i}", 'detailed_desc': [{'since': '4.5', 'desc': 'd'}],
+                                'parameters': _params(['f1', f"f{i}"], ['ios', 'windows'])},
+            })
+        elif kind == 6:
+            feed['enum_changes'].append({
+                'key': f"BENCH_ENUM_{i}", 'change_type': 'create', 'toc_href': 'none', 'parentclass': 'none',
+                'platforms': platforms_for(i), 'navtitle': 'Enums', 'attributes': 'enum',
+                'keyword': {p: f"BENCH_ENUM_{i}" for p in PLATFORMS},
+                'description': {'shortdesc': f"bench enum {i}", 'detailed_desc': [{'since': '4.5', 'desc': 'd'}],
+                                'enumerations': {p: [{'alias': f"BE{i}_A", 'value': '0', 'desc': 'a',
+                                                      'change_type': 'create'}]
+                                                 for p in ['ios', 'windows']}},
+            })
+        elif kind < 9 and api_topics:
+            _, parentclass, key = rng.choice(api_topics)
+            feed['api_changes'].append({
+                'key': key, 'change_type': 'modify', 'toc_href': rng.choice(toc_hrefs), 'parentclass': parentclass,
+                'platforms': platforms_for(i), 'navtitle': rng.choice(navtitles), 'attributes': 'api',
+                'keyword': {'ios': key},
+                'description': {'parameters': _params([f"benchParam{i}"], ['ios', 'windows'])},
+            })
+        elif class_topics:
+            _, key = rng.choice(class_topics)
+            feed['struct_changes'].append({
+                'key': key, 'change_type': 'modify', 'toc_href': 'none', 'parentclass': 'none',
+                'platforms': platforms_for(i), 'navtitle': 'Classes', 'attributes': 'class',
+                'keyword': {'ios': key},
+                'description': {'parameters': _params([f"benchField{i}"], ['ios', 'windows'])},
+            })
+    return feed
+
+
+def expected_topics(feed):
+    """变更数据中 create 记录应生成的 topic 文件名，与 all-in-one.py 和 create-files.py 的命名一致"""
+    names = []
+    for record in feed['api_changes']:
+        if record['change_type'] == 'create':
+            prefix = 'callback' if record['attributes'] == 'callback' else 'api'
+            names.append(f"{prefix}_{record['parentclass']}_{record['key']}.dita".lower())
+    for record in feed['enum_changes']:
+        if record['change_type'] == 'create':
+            names.append(f"enum_{record['key'].replace('-', '').lower()}.dita")
+    for record in feed['struct_changes']:
+        if record['change_type'] == 'create':
+            names.append(f"class_{record['key'].lower()}.dita")
+    return names
+
+
+def check_created(directory, names, target):
+    """确认每个 create 记录都生成了 topic，否则基准测到的只是出错路径"""
+    missing = [name for name in names if not os.path.exists(os.path.join(directory, name))]
+    if missing:
+        raise RuntimeError(f"{target} 没有生成 {len(missing)}/{len(names)} 个 topic，例如：{', '.join(missing[:5])}")
+
+
+def peak_rss_kb(who=None):
+    """进程的峰值常驻内存（KB），不支持时返回 None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # macOS 的 ru_maxrss 以字节为单位
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+class StageTimer:
+    """替换模块中的阶段函数，累计每个阶段的耗时、调用次数和内存
+
+    ru_maxrss 是整个进程生命周期内的峰值，只会增长：cumulative_peak_rss_kb 为阶段结束时的该值，
+    peak_rss_growth_kb 为阶段执行期间峰值的增长量，即该阶段把内存峰值推高了多少。
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def wrap(self, module, names):
+        for name in names:
+            setattr(module, name, self._timed(name, getattr(module, name)))
+
+    def _timed(self, name, func):
+        def timed(*args, **kwargs):
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+            rss_before = peak_rss_kb()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+                stage['seconds'] += elapsed
+                stage['calls'] += 1
+                rss_after = peak_rss_kb()
+                if rss_after is not None:
+                    stage['cumulative_peak_rss_kb'] = rss_after
+                    stage['peak_rss_growth_kb'] = stage.get('peak_rss_growth_kb', 0) + rss_after - rss_before
+                if self.trace_memory:
+                    peak = tracemalloc.get_traced_memory()[1] // 1024
+                    stage['peak_traced_kb'] = max(stage.get('peak_traced_kb', 0), peak)
+        return timed
+
+
+def load_script(name, file_name):
+    """以独立模块加载带连字符文件名的脚本"""
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    # --jobs 的子进程需要按模块名找到任务函数
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_all_in_one(corpus_dir, jobs, timer):
+    module = load_script('all_in_one', 'all-in-one.py')
+    module.base_dir = os.path.join(corpus_dir, 'dita')
+    timer.wrap(module, ALL_IN_ONE_STAGES)
+    module.DitaWorkspace.flush = timer._timed('workspace_flush', module.DitaWorkspace.flush)
+    module.DitaWorkspace.commit = timer._timed('workspace_commit', module.DitaWorkspace.commit)
+
+    argv = sys.argv
+    sys.argv = ['all-in-one.py', '--feed', os.path.join(corpus_dir, 'data.json'), '--jobs', str(jobs)]
+    try:
+        module.main()
+    finally:
+        sys.argv = argv
+
+
+def run_create_files(corpus_dir, timer):
+    module = load_script('create_files', 'create-files.py')
+    templates_dir = os.path.join(corpus_dir, 'dita', 'templates-cn', 'RTC')
+    module.method_template = os.path.join(templates_dir, 'Method.dita')
+    module.callback_template = os.path.join(templates_dir, 'Callback.dita')
+    module.enum_template = os.path.join(templates_dir, 'Enum.dita')
+    module.class_template = os.path.join(templates_dir, 'Class.dita')
+    # create-files.py 从脚本所在目录读取 data.json
+    module.__file__ = os.path.join(corpus_dir, 'create-files.py')
+    timer.wrap(module, CREATE_FILES_STAGES)
+
+    # 处理函数从模块全局变量读取输出目录
+    new_file_path = os.path.join(corpus_dir, 'create-files-output')
+    os.makedirs(new_file_path, exist_ok=True)
+    module.new_file_path = new_file_path
+    platform_configs = [{'platform': 'android', 'platform1': 'java', 'platform2': 'Android', 'platform3': 'android'},
+                        {'platform': 'ios', 'platform1': 'ios', 'platform2': 'iOS', 'platform3': 'ios'},
+                        {'platform': 'windows', 'platform1': 'cpp', 'platform2': 'CPP', 'platform3': 'cpp'}]
+    module.main(platform_configs, new_file_path)
+
+
+def measure(corpus_dir, target, jobs=1, trace_memory=False):
+    """在当前进程中运行一个入口，返回耗时和内存统计；脚本输出丢弃"""
+    timer = StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        if target == 'all-in-one':
+            run_all_in_one(corpus_dir, jobs, timer)
+        else:
+            run_create_files(corpus_dir, timer)
+    result = {
+        'total_seconds': time.perf_counter() - start,
+        'peak_rss_kb': peak_rss_kb(),
+        'stages': timer.stages,
+    }
+    if resource is not None and jobs > 1:
+        result['children_peak_rss_kb'] = peak_rss_kb(resource.RUSAGE_CHILDREN)
+    if trace_memory:
+        result['peak_traced_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def run_in_subprocess(corpus_dir, target, jobs, trace_memory):
+    command = [sys.executable, os.path.abspath(__file__), '--measure', corpus_dir, '--target', target,
+               '--jobs', str(jobs)]
+    if trace_memory:
+        command.append('--tracemalloc')
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True, text=True, encoding='utf-8')
+    return json.loads(completed.stdout)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='all-in-one.py 和 create-files.py 的性能基准')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 50],
+                        help='语料相对 dita/RTC-NG 的放大倍数，默认 1 10 50')
+    parser.add_argument('--records', type=int, default=40,
+                        help='1× 语料对应的变更记录数，按倍数放大，默认 40')
+    parser.add_argument('--jobs', type=int, default=1, help='传给 all-in-one.py 的 --jobs')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='额外统计 Python 堆的峰值（lxml 的内存不计入，且会拖慢运行）')
+    parser.add_argument('--workdir', help='语料生成目录，默认使用临时目录并在结束后删除')
+    parser.add_argument('--output', default='bench-results.json', help='JSON 结果文件')
+    parser.add_argument('--seed', type=int, default=0, help='变更数据的随机种子')
+    # 内部使用：在子进程中测量单个语料
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--target', choices=['all-in-one', 'create-files'], help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.measure:
+        json.dump(measure(args.measure, args.target, args.jobs, args.tracemalloc), sys.stdout)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='dita-bench-')
+    report = {
+        'version': RESULT_VERSION,
+        'python': platform.python_version(),
+        'lxml': '.'.join(str(part) for part in etree.LXML_VERSION),
+        'platform': platform.platform(),
+        'jobs': args.jobs,
+        'results': [],
+    }
+
+    try:
+        for scale in args.scales:
+            corpus_dir = os.path.join(workdir, f"scale-{scale}")
+            print(f"生成 {scale}× 语料：{corpus_dir}")
+            start = time.perf_counter()
+            corpus = generate_corpus(corpus_dir, scale)
+            feed = generate_feed(os.path.join(corpus_dir, 'dita'), args.records * scale, args.seed)
+            with open(os.path.join(corpus_dir, 'data.json'), 'w', encoding='utf-8') as f:
+                json.dump(feed, f, ensure_ascii=False, indent=2)
+            corpus['records'] = sum(len(records) for records in feed.values())
+            corpus['generate_seconds'] = time.perf_counter() - start
+
+            # create-files.py 先运行，all-in-one.py 会修改语料本身
+            entry = dict(corpus)
+            topics = expected_topics(feed)
+            entry['create_files'] = run_in_subprocess(corpus_dir, 'create-files', 1, args.tracemalloc)
+            check_created(os.path.join(corpus_dir, 'create-files-output'), topics, 'create-files.py')
+            entry['all_in_one'] = run_in_subprocess(corpus_dir, 'all-in-one', args.jobs, args.tracemalloc)
+            check_created(os.path.join(corpus_dir, 'dita', 'RTC-NG', 'API'), topics, 'all-in-one.py')
+            report['results'].append(entry)
+
+            print(f"  topics={corpus['topics']} keydefs={corpus['keydefs']} relrows={corpus['relrows']} "
+                  f"records={corpus['records']}")
+            for target in ['all_in_one', 'create_files']:
+                result = entry[target]
+                print(f"  {target}: {result['total_seconds']:.2f}s, peak RSS {result['peak_rss_kb']} KB")
+                for name, stage in result['stages'].items():
+                    growth = stage.get('peak_rss_growth_kb')
+                    print(f"    {name:<24} {stage['seconds']:8.3f}s  x{stage['calls']}"
+                          + ('' if growth is None else f"  peak RSS +{growth} KB"))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+encoding = 'utf-8'
+import json
+import os
+import tempfile
+import weakref
+from array import array
+from platforms import PLATFORMS, PLATFORMS_BY_NAME, platform_mask
+
+CHANGE_TYPES = ['api_changes', 'struct_changes', 'enum_changes']
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class ChangeFeed:
+    """变更数据的流式读取，逐条产出记录，不把整个文件载入内存
+
+    支持两种格式：
+    - data.json 格式：{"api_changes": [...], "struct_changes": [...], "enum_changes": [...]}，
+      使用增量解析，每次只解码一条记录；
+    - JSON Lines（.jsonl / .ndjson）：每行一个 {"api_changes": {...}} 形式的对象。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.endswith(('.jsonl', '.ndjson'))
+
+    def __iter__(self):
+        """按文件顺序产出 (change_type, record)"""
+        if self.jsonl:
+            return self._iter_jsonl()
+        return self._iter_json()
+
+    def get(self, change_type):
+        """按文件顺序产出指定类型的记录"""
+        return (record for record_type, record in self if record_type == change_type)
+
+    def _iter_jsonl(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise json.JSONDecodeError(f"第 {line_number} 行：{e.msg}", e.doc, e.pos)
+                for change_type, record in entry.items():
+                    yield change_type, record
+
+    def _iter_json(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            reader = _IncrementalReader(f)
+            reader.expect('{')
+            if reader.consume('}'):
+                return
+            while True:
+                change_type = reader.decode()
+                reader.expect(':')
+                if reader.consume('['):
+                    # 逐条解码数组中的记录
+                    if not reader.consume(']'):
+                        while True:
+                            yield change_type, reader.decode()
+                            if reader.consume(']'):
+                                break
+                            reader.expect(',')
+                else:
+                    # 非数组的顶层字段不属于变更记录，直接跳过
+                    reader.decode()
+                if reader.consume('}'):
+                    return
+                reader.expect(',')
+
+
+class _IncrementalReader:
+    """按块读取文件的 JSON 解码器，已解码的内容会被丢弃以保持内存占用稳定"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def consume(self, char):
+        """下一个非空白字符是 char 时将其消费并返回 True"""
+        self._skip_whitespace()
+        if self.buffer[self.pos:self.pos + 1] == char:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.consume(char):
+            found = self.buffer[self.pos:self.pos + 1] or 'EOF'
+            raise json.JSONDecodeError(f"Expecting '{char}', found '{found}'", self.buffer, self.pos)
+
+    def decode(self):
+        """解码下一个完整的 JSON 值；缓冲区中的内容不完整时继续读取"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # 数字等标量可能恰好在块边界被截断，需要确认后面还有内容
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+class ChangeRecord:
+    """一条变更记录加上预先计算的平台位掩码"""
+
+    __slots__ = ('change_type', 'data', 'mask', 'platforms', 'all_platforms')
+
+    def __init__(self, change_type, data):
+        names = data.get('platforms', [])
+        self.change_type = change_type
+        self.data = data
+        self.mask = platform_mask(names)
+        # 记录中列出的平台，保持原有顺序
+        self.platforms = tuple(PLATFORMS_BY_NAME[name] for name in names if name in PLATFORMS_BY_NAME)
+        self.all_platforms = 'all' in names
+
+    def platform_values(self, field):
+        """记录涉及的各平台的 field（如 platform1）值；platforms 为 "all" 时按平台表的顺序"""
+        platforms = PLATFORMS if self.all_platforms else self.platforms
+        return [getattr(platform, field) for platform in platforms if getattr(platform, field) is not None]
+
+
+class ChangeSet:
+    """各阶段共享的变更数据；接口与 ChangeFeed 一致
+
+    构造时把 feed 流式读取一遍，逐条写入临时快照文件（JSON Lines）。get() 和遍历时从快照流式读取，
+    运行期间变更数据被修改不影响本次运行，各阶段和运行后的增量清单看到的都是同一份记录。
+    内存中每条记录只保留类型和平台位掩码两个数，各阶段按它们筛选，只解码需要的记录，
+    内存占用不随记录内容增长。
+    feed 可以是 ChangeFeed、PendingChanges 或列表等任何产出 (change_type, record) 的对象。
+    """
+
+    def __init__(self, feed):
+        self._types = list(CHANGE_TYPES)
+        self._kinds = array('B')
+        self._masks = array('L')
+        fd, self._path = tempfile.mkstemp(prefix='changefeed-', suffix='.jsonl')
+        # 对象被回收或进程退出时删除快照
+        self._cleanup = weakref.finalize(self, _remove_snapshot, self._path)
+        with open(fd, 'w', encoding='utf-8') as f:
+            for change_type, data in feed:
+                f.write(json.dumps(data, ensure_ascii=False))
+                f.write('\n')
+                if change_type not in self._types:
+                    self._types.append(change_type)
+                self._kinds.append(self._types.index(change_type))
+                self._masks.append(platform_mask(data.get('platforms', [])))
+
+    def __iter__(self):
+        """按原有顺序产出完整的 (change_type, record)"""
+        return self._read(lambda kind, mask: True)
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def get(self, change_type):
+        """按原有顺序产出指定类型的完整记录"""
+        return (record for _, record in self._select(change_type))
+
+    def records(self, change_type):
+        """按原有顺序产出指定类型的 ChangeRecord"""
+        return (ChangeRecord(change_type, record) for _, record in self._select(change_type))
+
+    def for_platform(self, platform, change_types=CHANGE_TYPES):
+        return PlatformView(self, platform, change_types)
+
+    def count(self, change_type, bit):
+        """指定类型中涉及平台位 bit 的记录数，不读取快照"""
+        if change_type not in self._types:
+            return 0
+        wanted = self._types.index(change_type)
+        return sum(1 for kind, mask in zip(self._kinds, self._masks) if kind == wanted and mask & bit)
+
+    def _select(self, change_type, bit=None):
+        if change_type not in self._types:
+            return iter(())
+        wanted = self._types.index(change_type)
+        if bit is None:
+            return self._read(lambda kind, mask: kind == wanted)
+        return self._read(lambda kind, mask: kind == wanted and mask & bit)
+
+    def _read(self, wanted):
+        """按原有顺序产出 wanted(kind, mask) 为真的 (change_type, record)，其余记录只读取不解码"""
+        with open(self._path, 'rb') as f:
+            for kind, mask, line in zip(self._kinds, self._masks, f):
+                if wanted(kind, mask):
+                    yield self._types[kind], json.loads(line)
+
+
+def _remove_snapshot(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class PlatformView:
+    """某个平台相关的变更记录视图，按位掩码从共享的快照中筛选记录，不复制数据"""
+
+    __slots__ = ('changes', 'platform', 'change_types')
+
+    def __init__(self, changes, platform, change_types=CHANGE_TYPES):
+        self.changes = changes
+        self.platform = platform
+        self.change_types = change_types
+
+    def __iter__(self):
+        for change_type in self.change_types:
+            for _, record in self.changes._select(change_type, self.platform.bit):
+                yield record
+
+    def __len__(self):
+        return sum(self.changes.count(change_type, self.platform.bit) for change_type in self.change_types)
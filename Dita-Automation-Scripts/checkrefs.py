@@ -0,0 +1,271 @@
+encoding = 'utf-8'
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from ditaval import ProfileSet, DITAVAL_PATTERN
+from parsecache import ParseCache, PARSE_CACHE_DIR
+
+# 各平台的根 map，平台名取中间部分
+PLATFORM_MAP_PATTERN = re.compile(r'^RTC_NG_API_(.+)\.ditamap$')
+
+# 根 map 的平台名与 DITAVAL profile 名不一致的情况，其余为平台名的小写
+MAP_PROFILES = {'Blueprint': 'bp', 'macOS': 'mac'}
+
+# 子进程中使用的 DITAVAL 规则，由 _init_worker 加载
+_profiles = None
+
+
+def _init_worker(config_dir):
+    global _profiles
+    _profiles = ProfileSet.load(config_dir)
+
+
+def is_local_href(element):
+    """href 指向本地文件（而不是外部链接）"""
+    href = element.get('href')
+    if not href or element.get('scope') == 'external' or '://' in href or href.startswith('mailto:'):
+        return False
+    return element.get('format') in (None, 'dita', 'ditamap')
+
+
+def resolve_href(base_path, href):
+    """href 相对所在文件解析为绝对路径，去掉 # 后的元素定位"""
+    return os.path.normpath(os.path.join(os.path.dirname(base_path), href.split('#', 1)[0]))
+
+
+def scan_file(path):
+    """解析一个 topic 或 map，返回其中的 key 引用和本地文件引用
+
+    keyrefs 为 [(key, 行号, 保留掩码)]，hrefs 为 [(href, 行号, 保留掩码, 文件是否存在)]，
+    掩码的第 i 位表示该引用在第 i 个 profile 中保留。
+    """
+    keyrefs = []
+    hrefs = []
+    root = etree.parse(path).getroot()
+    for element, mask in _profiles.evaluate(root):
+        if not mask:
+            continue
+        keyref = element.get('keyref')
+        if keyref:
+            keyrefs.append((keyref.split('/', 1)[0], element.sourceline, mask))
+        conkeyref = element.get('conkeyref')
+        if conkeyref:
+            keyrefs.append((conkeyref.split('/', 1)[0], element.sourceline, mask))
+        if is_local_href(element):
+            href = element.get('href')
+            hrefs.append((href, element.sourceline, mask, os.path.exists(resolve_href(path, href))))
+        conref = element.get('conref')
+        if conref and not conref.startswith('#'):
+            hrefs.append((conref, element.sourceline, mask, os.path.exists(resolve_href(path, conref))))
+    return keyrefs, hrefs
+
+
+def read_map(path, profiles):
+    """提取 map 中带 keys、本地 href 或 keyref 的元素
+
+    返回 [(保留掩码, tag, keys, href 解析后的路径, format, keyref)]，按文档顺序排列。
+    """
+    entries = []
+    root = etree.parse(path).getroot()
+    for element, mask in profiles.evaluate(root):
+        if not mask:
+            continue
+        keys = tuple((element.get('keys') or '').split())
+        href = resolve_href(path, element.get('href')) if is_local_href(element) else None
+        keyref = element.get('keyref')
+        if keys or href or keyref:
+            entries.append((mask, element.tag, keys, href, element.get('format'), keyref))
+    return entries
+
+
+class PlatformSpace:
+    """一个平台的 key 空间和参与构建的文件，由平台根 map 一次构建"""
+
+    def __init__(self, name, profile, bit, map_path):
+        self.name = name
+        self.profile = profile
+        self.bit = bit
+        self.map_path = map_path
+        # key -> 定义中 href 指向的文件（没有 href 时为 None），先定义者优先
+        self.keys = {}
+        self.files = [map_path]
+
+    def _add_keys(self, entries):
+        for mask, _, keys, href, _, _ in entries:
+            if not mask & self.bit:
+                continue
+            for key in keys:
+                if key not in self.keys:
+                    self.keys[key] = href
+
+    def build(self, read):
+        """read(path) 返回 read_map 格式的结果"""
+        entries = read(self.map_path)
+        topics = []
+        keyref_topics = []
+        submaps = []
+        for mask, tag, _, href, format, keyref in entries:
+            if not mask & self.bit:
+                continue
+            if href is not None:
+                if format == 'ditamap':
+                    submaps.append(href)
+                else:
+                    topics.append(href)
+            elif keyref and tag == 'topicref':
+                keyref_topics.append(keyref)
+
+        # 按 map 中出现的顺序收集 key 定义
+        self._add_keys(entries)
+        for submap in submaps:
+            if os.path.exists(submap):
+                self._add_keys(read(submap))
+                self.files.append(submap)
+
+        # 通过 keyref 引用的 topic 取 key 定义中的 href
+        for key in keyref_topics:
+            path = self.keys.get(key)
+            if path is not None:
+                topics.append(path)
+        self.files.extend(path for path in dict.fromkeys(topics) if os.path.exists(path))
+        return self
+
+
+def platform_spaces(base_dir, profiles, only=None, cache=None):
+    """为 base_dir 下每个平台根 map 构建 key 空间"""
+    maps = {}
+
+    def read(path):
+        # 同一个 map 被多个平台引用时只读取一次
+        if path not in maps:
+            extract = lambda path: read_map(path, profiles)
+            maps[path] = cache.load(path, extract) if cache is not None else extract(path)
+        return maps[path]
+
+    spaces = []
+    for file_name in sorted(os.listdir(base_dir)):
+        match = PLATFORM_MAP_PATTERN.match(file_name)
+        if not match:
+            continue
+        name = match.group(1)
+        profile = MAP_PROFILES.get(name, name.lower())
+        if profile not in profiles.names or (only and name not in only):
+            continue
+        bit = profiles.mask_of([profile])
+        spaces.append(PlatformSpace(name, profile, bit, os.path.join(base_dir, file_name)).build(read))
+    return spaces
+
+
+def check(base_dir, config_dir, jobs=None, only=None, cache_dir=None):
+    """返回 {平台: {'keyrefs': [...], 'hrefs': [...]}}，列出每个平台中无法解析的引用
+
+    指定 cache_dir 时，未变化文件的解析结果从缓存读取；DITAVAL 变化时缓存整体失效。
+    """
+    profiles = ProfileSet.load(config_dir)
+    map_cache = file_cache = None
+    if cache_dir is not None:
+        ditavals = [os.path.join(config_dir, name) for name in sorted(os.listdir(config_dir))
+                    if DITAVAL_PATTERN.match(name)]
+        map_cache = ParseCache(cache_dir, 'checkrefs-maps', ditavals)
+        file_cache = ParseCache(cache_dir, 'checkrefs-files', ditavals)
+    spaces = platform_spaces(base_dir, profiles, only, map_cache)
+
+    # 每个文件只解析一次，结果按平台分别检查
+    files = sorted({path for space in spaces for path in space.files})
+    scanned = {}
+    if file_cache is not None:
+        for path in files:
+            data = file_cache.get(path)
+            if data is not None:
+                scanned[path] = data
+    missing = [path for path in files if path not in scanned]
+    if jobs == 1 or len(missing) < 2:
+        _init_worker(config_dir)
+        scanned.update(zip(missing, map(scan_file, missing)))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(config_dir,)) as executor:
+            scanned.update(zip(missing, executor.map(scan_file, missing, chunksize=16)))
+
+    if cache_dir is not None:
+        for path in missing:
+            file_cache.put(path, scanned[path])
+        map_cache.save()
+        file_cache.save()
+
+    results = {}
+    for space in spaces:
+        broken_keyrefs = []
+        broken_hrefs = []
+        for path in space.files:
+            name = os.path.relpath(path, base_dir).replace(os.sep, '/')
+            keyrefs, hrefs = scanned[path]
+            for key, line, mask in keyrefs:
+                if mask & space.bit and key not in space.keys:
+                    broken_keyrefs.append({'file': name, 'line': line, 'keyref': key})
+            for href, line, mask, exists in hrefs:
+                if mask & space.bit and not exists:
+                    broken_hrefs.append({'file': name, 'line': line, 'href': href})
+        results[space.name] = {'files': len(space.files), 'keys': len(space.keys),
+                               'keyrefs': broken_keyrefs, 'hrefs': broken_hrefs}
+    return results
+
+
+def parse_args():
+    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dita', 'RTC-NG')
+    parser = argparse.ArgumentParser(description='检查各平台构建中无法解析的 keyref 和指向不存在文件的 href')
+    parser.add_argument('--dir', default=base_dir, help='平台根 map 所在目录')
+    parser.add_argument('--config', help='DITAVAL 所在目录，默认为 --dir 下的 config')
+    parser.add_argument('--platform', action='append', help='只检查该平台（根 map 名中的平台名，如 Android），可重复指定')
+    parser.add_argument('--jobs', type=int, default=None, help='并行解析文件的进程数，默认为 CPU 核数')
+    parser.add_argument('--cache', nargs='?', const='', metavar='DIR',
+                        help=f'缓存未变化文件的解析结果，默认保存在 DITA 目录下的 {PARSE_CACHE_DIR}')
+    parser.add_argument('--json', help='将检查结果写入 JSON 文件')
+    parser.add_argument('--summary', action='store_true', help='只输出每个平台的统计，不列出具体引用')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config_dir = args.config or os.path.join(args.dir, 'config')
+
+    cache_dir = None
+    if args.cache is not None:
+        cache_dir = args.cache or os.path.join(os.path.dirname(os.path.abspath(args.dir)), PARSE_CACHE_DIR)
+
+    start = time.perf_counter()
+    results = check(args.dir, config_dir, args.jobs, args.platform, cache_dir)
+    elapsed = time.perf_counter() - start
+
+    broken_total = 0
+    for platform, result in results.items():
+        broken_total += len(result['keyrefs']) + len(result['hrefs'])
+        if args.summary or not (result['keyrefs'] or result['hrefs']):
+            continue
+        print(f"\n=== {platform} 无法解析的引用 ===")
+        for entry in result['keyrefs']:
+            print(f"{entry['file']}:{entry['line']}: keyref '{entry['keyref']}' 未定义")
+        for entry in result['hrefs']:
+            print(f"{entry['file']}:{entry['line']}: href '{entry['href']}' 指向的文件不存在")
+
+    print(f"\n{'platform':<12} {'files':>6} {'keys':>6} {'keyrefs':>8} {'hrefs':>6}")
+    for platform, result in results.items():
+        print(f"{platform:<12} {result['files']:>6} {result['keys']:>6} "
+              f"{len(result['keyrefs']):>8} {len(result['hrefs']):>6}")
+    print(f"检查完成，用时 {elapsed:.2f} 秒")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+    if broken_total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
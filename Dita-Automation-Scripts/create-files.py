@@ -2,24 +2,26 @@ encoding = 'utf-8'
 from lxml import etree
 import json
 import os
+from topictemplates import new_from_template
+from changefeed import ChangeFeed
 
 def create_dita_file(template_path, new_file_path):
-    """创建新的 dita 文件"""
+    """从缓存的模板创建新 dita 文件的内存树，文件已存在时返回 None"""
     # 检查文件是否已存在
     if os.path.exists(new_file_path):
         print(f"警告：文件已存在，跳过创建：{new_file_path}")
-        return False
-        
+        return None
+
     try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        with open(new_file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-            print(f"成功创建文件：{new_file_path}")
-        return True
+        return new_from_template(template_path)
     except Exception as e:
         print(f"创建文件时出错：{str(e)}")
-        return False
+        return None
+
+def write_dita_file(tree, new_file_path):
+    """将填充好的 dita 文件一次性写入磁盘"""
+    tree.write(new_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    print(f"成功创建文件：{new_file_path}")
 
 def get_platform_prop(platform, platform_configs):
     """根据平台获取对应的 platform3 值"""
@@ -28,111 +30,144 @@ def get_platform_prop(platform, platform_configs):
             return config['platform3']
     return platform
 
-def update_parameters_section(parameters_section, params_data, platform, platform_configs):
-    """更新参数部分"""
-    if not params_data or platform not in params_data:
+# 参数部分中反复使用的查找，预先编译
+find_plentries = etree.XPath('plentry')
+find_pts = etree.XPath('pt')
+find_pds = etree.XPath('pd')
+
+def is_empty_plentry(plentry):
+    """模板中的空 plentry：缺少 pt 或 pd，或者 pt 和 pd 都没有文本内容"""
+    pts = find_pts(plentry)
+    pds = find_pds(plentry)
+    if not pts or not pds:
+        return True
+    return all(not pt.text for pt in pts) and all(not pd.text for pd in pds)
+
+def indent_plentry(plentry):
+    """为 plentry 及其子元素设置统一的缩进"""
+    plentry.tail = '\n            '
+    for elem in plentry:
+        elem.tail = '\n                '
+    # 最后一个元素的 tail 需要调整缩进级别
+    if len(plentry) > 0:
+        plentry[-1].tail = '\n            '
+
+def update_parameters_section(parameters_section, params_data, platform_configs):
+    """依次将各平台的参数合并到参数部分
+
+    parml 中已有的 plentry 只在处理第一个平台时清理、整理缩进并按参数名建立索引，
+    之后的平台直接按参数名查找，只重新整理上一个平台修改过的 plentry。
+    """
+    if not params_data:
         return
-    
-    platform_prop = get_platform_prop(platform, platform_configs)
+
+    parml = None
     existing_params = {}
-    
-    # 找到 parml 元素
-    parml = parameters_section.find('parml')
-    if parml is None:
-        parml = etree.SubElement(parameters_section, 'parml')
-    else:
-        # 清除模板中的空 plentry
-        for empty_plentry in parml.findall('plentry'):
-            if not empty_plentry.findall('pt') or not empty_plentry.findall('pd'):
-                parml.remove(empty_plentry)
+    touched = []
+
+    for platform in params_data:
+        platform_prop = get_platform_prop(platform, platform_configs)
+
+        if parml is None:
+            # 找到 parml 元素
+            parml = parameters_section.find('parml')
+            if parml is None:
+                parml = etree.SubElement(parameters_section, 'parml')
             else:
-                # 检查 pt 和 pd 是否为空（没有文本内容）
-                pts = empty_plentry.findall('pt')
-                pds = empty_plentry.findall('pd')
-                if all(not pt.text for pt in pts) and all(not pd.text for pd in pds):
-                    parml.remove(empty_plentry)
-    
-    # 添加换行和缩进
-    parml.text = '\n            '  # parml 后的首次换行
-    
-    # 收集现有参数信息
-    for plentry in parml.findall('plentry'):
-        pts = plentry.findall('pt')
-        for pt in pts:
-            name = pt.text
-            if name:  # 只处理非空参数名
-                existing_params[name] = plentry
-                
-        # 为现有的 plentry 添加合适的缩进
-        plentry.tail = '\n            '
-        for elem in plentry:
-            elem.tail = '\n                '
-        # 最后一个元素的 tail 需要调整缩进级别
-        if len(plentry) > 0:
-            plentry[-1].tail = '\n            '
-    
-    # 处理新参数
-    for param in params_data[platform]:
-        if param['change_type'] != 'create':
-            continue
-            
-        param_name = param['name']
-        param_desc = param['desc']
-        
-        if param_name in existing_params:
-            # 更新现有参数
-            plentry = existing_params[param_name]
-            pt_found = False
-            pd_found = False
-            
-            for pt in plentry.findall('pt'):
-                if pt.text == param_name:
-                    props = pt.get('props', '').split()
-                    if platform_prop not in props:
-                        props.append(platform_prop)
-                        pt.set('props', ' '.join(props))
-                    pt_found = True
-                    
-            for pd in plentry.findall('pd'):
-                if pd.text == param_desc:
-                    props = pd.get('props', '').split()
-                    if platform_prop not in props:
-                        props.append(platform_prop)
-                        pd.set('props', ' '.join(props))
-                    pd_found = True
-            
-            if not pt_found:
-                new_pt = etree.SubElement(plentry, 'pt')
-                new_pt.text = param_name
-                new_pt.set('props', platform_prop)
-                new_pt.tail = '\n                '
-                
-            if not pd_found:
-                new_pd = etree.SubElement(plentry, 'pd')
-                new_pd.text = param_desc
-                new_pd.set('props', platform_prop)
-                new_pd.tail = '\n            '
+                # 清除模板中的空 plentry
+                for empty_plentry in find_plentries(parml):
+                    if is_empty_plentry(empty_plentry):
+                        parml.remove(empty_plentry)
+
+            # 收集现有参数信息，并为现有的 plentry 添加合适的缩进
+            for plentry in find_plentries(parml):
+                for pt in find_pts(plentry):
+                    name = pt.text
+                    if name:  # 只处理非空参数名
+                        existing_params[name] = plentry
+                indent_plentry(plentry)
         else:
-            # 创建新参数
-            plentry = etree.SubElement(parml, 'plentry')
-            plentry.text = '\n                '
-            plentry.tail = '\n            '
-            
-            pt = etree.SubElement(plentry, 'pt')
-            pt.text = param_name
-            pt.set('props', platform_prop)
-            pt.tail = '\n                '
-            
-            pd = etree.SubElement(plentry, 'pd')
-            pd.text = param_desc
-            pd.set('props', platform_prop)
-            pd.tail = '\n            '
-            
-            existing_params[param_name] = plentry
-    
-    # 调整最后一个 plentry 的缩进
-    if len(parml) > 0:
-        parml[-1].tail = '\n        '
+            # 上一个平台修改过的 plentry 重新清理和整理缩进，其余 plentry 不变
+            for plentry in touched:
+                if plentry.getparent() is not parml:
+                    continue
+                if is_empty_plentry(plentry):
+                    parml.remove(plentry)
+                else:
+                    indent_plentry(plentry)
+            # 索引中只保留非空参数名
+            existing_params.pop('', None)
+            existing_params.pop(None, None)
+        touched = []
+
+        # 添加换行和缩进
+        parml.text = '\n            '  # parml 后的首次换行
+
+        # 处理新参数
+        for param in params_data[platform]:
+            if param['change_type'] != 'create':
+                continue
+
+            param_name = param['name']
+            param_desc = param['desc']
+
+            if param_name in existing_params:
+                # 更新现有参数
+                plentry = existing_params[param_name]
+                pt_found = False
+                pd_found = False
+
+                for pt in find_pts(plentry):
+                    if pt.text == param_name:
+                        props = pt.get('props', '').split()
+                        if platform_prop not in props:
+                            props.append(platform_prop)
+                            pt.set('props', ' '.join(props))
+                        pt_found = True
+
+                for pd in find_pds(plentry):
+                    if pd.text == param_desc:
+                        props = pd.get('props', '').split()
+                        if platform_prop not in props:
+                            props.append(platform_prop)
+                            pd.set('props', ' '.join(props))
+                        pd_found = True
+
+                if not pt_found:
+                    new_pt = etree.SubElement(plentry, 'pt')
+                    new_pt.text = param_name
+                    new_pt.set('props', platform_prop)
+                    new_pt.tail = '\n                '
+
+                if not pd_found:
+                    new_pd = etree.SubElement(plentry, 'pd')
+                    new_pd.text = param_desc
+                    new_pd.set('props', platform_prop)
+                    new_pd.tail = '\n            '
+            else:
+                # 创建新参数
+                plentry = etree.SubElement(parml, 'plentry')
+                plentry.text = '\n                '
+                plentry.tail = '\n            '
+
+                pt = etree.SubElement(plentry, 'pt')
+                pt.text = param_name
+                pt.set('props', platform_prop)
+                pt.tail = '\n                '
+
+                pd = etree.SubElement(plentry, 'pd')
+                pd.text = param_desc
+                pd.set('props', platform_prop)
+                pd.tail = '\n            '
+
+                existing_params[param_name] = plentry
+            touched.append(plentry)
+
+        # 调整最后一个 plentry 的缩进
+        if len(parml) > 0:
+            parml[-1].tail = '\n        '
+            if parml[-1].tag == 'plentry':
+                touched.append(parml[-1])
 
 def process_api_change(change_item, templates, platform_configs):
     """处理单个 API 变更"""
@@ -147,12 +182,12 @@ def process_api_change(change_item, templates, platform_configs):
     file_name = f"{prefix}_{change_item['parentclass']}_{change_item['key']}.dita".lower()
     full_file_path = os.path.join(new_file_path, file_name)
     
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(template_path, full_file_path):
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(template_path, full_file_path)
+    if tree is None:
         return
     
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 在内存中更新文件
     root = tree.getroot()
     
     # 更新各个字段，添加错误检查
@@ -269,8 +304,7 @@ def process_api_change(change_item, templates, platform_configs):
     if 'parameters' in desc:
         parameters_section = root.find('.//section[@id="parameters"]')
         if parameters_section is not None:
-            for platform in desc['parameters'].keys():
-                update_parameters_section(parameters_section, desc['parameters'], platform, platform_configs)
+            update_parameters_section(parameters_section, desc['parameters'], platform_configs)
     
     # 获取描述相关字段
     desc = change_item.get('description', {})
@@ -315,7 +349,7 @@ def process_api_change(change_item, templates, platform_configs):
             restriction_section.text = restriction_content
     
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path)
 
 def process_enum_change(change_item, templates, platform_configs):
     """处理单个枚举变更"""
@@ -327,12 +361,12 @@ def process_enum_change(change_item, templates, platform_configs):
     file_name = f"enum_{enum_key}.dita"
     full_file_path = os.path.join(new_file_path, file_name)
     
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(templates['enum'], full_file_path):
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(templates['enum'], full_file_path)
+    if tree is None:
         return
     
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 在内存中更新文件
     root = tree.getroot()
     
     # 更新各个字段，添加错误检查
@@ -457,7 +491,7 @@ def process_enum_change(change_item, templates, platform_configs):
             parml.tail = '\n        '
     
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path)
 
 def process_class_change(change_item, templates, platform_configs):
     """处理单个类变更"""
@@ -469,12 +503,12 @@ def process_class_change(change_item, templates, platform_configs):
     file_name = f"class_{class_key}.dita"
     full_file_path = os.path.join(new_file_path, file_name)
     
-    # 创建文件，如果文件已存在则返回
-    if not create_dita_file(templates['class'], full_file_path):
+    # 从模板创建内存树，如果文件已存在则返回
+    tree = create_dita_file(templates['class'], full_file_path)
+    if tree is None:
         return
     
-    # 解析并更新文件
-    tree = etree.parse(full_file_path)
+    # 在内存中更新文件
     root = tree.getroot()
     
     # 更新各个字段
@@ -530,31 +564,18 @@ def process_class_change(change_item, templates, platform_configs):
     if 'parameters' in change_item.get('description', {}):
         parameters_section = root.find('.//section[@id="parameters"]')
         if parameters_section is not None:
-            for platform in change_item['description']['parameters']:
-                update_parameters_section(parameters_section, 
-                                       change_item['description']['parameters'], 
-                                       platform, 
-                                       platform_configs)
+            update_parameters_section(parameters_section, change_item['description']['parameters'], platform_configs)
     
     # 保存更新后的文件
-    tree.write(full_file_path, encoding='utf-8', xml_declaration=True, pretty_print=True)
+    write_dita_file(tree, full_file_path)
 
 def main(platform_configs, new_file_path):
     """主函数"""
     json_file_path = os.path.join(os.path.dirname(__file__), 'data.json')
     print(f"尝试读取文件：{json_file_path}")
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            print(f"文件内容前100个字符：{content[:100]}")
-            changes = json.loads(content)
-    except FileNotFoundError:
+    if not os.path.exists(json_file_path):
         print(f"错误：找不到文件 {json_file_path}")
         return
-    except json.JSONDecodeError as e:
-        print(f"错误：JSON 文件格式不正确: {str(e)}")
-        print(f"错误位置附近的内容：{content[max(0, e.pos-50):e.pos+50]}")
-        return
     
     templates = {
         'method': method_template,
@@ -563,30 +584,27 @@ def main(platform_configs, new_file_path):
         'class': class_template
     }
     
-    # 处理所有类型的变更
-    if 'api_changes' in changes:
-        print("\n开始处理 API 变更...")
-        for change in changes['api_changes']:
-            try:
-                process_api_change(change, templates, platform_configs)
-            except Exception as e:
-                print(f"处理 API {change.get('key', '未知')} 时出错：{str(e)}")
-    
-    if 'enum_changes' in changes:
-        print("\n开始处理枚举变更...")
-        for change in changes['enum_changes']:
-            try:
-                process_enum_change(change, templates, platform_configs)
-            except Exception as e:
-                print(f"处理枚举 {change.get('key', '未知')} 时出错：{str(e)}")
-    
-    if 'struct_changes' in changes:
-        print("\n开始处理类变更...")
-        for change in changes['struct_changes']:
-            try:
-                process_class_change(change, templates, platform_configs)
-            except Exception as e:
-                print(f"处理类 {change.get('key', '未知')} 时出错：{str(e)}")
+    # 处理所有类型的变更，记录逐条从文件中读取
+    changes = ChangeFeed(json_file_path)
+    handlers = [
+        ('api_changes', "\n开始处理 API 变更...", "处理 API", process_api_change),
+        ('enum_changes', "\n开始处理枚举变更...", "处理枚举", process_enum_change),
+        ('struct_changes', "\n开始处理类变更...", "处理类", process_class_change),
+    ]
+    try:
+        for change_type, start_message, error_prefix, handler in handlers:
+            started = False
+            for change in changes.get(change_type):
+                if not started:
+                    print(start_message)
+                    started = True
+                try:
+                    handler(change, templates, platform_configs)
+                except Exception as e:
+                    print(f"{error_prefix} {change.get('key', '未知')} 时出错：{str(e)}")
+    except json.JSONDecodeError as e:
+        print(f"错误：JSON 文件格式不正确: {str(e)}")
+        return
 
 # 添加到主程序中的调用
 if __name__ == "__main__":
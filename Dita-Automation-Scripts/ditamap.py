@@ -1,61 +1,202 @@
-from xml.dom import minidom
+encoding = 'utf-8'
+import argparse
+import json
+import os
+from xml.sax.saxutils import quoteattr
+from topicpatch import scan_elements, span_attributes, line_indent
+from workspace import DitaWorkspace
 
-# List of XML files
+# 交互模式下修改的文件
 xml_files = ['RTC_NG_API_iOS.ditamap', 'RTC_NG_API_Flutter.ditamap']
 
-topic = input('Enter the toc under which the API is to be put:')
-new_keyrefs = input('Enter the keys of the APIs to be added, separated by comma:').split(',')
 
-# Loop over each XML file
-for xml_file in xml_files:
-    # Parse the XML files
-    file = minidom.parse(xml_file)
+def split_keys(keys):
+    """keys 可以是列表或逗号分隔的字符串"""
+    if isinstance(keys, str):
+        keys = keys.split(',')
+    return [key.strip() for key in keys if key.strip()]
 
-    # Get all topicrefs
-    elements = file.getElementsByTagName('topicref')
 
-    # Get the href value and chunk value of tocs
-    for elem in elements:
-        href_attribute = elem.attributes.get('href')
-        chunk_attribute = elem.attributes.get('chunk')
-        # Skip the element if it does not has href and chunk attributes
-        if not (href_attribute and chunk_attribute):
+def read_manifest(path):
+    """读取清单，返回 [(ditamap, toc href, [key, ...]), ...]
+
+    清单为 JSON 数组，每项形如 {"ditamap": "RTC_NG_API_iOS.ditamap", "toc": "API/toc_channel.dita",
+    "keys": ["joinChannel2", "leaveChannel2"]}；ditamap 也可以是文件名列表，keys 也可以是逗号分隔的字符串。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    triples = []
+    for number, entry in enumerate(entries, 1):
+        if not entry.get('ditamap') or not entry.get('toc') or not entry.get('keys'):
+            raise ValueError(f"清单第 {number} 项缺少 ditamap、toc 或 keys")
+        ditamaps = entry['ditamap'] if isinstance(entry['ditamap'], list) else [entry['ditamap']]
+        for ditamap in ditamaps:
+            triples.append((ditamap, entry['toc'], split_keys(entry['keys'])))
+    return triples
+
+
+def group_by_ditamap(triples, base_dir):
+    """按文件合并：{ditamap 路径: {toc href: [key, ...]}}，保持清单中的顺序，重复的 key 只保留一个"""
+    files = {}
+    for ditamap, toc, keys in triples:
+        tocs = files.setdefault(os.path.normpath(os.path.join(base_dir, ditamap)), {})
+        toc_keys = tocs.setdefault(toc, [])
+        toc_keys.extend(key for key in keys if key not in toc_keys)
+    return files
+
+
+def find_tocs(text, span, tocs):
+    """查找 href 和 chunk="to-content" 匹配的 topicref，同一 href 取第一个"""
+    if span.tag == 'topicref':
+        attributes = span_attributes(text, span)
+        href = attributes.get('href')
+        if href is not None and href not in tocs and attributes.get('chunk') == 'to-content':
+            tocs[href] = span
+    for child in span.children:
+        find_tocs(text, child, tocs)
+    return tocs
+
+
+def existing_keyrefs(text, span):
+    return {span_attributes(text, child).get('keyref') for child in span.children if child.tag == 'topicref'}
+
+
+def add_topicrefs(text, toc_keys):
+    """在各 toc 末尾追加 <topicref keyref="..." toc="no"/>，只插入新内容，其余文本原样保留
+
+    返回 (新文本, 成功信息列表, 错误信息列表)。
+    """
+    success_messages = []
+    error_messages = []
+    tocs = find_tocs(text, scan_elements(text), {})
+
+    edits = []
+    for toc, keys in toc_keys.items():
+        if toc not in tocs:
+            error_messages.append(f"{toc} not found")
             continue
-        # Locate the toc after which new APIs are to be added
-        if href_attribute.value == topic and chunk_attribute.value == "to-content":
-            # If the last child of the element is a text node containing only whitespace, remove it
-            if elem.lastChild.nodeType == elem.TEXT_NODE and elem.lastChild.data.strip() == '':
-                elem.removeChild(elem.lastChild)
-
-            for new_keyref in new_keyrefs:
-                # Create a new topicref
-                new_topicref = file.createElement('topicref')
-                # Set keyref and its value
-                new_topicref.setAttribute('keyref', new_keyref.strip())
-                # Set toc=no
-                new_topicref.setAttribute('toc', 'no')
-
-                # Create a text node for indentation and line break, so that newly-added topicrefs will not displayed in one line
-                text_node = file.createTextNode('\n            ')
-
-                # Add the new topicref and text node to the end of the children of the given toc
-                lastChild = elem.lastChild
-                if lastChild.nodeType == lastChild.TEXT_NODE:
-                    lastChild.data = lastChild.data + text_node.data
-                else:
-                    elem.appendChild(text_node)
-                elem.appendChild(new_topicref)
-
-                print(f'{new_keyref} is successfully added!')
-
-            # Add a new line after the last topicref
-            elem.appendChild(file.createTextNode('\n        '))
-
-            # Save the modified file
-            with open(xml_file, 'w') as f:
-                f.write(file.toxml())
-
-            print(f"The file {xml_file} has been modified and saved")
-            break
+        span = tocs[toc]
+
+        existing = existing_keyrefs(text, span)
+        new_keys = []
+        for key in keys:
+            if key in existing:
+                error_messages.append(f"{key} already exists under {toc}, skipped")
+            else:
+                new_keys.append(key)
+        if not new_keys:
+            continue
+
+        toc_indent = line_indent(text, span.start)
+        if span.children:
+            # 与最后一个子元素对齐，插入到它之后
+            child_indent = line_indent(text, span.children[-1].start) or toc_indent + '    '
+            position = span.children[-1].end
+            pieces = ''.join(f'\n{child_indent}<topicref keyref={quoteattr(key)} toc="no"/>' for key in new_keys)
+            edits.append((position, position, pieces))
+        else:
+            child_indent = toc_indent + '    '
+            pieces = ''.join(f'\n{child_indent}<topicref keyref={quoteattr(key)} toc="no"/>' for key in new_keys)
+            if span.empty:
+                # <topicref .../> 展开为 <topicref ...>...</topicref>
+                open_tag = text[span.start:span.end][:-2].rstrip() + '>'
+                edits.append((span.start, span.end, f'{open_tag}{pieces}\n{toc_indent}</topicref>'))
+            else:
+                edits.append((span.open_end, span.close_start, f'{pieces}\n{toc_indent}'))
+
+        for key in new_keys:
+            success_messages.append(f"{key} is successfully added under {toc}!")
+
+    # 从后往前替换，前面的位置不受影响
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text, success_messages, error_messages
+
+
+def apply_manifest(triples, base_dir, workspace):
+    """每个 ditamap 只读取和扫描一次，应用其中所有 toc 的修改，返回成功和错误信息列表"""
+    success_messages = []
+    error_messages = []
+
+    for path, toc_keys in group_by_ditamap(triples, base_dir).items():
+        if not os.path.exists(path):
+            error_messages.append(f"Ditamap file not found: {path}")
+            continue
+        try:
+            text = workspace.read(path).decode('utf-8')
+            new_text, added, errors = add_topicrefs(text, toc_keys)
+        except (OSError, ValueError) as e:
+            error_messages.append(f"Error processing {path}: {str(e)}")
+            continue
+
+        error_messages.extend(f"{path}: {message}" for message in errors)
+        if new_text != text:
+            workspace.save(path, new_text.encode('utf-8'))
+            success_messages.extend(f"{path}: {message}" for message in added)
+            success_messages.append(f"The file {path} has been modified ({len(added)} topicrefs added)")
+        else:
+            success_messages.append(f"No changes made to {path}")
+
+    return success_messages, error_messages
+
+
+def interactive_triples():
+    """原有的交互方式：输入一个 toc 和一组 key，应用到 xml_files"""
+    topic = input('Enter the toc under which the API is to be put:')
+    new_keyrefs = split_keys(input('Enter the keys of the APIs to be added, separated by comma:'))
+    return [(xml_file, topic, new_keyrefs) for xml_file in xml_files]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='在 ditamap 的 toc 下批量添加 <topicref keyref="..." toc="no"/>，其余内容保持原样')
+    parser.add_argument('--manifest', help='JSON 清单，每项包含 ditamap、toc 和 keys')
+    parser.add_argument('--ditamap', action='append', help='要修改的 ditamap，可重复指定（与 --toc、--keys 一起使用）')
+    parser.add_argument('--toc', help='toc 的 href，如 API/toc_channel.dita')
+    parser.add_argument('--keys', help='逗号分隔的 key')
+    parser.add_argument('--dir', default='.', help='ditamap 相对路径的基准目录，默认为当前目录')
+    parser.add_argument('--dry-run', nargs='?', const='-', metavar='DIFF_FILE',
+                        help='不写入文件，输出将要产生的 unified diff（默认输出到标准输出，可指定文件）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.manifest:
+        triples = read_manifest(args.manifest)
+    elif args.toc and args.keys:
+        triples = [(ditamap, args.toc, split_keys(args.keys)) for ditamap in (args.ditamap or xml_files)]
     else:
-        print(f"{topic} not found in {xml_file}")
\ No newline at end of file
+        triples = interactive_triples()
+
+    workspace = DitaWorkspace(dry_run=args.dry_run is not None)
+    success_messages, error_messages = apply_manifest(triples, args.dir, workspace)
+
+    if args.dry_run is None:
+        # 所有文件一次性原子替换，失败时全部回滚
+        commit_success, commit_errors = workspace.commit()
+        success_messages.extend(commit_success)
+        error_messages.extend(commit_errors)
+
+    if success_messages:
+        print("\n=== 成功信息 ===")
+        print("\n".join(success_messages))
+    if error_messages:
+        print("\n=== 错误信息 ===")
+        print("\n".join(error_messages))
+
+    if args.dry_run is not None:
+        diffs = list(workspace.diffs(args.dir))
+        if args.dry_run == '-':
+            print("\n=== dry-run 差异 ===")
+            for diff in diffs:
+                print(diff, end='')
+        else:
+            with open(args.dry_run, 'w', encoding='utf-8') as f:
+                f.writelines(diffs)
+        print(f"\ndry-run：共 {len(diffs)} 个文件将被修改，未写入磁盘")
+
+
+if __name__ == "__main__":
+    main()
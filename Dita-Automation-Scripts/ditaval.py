@@ -0,0 +1,304 @@
+encoding = 'utf-8'
+from lxml import etree
+import argparse
+import json
+import os
+import re
+
+# config 目录下各平台的 DITAVAL 文件名，profile 名取中间部分
+DITAVAL_PATTERN = re.compile(r'^filter-(.+)-rtc-ng\.ditaval$')
+
+# 视为保留的 action
+KEEP_ACTIONS = {'include', 'flag', 'passthrough'}
+
+# 各 profile 构建时使用的平台 map（dita/RTC-NG 下）；没有对应 map 的 profile（如 review）按所有平台 map 判断
+PROFILE_MAPS = {
+    'android': 'RTC_NG_API_Android.ditamap',
+    'bp': 'RTC_NG_API_Blueprint.ditamap',
+    'cpp': 'RTC_NG_API_CPP.ditamap',
+    'cs': 'RTC_NG_API_CS.ditamap',
+    'electron': 'RTC_NG_API_Electron.ditamap',
+    'flutter': 'RTC_NG_API_Flutter.ditamap',
+    'harmony': 'RTC_NG_API_Harmony.ditamap',
+    'ios': 'RTC_NG_API_iOS.ditamap',
+    'mac': 'RTC_NG_API_macOS.ditamap',
+    'rn': 'RTC_NG_API_RN.ditamap',
+    'unity': 'RTC_NG_API_Unity.ditamap',
+    'unreal': 'RTC_NG_API_Unreal.ditamap',
+}
+
+# DITA 的条件处理属性；全局默认规则对 DITAVAL 中没有提到的这些属性同样生效
+FILTER_ATTRIBUTES = ('audience', 'platform', 'product', 'otherprops', 'props', 'deliveryTarget')
+
+
+class ProfileSet:
+    """将多个 DITAVAL 编译成按 profile 的位掩码，一次求值即可得到所有 profile 的结果
+
+    第 i 位对应 names[i]。对每个属性值记录在哪些 profile 中被排除；按照 DITA 的规则，
+    元素的某个过滤属性中所有值都被排除时元素被排除，任一过滤属性满足即可。
+    每个值依次按该值的规则、该属性的默认规则、全局默认规则判断。
+    """
+
+    def __init__(self, profiles):
+        """profiles 为 [(name, [(action, att, val), ...]), ...]，att 或 val 为 None 表示默认规则"""
+        self.names = [name for name, _ in profiles]
+        self.all_mask = (1 << len(self.names)) - 1
+        # att -> {val -> 排除该值的 profile 掩码}
+        self._excluded = {}
+        # att -> {val -> 对该值有明确规则的 profile 掩码}
+        self._mentioned = {}
+        # att -> 该属性中未列出的值被排除的 profile 掩码
+        self._default_excluded = {}
+        # att -> 对该属性有默认规则的 profile 掩码
+        has_default = {}
+        global_default = 0
+
+        for bit, (_, rules) in enumerate(profiles):
+            mask = 1 << bit
+            for action, att, val in rules:
+                excluded = action not in KEEP_ACTIONS
+                if att is None:
+                    if excluded:
+                        global_default |= mask
+                elif val is None:
+                    self._mentioned.setdefault(att, {})
+                    has_default[att] = has_default.get(att, 0) | mask
+                    if excluded:
+                        self._default_excluded[att] = self._default_excluded.get(att, 0) | mask
+                else:
+                    mentioned = self._mentioned.setdefault(att, {})
+                    mentioned[val] = mentioned.get(val, 0) | mask
+                    if excluded:
+                        self._excluded.setdefault(att, {})
+                        self._excluded[att][val] = self._excluded[att].get(val, 0) | mask
+
+        # 全局默认规则只作用于没有属性默认规则的 profile，包括 DITAVAL 中没有提到的过滤属性
+        if global_default:
+            for att in set(self._mentioned) | set(FILTER_ATTRIBUTES):
+                default = global_default & ~has_default.get(att, 0)
+                if default:
+                    self._default_excluded[att] = self._default_excluded.get(att, 0) | default
+
+        # 只有带排除规则的属性需要求值
+        self.attributes = sorted(set(self._excluded) | set(self._default_excluded))
+        self._cache = {}
+
+    @classmethod
+    def load(cls, config_dir):
+        """编译 config 目录下所有 filter-*-rtc-ng.ditaval"""
+        profiles = []
+        for file_name in sorted(os.listdir(config_dir)):
+            match = DITAVAL_PATTERN.match(file_name)
+            if match:
+                profiles.append((match.group(1), read_ditaval(os.path.join(config_dir, file_name))))
+        return cls(profiles)
+
+    def names_of(self, mask):
+        return [name for bit, name in enumerate(self.names) if mask & (1 << bit)]
+
+    def mask_of(self, names):
+        return sum(1 << self.names.index(name) for name in names)
+
+    def _attribute_excluded(self, att, value):
+        """某个属性值字符串被排除的 profile 掩码：所有值都被排除才算排除"""
+        key = (att, value)
+        mask = self._cache.get(key)
+        if mask is None:
+            excluded = self._excluded.get(att, {})
+            mentioned = self._mentioned.get(att, {})
+            default = self._default_excluded.get(att, 0)
+            mask = self.all_mask
+            for token in value.split():
+                # 没有明确规则的 profile 使用默认规则
+                mask &= excluded.get(token, 0) | (default & ~mentioned.get(token, 0))
+            if not value.split():
+                mask = 0
+            self._cache[key] = mask
+        return mask
+
+    def keep_mask(self, element):
+        """只看元素自身属性时保留该元素的 profile 掩码"""
+        excluded = 0
+        for att in self.attributes:
+            value = element.get(att)
+            if value is not None:
+                excluded |= self._attribute_excluded(att, value)
+        return self.all_mask & ~excluded
+
+    def effective_mask(self, element):
+        """考虑祖先元素后保留该元素的 profile 掩码"""
+        mask = self.all_mask
+        while element is not None and mask:
+            if isinstance(element.tag, str):
+                mask &= self.keep_mask(element)
+            element = element.getparent()
+        return mask
+
+    def evaluate(self, root):
+        """自顶向下遍历一次，依次产出 (element, 保留该元素的 profile 掩码)"""
+        stack = [(root, self.effective_mask(root))]
+        while stack:
+            element, mask = stack.pop()
+            yield element, mask
+            children = [child for child in element if isinstance(child.tag, str)]
+            for child in reversed(children):
+                stack.append((child, mask & self.keep_mask(child)))
+
+    def topic_summary(self, path):
+        """只看 topic 本身时返回 (保留 topic 的掩码, 每个 profile 中被过滤掉的元素数)"""
+        root = etree.parse(path).getroot()
+        removed = [0] * len(self.names)
+        topic_mask = None
+        for element, mask in self.evaluate(root):
+            if topic_mask is None:
+                topic_mask = mask
+            dropped = self.all_mask & ~mask
+            while dropped:
+                bit = dropped & -dropped
+                removed[bit.bit_length() - 1] += 1
+                dropped ^= bit
+        return topic_mask, removed
+
+
+def read_ditaval(path):
+    """读取 DITAVAL 中的 <prop> 规则，返回 [(action, att, val), ...]"""
+    rules = []
+    for prop in etree.parse(path).getroot().iter('prop'):
+        rules.append((prop.get('action', 'include'), prop.get('att'), prop.get('val')))
+    return rules
+
+
+def map_elements(profiles, map_path, mask, visited):
+    """按文档顺序产出 map 中的 (元素, 保留该元素的 profile 掩码, map 所在目录)，引用的子 map 在引用处展开"""
+    visited.add(map_path)
+    map_dir = os.path.dirname(map_path)
+    for element, element_mask in profiles.evaluate(etree.parse(map_path).getroot()):
+        element_mask &= mask
+        if not element_mask:
+            continue
+        yield element, element_mask, map_dir
+        href = element.get('href')
+        if href and element.get('format') == 'ditamap' and element.get('scope', 'local') == 'local':
+            submap = os.path.normpath(os.path.join(map_dir, href))
+            if submap not in visited and os.path.exists(submap):
+                yield from map_elements(profiles, submap, element_mask, visited)
+
+
+def _topic_path(element, map_dir):
+    """元素 href 指向的本地 topic 的绝对路径，不是 topic 时返回 None"""
+    href = element.get('href')
+    if not href or element.get('format', 'dita') != 'dita' or element.get('scope', 'local') != 'local':
+        return None
+    return os.path.normpath(os.path.join(map_dir, href.split('#')[0]))
+
+
+def map_topic_masks(profiles, map_path, mask):
+    """返回平台 map 引用的 topic {绝对路径: 保留该 topic 的 profile 掩码}，只计算 mask 中的 profile
+
+    引用 topic 的元素有两种：通过 href 引用 topic 的 topicref，以及 key 定义（keydef 等带 keys 的元素，
+    topic 中的 keyref 链接通过它发布）。引用元素及其祖先元素都被保留时 topic 才被保留。
+    同一个 key 有多个定义时，每个 profile 只有第一个没有被过滤掉的定义生效；
+    topicref 的 keyref 没有生效的定义时使用 topicref 自身的 href。
+    """
+    elements = list(map_elements(profiles, os.path.normpath(os.path.abspath(map_path)), mask, set()))
+    definitions = {}
+    for element, element_mask, map_dir in elements:
+        for key in (element.get('keys') or '').split():
+            definitions.setdefault(key, []).append((element, element_mask, map_dir))
+
+    topics = {}
+    # key -> 该 key 有生效定义的 profile 掩码
+    defined = {}
+    for key, candidates in definitions.items():
+        remaining = mask
+        for definition, definition_mask, definition_dir in candidates:
+            path = _topic_path(definition, definition_dir)
+            if path is not None and remaining & definition_mask:
+                topics[path] = topics.get(path, 0) | (remaining & definition_mask)
+            remaining &= ~definition_mask
+        defined[key] = mask & ~remaining
+
+    for element, element_mask, map_dir in elements:
+        # keydef 已按 key 定义计算；resource-only 的 topicref 只提供资源
+        if element.tag == 'keydef' or element.get('processing-role') == 'resource-only':
+            continue
+        keyref = element.get('keyref')
+        if keyref:
+            element_mask &= ~defined.get(keyref.split('/')[0], 0)
+        path = _topic_path(element, map_dir)
+        if element_mask and path is not None:
+            topics[path] = topics.get(path, 0) | element_mask
+    return topics
+
+
+def map_masks(profiles, map_dir):
+    """按各 profile 的平台 map 汇总被引用的 topic，返回 {绝对路径: 保留该 topic 的 profile 掩码}"""
+    unmapped = profiles.all_mask & ~profiles.mask_of([name for name in profiles.names if name in PROFILE_MAPS])
+    masks = {}
+    for map_name in sorted(set(PROFILE_MAPS.values())):
+        map_path = os.path.join(map_dir, map_name)
+        if not os.path.exists(map_path):
+            continue
+        mask = profiles.mask_of([name for name in profiles.names if PROFILE_MAPS.get(name) == map_name]) | unmapped
+        for path, topic_mask in map_topic_masks(profiles, map_path, mask).items():
+            masks[path] = masks.get(path, 0) | topic_mask
+    return masks
+
+
+def scan_topics(profiles, api_dir, map_dir=None):
+    """对目录下所有 topic 求值，返回 {文件名: (保留掩码, 各 profile 过滤掉的元素数)}
+
+    指定 map_dir 时，topic 还需要被该 profile 的平台 map 中保留的 topicref 引用才算保留。
+    """
+    masks = map_masks(profiles, map_dir) if map_dir is not None else None
+    results = {}
+    for file_name in sorted(os.listdir(api_dir)):
+        if file_name.endswith('.dita'):
+            path = os.path.join(api_dir, file_name)
+            topic_mask, removed = profiles.topic_summary(path)
+            if masks is not None:
+                topic_mask &= masks.get(os.path.normpath(os.path.abspath(path)), 0)
+            results[file_name] = (topic_mask, removed)
+    return results
+
+
+def parse_args():
+    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dita', 'RTC-NG')
+    parser = argparse.ArgumentParser(description='按 DITAVAL 统计各平台构建中包含的 topic 和元素')
+    parser.add_argument('--config', default=os.path.join(base_dir, 'config'), help='DITAVAL 所在目录')
+    parser.add_argument('--api-dir', default=os.path.join(base_dir, 'API'), help='topic 所在目录')
+    parser.add_argument('--map-dir', default=base_dir, help='各平台 map 所在目录，topic 需要被平台 map 引用才算保留')
+    parser.add_argument('--profile', help='列出该 profile 保留的所有 topic')
+    parser.add_argument('--json', help='将每个 topic 保留的 profile 写入 JSON 文件')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiles = ProfileSet.load(args.config)
+    results = scan_topics(profiles, args.api_dir, args.map_dir)
+
+    if args.profile:
+        if args.profile not in profiles.names:
+            print(f"未知的 profile：{args.profile}，可选：{', '.join(profiles.names)}")
+            return
+        mask = profiles.mask_of([args.profile])
+        for file_name, (topic_mask, _) in results.items():
+            if topic_mask & mask:
+                print(file_name)
+    else:
+        print(f"{'profile':<10} {'topics':>8} {'removed elements':>18}")
+        for bit, name in enumerate(profiles.names):
+            kept = sum(1 for topic_mask, _ in results.values() if topic_mask & (1 << bit))
+            removed = sum(removed[bit] for _, removed in results.values())
+            print(f"{name:<10} {kept:>4}/{len(results):<4} {removed:>18}")
+
+    if args.json:
+        data = {file_name: profiles.names_of(topic_mask) for file_name, (topic_mask, _) in results.items()}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+encoding = 'utf-8'
+import contextlib
+import json
+import os
+import time
+
+REPORT_VERSION = 2
+
+# 每个阶段累计的计数项
+COUNTERS = ['files_parsed', 'bytes_read', 'bytes_written', 'elements_inserted']
+
+
+class RunRecorder:
+    """记录一次运行中各阶段的耗时、文件读写量、插入元素数和单个文件的处理耗时
+
+    阶段之间不嵌套；阶段外的计数会被忽略，因此未开启报告的调用方无需任何改动。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.stages = []
+        self.events = []
+        self._current = None
+
+    def _event(self, name, category, start, end, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                 'ts': round((start - self._origin) * 1e6), 'dur': round((end - start) * 1e6)}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """统计一个阶段，同名阶段重复进入时累加到同一条记录"""
+        stage = next((s for s in self.stages if s['name'] == name), None)
+        if stage is None:
+            stage = {'name': name, 'seconds': 0.0, 'files': []}
+            stage.update({counter: 0 for counter in COUNTERS})
+            self.stages.append(stage)
+
+        previous, self._current = self._current, stage
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            end = time.perf_counter()
+            stage['seconds'] += end - start
+            self._current = previous
+            self._event(name, 'stage', start, end, {counter: stage[counter] for counter in COUNTERS})
+
+    @contextlib.contextmanager
+    def file(self, name):
+        """统计当前阶段中单个文件（新建 topic 时为变更记录的 key）的处理耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if self._current is not None:
+                self._current['files'].append({'name': name, 'seconds': end - start})
+                self._event(os.path.basename(name), 'file', start, end, {'name': name})
+
+    def count(self, counter, amount=1):
+        if self._current is not None:
+            self._current[counter] += amount
+
+    def parsed(self, path):
+        """记录一次文件解析及读取的字节数"""
+        self.count('files_parsed')
+        self.count('bytes_read', _file_size(path))
+
+    def written(self, size):
+        """记录交给写入的字节数，计入调用 save 的阶段（commit 只替换文件，不再计数）"""
+        self.count('bytes_written', size)
+
+    def inserted(self, amount=1):
+        self.count('elements_inserted', amount)
+
+    def snapshot(self):
+        """子进程中的统计结果，供主进程 merge"""
+        return {'stages': self.stages, 'events': self.events, 'origin': self._origin}
+
+    def merge(self, snapshot):
+        """将子进程的计数和文件耗时并入当前阶段，trace 事件保留子进程的 pid"""
+        if self._current is not None:
+            for stage in snapshot['stages']:
+                for counter in COUNTERS:
+                    self._current[counter] += stage[counter]
+                self._current['files'].extend(stage['files'])
+        # 子进程由 fork 创建时与主进程共用同一个单调时钟
+        shift = round((snapshot['origin'] - self._origin) * 1e6)
+        for event in snapshot['events']:
+            if event['cat'] == 'file':
+                self.events.append(dict(event, ts=event['ts'] + shift))
+
+    def report(self):
+        return {
+            'version': REPORT_VERSION,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_seconds': time.perf_counter() - self._origin,
+            'stages': self.stages,
+        }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def write_trace(self, path):
+        """输出 Chrome trace（chrome://tracing 或 Perfetto 可直接打开）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# 整个进程共用的记录器
+recorder = RunRecorder()
@@ -0,0 +1,218 @@
+encoding = 'utf-8'
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+from keyscan import iter_keydefs
+from parsecache import ParseCache, PARSE_CACHE_DIR
+
+KEY_INDEX_NAME = '.key-index.sqlite'
+KEY_INDEX_VERSION = 2
+
+# config 目录下参与索引的 map：keys-rtc-ng-api-{platform}.ditamap 和 keys-rtc-ng-links[-{platform}].ditamap
+KEYS_MAP_PATTERN = re.compile(r'^keys-rtc-ng-(api|links)(?:-(.+))?\.ditamap$')
+
+# 不带平台后缀的 links map 对所有平台生效
+COMMON_PLATFORM = 'common'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    file TEXT NOT NULL,
+    href TEXT,
+    keyword TEXT,
+    props TEXT,
+    navtitle TEXT
+);
+CREATE INDEX IF NOT EXISTS keys_by_key ON keys (key);
+CREATE INDEX IF NOT EXISTS keys_by_platform ON keys (platform, key);
+CREATE INDEX IF NOT EXISTS keys_by_file ON keys (file, key);
+"""
+
+
+class KeyIndex:
+    """config 目录下所有 keys map 的持久化 key 索引（SQLite）
+
+    refresh() 按文件的 mtime 和大小判断是否需要重新读取，变化时再比较内容哈希，
+    只有内容确实变化的文件才重新解析。文件路径相对 config_dir 保存。
+    persist 为 False 时 refresh 的结果不写入磁盘（dry-run 使用）。指定 cache_dir 时，
+    需要重新读取的文件先按 mtime 和大小从解析缓存读取（如 --rebuild 或索引版本变化后）。
+    """
+
+    def __init__(self, path, config_dir, persist=True, cache_dir=None):
+        self.path = path
+        self.config_dir = config_dir
+        self.persist = persist
+        self._cache = ParseCache(cache_dir, 'key-index-keydefs') if cache_dir is not None else None
+        if not persist and not os.path.exists(path):
+            path = ':memory:'
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row['value'] != str(KEY_INDEX_VERSION):
+            # 版本不一致时清空重建
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM keys")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(KEY_INDEX_VERSION),))
+
+    def close(self):
+        if self.persist:
+            self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _map_files(self):
+        """config 目录下的 keys map：{文件名: (platform, kind)}"""
+        files = {}
+        for file_name in sorted(os.listdir(self.config_dir)):
+            match = KEYS_MAP_PATTERN.match(file_name)
+            if match:
+                files[file_name] = (match.group(2) or COMMON_PLATFORM, match.group(1))
+        return files
+
+    def refresh(self):
+        """同步索引与磁盘上的 keys map，返回重新解析的文件列表"""
+        known = {row['path']: row for row in self._conn.execute("SELECT * FROM files")}
+        current = self._map_files()
+        reparsed = []
+
+        for file_name, (platform, kind) in current.items():
+            full_path = os.path.join(self.config_dir, file_name)
+            stat = os.stat(full_path)
+            row = known.get(file_name)
+            if row is not None and row['mtime'] == stat.st_mtime and row['size'] == stat.st_size:
+                continue
+
+            with open(full_path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if row is not None and row['sha256'] == digest:
+                # 只是 mtime 变化，内容未变
+                self._conn.execute("UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+                                   (stat.st_mtime, stat.st_size, file_name))
+                continue
+
+            keydefs = self._cache.load(full_path, read_keydefs) if self._cache is not None else iter_keydefs(full_path)
+            self._conn.execute("DELETE FROM keys WHERE file = ?", (file_name,))
+            self._conn.executemany(
+                "INSERT INTO keys VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((key, platform, kind, file_name, href, keyword, props, navtitle)
+                 for key, href, keyword, navtitle, props in keydefs))
+            self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                               (file_name, platform, kind, stat.st_mtime, stat.st_size, digest))
+            reparsed.append(file_name)
+
+        # 已删除的文件
+        for file_name in set(known) - set(current):
+            self._conn.execute("DELETE FROM keys WHERE file = ?", (file_name,))
+            self._conn.execute("DELETE FROM files WHERE path = ?", (file_name,))
+
+        if self.persist:
+            self._conn.commit()
+            if self._cache is not None:
+                self._cache.save()
+        return reparsed
+
+    def rebuild(self):
+        """丢弃已有索引，重新解析所有文件"""
+        self._conn.execute("DELETE FROM files")
+        self._conn.execute("DELETE FROM keys")
+        return self.refresh()
+
+    def lookup(self, key, platform=None):
+        """查找 key，返回 dict 列表；指定 platform 时同时包含通用 links map 中的定义"""
+        if platform is None:
+            rows = self._conn.execute("SELECT * FROM keys WHERE key = ? ORDER BY platform, kind, file", (key,))
+        else:
+            rows = self._conn.execute(
+                "SELECT * FROM keys WHERE key = ? AND platform IN (?, ?) ORDER BY platform = ?, kind, file",
+                (key, platform, COMMON_PLATFORM, COMMON_PLATFORM))
+        return [dict(row) for row in rows]
+
+    def has_key(self, file_name, key):
+        """某个 keys map（文件名）中是否已定义 key"""
+        row = self._conn.execute("SELECT 1 FROM keys WHERE file = ? AND key = ? LIMIT 1", (file_name, key)).fetchone()
+        return row is not None
+
+    def keys_for(self, platform, kind=None):
+        """某个平台定义的所有 key"""
+        if kind is None:
+            rows = self._conn.execute("SELECT DISTINCT key FROM keys WHERE platform = ?", (platform,))
+        else:
+            rows = self._conn.execute("SELECT DISTINCT key FROM keys WHERE platform = ? AND kind = ?", (platform, kind))
+        return {row['key'] for row in rows}
+
+    def stats(self):
+        """每个文件的平台、类型和 key 数量"""
+        rows = self._conn.execute(
+            "SELECT files.path, files.platform, files.kind, COUNT(keys.key) AS count "
+            "FROM files LEFT JOIN keys ON keys.file = files.path GROUP BY files.path ORDER BY files.path")
+        return [dict(row) for row in rows]
+
+
+def read_keydefs(path):
+    """一个 keys map 中的所有 key 定义 [(key, href, keyword, navtitle, props), ...]"""
+    return list(iter_keydefs(path))
+
+
+def parse_args():
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dita', 'RTC-NG', 'config')
+    parser = argparse.ArgumentParser(description='查询 keys map 中 key 的 href、keyword、props 和 navtitle')
+    parser.add_argument('keys', nargs='*', help='要查询的 key')
+    parser.add_argument('--config', default=config_dir, help='keys map 所在目录')
+    parser.add_argument('--db', help=f'索引文件，默认为 DITA 目录下的 {KEY_INDEX_NAME}')
+    parser.add_argument('--platform', help='只查询该平台（keys map 文件名中的平台名，如 java、cpp）')
+    parser.add_argument('--rebuild', action='store_true', help='丢弃已有索引并重新解析所有文件')
+    parser.add_argument('--stats', action='store_true', help='列出每个文件中的 key 数量')
+    parser.add_argument('--cache', metavar='DIR', help=f'解析缓存目录，默认为 DITA 目录下的 {PARSE_CACHE_DIR}')
+    parser.add_argument('--no-cache', action='store_true', help='不使用解析缓存，重新解析需要更新的文件')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    dita_dir = os.path.dirname(os.path.dirname(os.path.abspath(args.config)))
+    db_path = args.db or os.path.join(dita_dir, KEY_INDEX_NAME)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache or os.path.join(dita_dir, PARSE_CACHE_DIR)
+
+    with KeyIndex(db_path, args.config, cache_dir=cache_dir) as index:
+        reparsed = index.rebuild() if args.rebuild else index.refresh()
+        if reparsed:
+            print(f"已重新索引 {len(reparsed)} 个文件")
+
+        if args.stats:
+            for row in index.stats():
+                print(f"{row['path']:<45} {row['platform']:<18} {row['kind']:<6} {row['count']:>6}")
+
+        for key in args.keys:
+            entries = index.lookup(key, args.platform)
+            if not entries:
+                print(f"{key}: 未找到")
+                continue
+            for entry in entries:
+                print(f"{key} [{entry['platform']}/{entry['kind']}] href={entry['href'] or '-'} "
+                      f"keyword={entry['keyword'] or '-'} props={entry['props'] or '-'} "
+                      f"navtitle={entry['navtitle'] or '-'} ({entry['file']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+encoding = 'utf-8'
+from lxml import etree
+import argparse
+import os
+
+
+def iter_keydefs(path):
+    """流式读取一个 map，依次产出 (key, href, keyword, navtitle, props)，keys 中的每个 key 各一条
+
+    keyword 取 topicmeta/keywords 中的第一个 keyword（有多个语言版本时），navtitle 取最近的
+    topichead。每个 keydef 处理完即清除，已处理的兄弟节点同时删除，内存占用与文件大小无关。
+    keydef 误嵌套在其他 keydef 中时，内层在外层之前产出。
+    """
+    navtitles = []
+    depth = 0
+    for event, element in etree.iterparse(path, events=('start', 'end'), tag=('topichead', 'keydef')):
+        if event == 'start':
+            if element.tag == 'topichead':
+                navtitles.append(element.get('navtitle'))
+            else:
+                depth += 1
+            continue
+
+        if element.tag == 'topichead':
+            navtitles.pop()
+        else:
+            depth -= 1
+            keyword = None
+            for child in element.iterfind('topicmeta/keywords/keyword'):
+                keyword = ''.join(child.itertext())
+                break
+            navtitle = navtitles[-1] if navtitles else None
+            href = element.get('href')
+            props = element.get('props')
+            for key in (element.get('keys') or '').split():
+                yield key, href, keyword, navtitle, props
+
+        element.clear()
+        # 外层 keydef 的 topicmeta 还未读取，只在 keydef 外删除已处理的兄弟节点
+        if depth == 0:
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def map_files(directory):
+    """directory 下（含子目录，如 archive）的所有 .ditamap，按路径排序"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        paths.extend(os.path.join(root, name) for name in files if name.endswith('.ditamap'))
+    return sorted(paths)
+
+
+def find_duplicates(path):
+    """同一个 map 中被定义多次的 key：{key: 定义次数}"""
+    counts = {}
+    for key, _, _, _, _ in iter_keydefs(path):
+        counts[key] = counts.get(key, 0) + 1
+    return {key: count for key, count in counts.items() if count > 1}
+
+
+def parse_args():
+    dita_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dita')
+    parser = argparse.ArgumentParser(description='以低内存方式扫描 map 中的 keydef：列出 key、navtitle 或重复定义的 key')
+    parser.add_argument('paths', nargs='*', default=[dita_dir],
+                        help='要扫描的 map 或目录，目录下的 .ditamap 递归扫描，默认为 DITA 目录')
+    parser.add_argument('--keys', action='store_true', help='列出每个 key 的 href、keyword、navtitle 和 props')
+    parser.add_argument('--navtitles', action='store_true', help='列出每个 map 中 keydef 所在的 navtitle 及 key 数量')
+    parser.add_argument('--duplicates', action='store_true', help='列出同一个 map 中重复定义的 key')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = []
+    for path in args.paths:
+        paths.extend(map_files(path) if os.path.isdir(path) else [path])
+
+    success_messages = []
+    error_messages = []
+    for path in paths:
+        try:
+            if args.duplicates:
+                for key, count in find_duplicates(path).items():
+                    error_messages.append(f"{path}: key '{key}' 定义了 {count} 次")
+                continue
+
+            count = 0
+            navtitles = {}
+            for key, href, keyword, navtitle, props in iter_keydefs(path):
+                count += 1
+                navtitles[navtitle] = navtitles.get(navtitle, 0) + 1
+                if args.keys:
+                    print(f"{key}\thref={href or '-'}\tkeyword={keyword or '-'}\t"
+                          f"navtitle={navtitle or '-'}\tprops={props or '-'}\t({path})")
+            if args.navtitles:
+                for navtitle, number in navtitles.items():
+                    print(f"{path}\t{navtitle or '-'}\t{number}")
+            if count:
+                success_messages.append(f"{path}: {count} keys")
+        except (OSError, etree.XMLSyntaxError) as e:
+            error_messages.append(f"Error processing {path}: {str(e)}")
+
+    if success_messages and not (args.keys or args.navtitles):
+        print("\n=== 成功信息 ===")
+        print("\n".join(success_messages))
+    if error_messages:
+        print("\n=== 错误信息 ===")
+        print("\n".join(error_messages))
+
+
+if __name__ == "__main__":
+    main()
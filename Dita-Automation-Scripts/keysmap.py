@@ -1,40 +1,153 @@
 encoding = 'utf-8'
-import xml.etree.ElementTree as ET
+from lxml import etree
+import argparse
+import os
+import re
+from parsecache import ParseCache, PARSE_CACHE_DIR
 
-ditmap_files = ['keys-rtc-ng-api-cpp.ditamap', 'keys-rtc-ng-api-cpp.dita']
+# config 目录下各平台的 API keys map，平台名取文件名中的后缀
+API_KEYS_MAP_PATTERN = re.compile(r'^keys-rtc-ng-api-(.+)\.ditamap$')
 
-all_navtitles = {}
 
-for ditmap_file in ditmap_files:
-    tree = ET.parse(ditmap_file)
-    root = tree.getroot()
+def read_navtitles(path):
+    """流式读取一个 keys map，返回 [(navtitle, (key, ...)), ...]，按 topichead 在文件中出现的顺序排列
 
-# get all navtitles
-    navtitles = set()
-    for topichead in root.iter('topichead'):
-        navtitle = topichead.get('navtitle')
-        if navtitle:
-           navtitles.add(navtitle)
+    key 记在最近的 topichead 下（包括误嵌套在其他 keydef 中的 keydef）。keydef 的内容
+    （topicmeta、keyword 等）不需要，读完即清除，不会在内存中构建整棵树。
+    """
+    navtitles = []
+    stack = []
+    for event, element in etree.iterparse(path, events=('start', 'end'), tag=('topichead', 'keydef')):
+        if element.tag == 'topichead':
+            if event == 'start':
+                keys = []
+                stack.append(keys)
+                navtitle = element.get('navtitle')
+                if navtitle:
+                    navtitles.append((navtitle, keys))
+            else:
+                stack.pop()
+                element.clear()
+        elif event == 'end':
+            if stack:
+                stack[-1].extend((element.get('keys') or '').split())
+            element.clear()
+            # 已处理的兄弟节点同样删除
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+    return [(navtitle, tuple(keys)) for navtitle, keys in navtitles]
 
-    file_name = ditmap_file.split('.')[-1]
-    all_navtitles[file_name] = navtitles
 
-common_navtitles = set.intersection(*all_navtitles.values())
-print("所有文件共有的 navtitles：")
-for index, title in enumerate(common_navtitles, 1):
-    print(f"{index} - {title}")
+class NavtitleCatalog:
+    """config 目录下所有平台 API keys map 的 navtitle 目录：{平台: {navtitle: [key, ...]}}
 
-# print all navtitles
-for file_name, titles in all_navtitles.items():
-    print(f'{file_name}:')
-    for index, title in enumerate(titles, 1):
-        print(f'{index} : {title}')
+    同名 navtitle 在一个文件中出现多次时，其下的 key 合并到一起。指定 cache_dir 时，
+    未变化文件的读取结果按 mtime 和大小从缓存读取。
+    """
 
-# get user input of title
-title_input = int(input('Enter the title number:'))
+    def __init__(self, config_dir, cache_dir=None):
+        self.config_dir = config_dir
+        self.platforms = {}
+        cache = ParseCache(cache_dir, 'keysmap-navtitles') if cache_dir is not None else None
+        for file_name in sorted(os.listdir(config_dir)):
+            match = API_KEYS_MAP_PATTERN.match(file_name)
+            if not match:
+                continue
+            path = os.path.join(config_dir, file_name)
+            entries = cache.load(path, read_navtitles) if cache is not None else read_navtitles(path)
+            navtitles = {}
+            for navtitle, keys in entries:
+                navtitles.setdefault(navtitle, []).extend(keys)
+            self.platforms[match.group(1)] = navtitles
+        if cache is not None:
+            cache.save()
 
-if 1 <= title_input <= len(navtitles):
-    print(f"{title_input} - {navtitles[title_input - 1]}")
-else:
-    print("输入的索引无效")
+    def _selected(self, platforms):
+        if not platforms:
+            return list(self.platforms)
+        unknown = [platform for platform in platforms if platform not in self.platforms]
+        if unknown:
+            raise ValueError(f"未知平台：{', '.join(unknown)}，可用平台：{', '.join(self.platforms)}")
+        return list(platforms)
 
+    def common(self, platforms=None):
+        """所选平台（默认为所有平台）共有的 navtitle，按第一个平台中的顺序排列"""
+        selected = self._selected(platforms)
+        first, others = selected[0], selected[1:]
+        return [navtitle for navtitle in self.platforms[first]
+                if all(navtitle in self.platforms[platform] for platform in others)]
+
+    def unique(self, platform):
+        """只在该平台中出现的 navtitle"""
+        self._selected([platform])
+        return [navtitle for navtitle in self.platforms[platform]
+                if not any(navtitle in navtitles for other, navtitles in self.platforms.items() if other != platform)]
+
+    def keys_under(self, navtitle, platforms=None):
+        """{平台: [key, ...]}，列出各平台中该 navtitle 下的 key，没有该 navtitle 的平台不列出"""
+        return {platform: self.platforms[platform][navtitle] for platform in self._selected(platforms)
+                if navtitle in self.platforms[platform]}
+
+
+def print_navtitles(title, navtitles):
+    print(f"\n=== {title} ===")
+    for index, navtitle in enumerate(navtitles, 1):
+        print(f"{index} - {navtitle}")
+
+
+def print_keys(catalog, navtitle, platforms):
+    keys_by_platform = catalog.keys_under(navtitle, platforms)
+    print(f"\n=== {navtitle} 下的 key ===")
+    if not keys_by_platform:
+        print("所选平台中都没有该 navtitle")
+    for platform, keys in keys_by_platform.items():
+        print(f"{platform} ({len(keys)}): {', '.join(keys) or '-'}")
+
+
+def parse_args():
+    config_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dita', 'RTC-NG', 'config')
+    parser = argparse.ArgumentParser(description='查询各平台 API keys map 中的 navtitle 及其下的 key')
+    parser.add_argument('--config', default=config_dir, help='keys map 所在目录')
+    parser.add_argument('--platform', action='append',
+                        help='只查询该平台（keys map 文件名中的平台名，如 java、cpp），可重复指定')
+    parser.add_argument('--common', action='store_true', help='列出所选平台共有的 navtitle')
+    parser.add_argument('--unique', metavar='PLATFORM', help='列出只在该平台中出现的 navtitle')
+    parser.add_argument('--navtitle', action='append', help='列出各平台中该 navtitle 下的 key，可重复指定')
+    parser.add_argument('--cache', metavar='DIR', help=f'缓存目录，默认为 DITA 目录下的 {PARSE_CACHE_DIR}')
+    parser.add_argument('--no-cache', action='store_true', help='不使用缓存，重新读取所有文件')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(args.config))),
+                                               PARSE_CACHE_DIR)
+
+    catalog = NavtitleCatalog(args.config, cache_dir)
+    try:
+        if args.common:
+            print_navtitles(f"{', '.join(args.platform or catalog.platforms)} 共有的 navtitle",
+                            catalog.common(args.platform))
+        if args.unique:
+            print_navtitles(f"只在 {args.unique} 中出现的 navtitle", catalog.unique(args.unique))
+        for navtitle in args.navtitle or []:
+            print_keys(catalog, navtitle, args.platform)
+
+        if not (args.common or args.unique or args.navtitle):
+            # 原有的交互方式：列出共有的 navtitle，按序号查看其下的 key
+            common_navtitles = catalog.common(args.platform)
+            print_navtitles("所有文件共有的 navtitles", common_navtitles)
+            title_input = int(input('Enter the title number:'))
+            if 1 <= title_input <= len(common_navtitles):
+                print_keys(catalog, common_navtitles[title_input - 1], args.platform)
+            else:
+                print("输入的索引无效")
+    except ValueError as e:
+        print(f"错误：{e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+encoding = 'utf-8'
+import hashlib
+import json
+import os
+from workspace import atomic_write
+
+MANIFEST_NAME = '.automation-manifest.json'
+MANIFEST_VERSION = 2
+
+
+def record_hash(change_type, record):
+    """变更记录的内容哈希，与字段顺序无关"""
+    payload = json.dumps([change_type, record], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def record_identity(change_type, record):
+    """同一条变更记录在内容修改前后不变的标识：(变更类型, create/modify, 父类, key)"""
+    return (change_type, record.get('change_type'), record.get('parentclass'), record.get('key'))
+
+
+def file_hash(path):
+    """文件内容的哈希，文件不存在时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class RunManifest:
+    """增量运行清单：记录每条变更记录的哈希，以及上次运行结束时它涉及的文件的哈希
+
+    变更记录本身和它涉及的所有文件都没有变化时，这条记录可以跳过。
+    清单中的文件路径相对 root_dir 保存；path 为 None 时清单只保存在内存中（如 --watch）。
+    """
+
+    def __init__(self, path, root_dir):
+        self.path = path
+        self.root_dir = root_dir
+        self.records = {}
+        self._file_hashes = {}
+
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.records = data.get('records', {})
+            except (OSError, ValueError):
+                # 清单损坏时视为空清单，所有记录重新处理
+                self.records = {}
+
+    def _target_hash(self, target):
+        if target not in self._file_hashes:
+            self._file_hashes[target] = file_hash(os.path.join(self.root_dir, target))
+        return self._file_hashes[target]
+
+    def is_unchanged(self, change_type, record, targets):
+        """记录内容与涉及文件的内容都和上次运行结束时一致"""
+        return self._unchanged(record_hash(change_type, record), targets)
+
+    def _unchanged(self, digest, targets):
+        entry = self.records.get(digest)
+        if entry is None:
+            return False
+        recorded = entry['targets']
+        if set(recorded) != set(targets):
+            return False
+        return all(recorded[target] == self._target_hash(target) for target in targets)
+
+    def pending(self, feed, targets_func, topic_func):
+        """返回只包含需要处理的记录的变更视图
+
+        内容有变化的 create 记录（与上次运行的某条记录标识相同）新建的 topic 已经存在：
+        topic 在上次运行后没有被修改过时重新生成，涉及该 topic 的其他记录也一并重新应用；
+        否则保留 topic，只在 changed 中报告。topic_func 返回记录新建的 topic（相对 root_dir）。
+        """
+        previous = {tuple(entry['identity']): entry for entry in self.records.values()}
+        skipped = set()
+        skipped_count = 0
+        regenerate = set()
+        changed = []
+        for change_type, record in feed:
+            digest = record_hash(change_type, record)
+            if digest in self.records:
+                if self._unchanged(digest, targets_func(change_type, record)):
+                    skipped.add(digest)
+                    skipped_count += 1
+                continue
+
+            entry = previous.get(record_identity(change_type, record))
+            topic = topic_func(change_type, record) if record.get('change_type') == 'create' else None
+            if entry is None or topic is None:
+                continue
+            current = self._target_hash(topic)
+            if current is None:
+                # topic 已被删除，按新记录重新创建
+                continue
+            regenerated = entry['targets'].get(topic) == current
+            if regenerated:
+                regenerate.add(topic)
+            changed.append((change_type, record, regenerated))
+
+        if regenerate:
+            # 重新生成的 topic 上原有的修改（如 modify 记录追加的参数）需要重新应用
+            unskipped = set()
+            for change_type, record in feed:
+                digest = record_hash(change_type, record)
+                if digest in skipped and regenerate.intersection(targets_func(change_type, record)):
+                    unskipped.add(digest)
+                    skipped_count -= 1
+            skipped -= unskipped
+
+        regenerate = {os.path.normpath(os.path.join(self.root_dir, topic)) for topic in regenerate}
+        return PendingChanges(feed, skipped, skipped_count, regenerate, changed)
+
+    def refresh(self, feed, targets_func):
+        """运行结束后按文件的当前内容重建清单，只保留 feed 中仍然存在的记录"""
+        self._file_hashes = {}
+        records = {}
+        for change_type, record in feed:
+            targets = targets_func(change_type, record)
+            records[record_hash(change_type, record)] = {
+                'change_type': change_type,
+                'key': record.get('key'),
+                'identity': record_identity(change_type, record),
+                'targets': {target: self._target_hash(target) for target in targets},
+            }
+        self.records = records
+        self._file_hashes = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        data = json.dumps({'version': MANIFEST_VERSION, 'records': self.records}, ensure_ascii=False, indent=2)
+        atomic_write(self.path, data.encode('utf-8'))
+
+
+class PendingChanges:
+    """排除了未变化记录的变更视图，接口与 ChangeFeed 一致
+
+    skipped_count 为跳过的记录数，regenerate 为需要重新生成的 topic（绝对路径），
+    changed 为内容有变化的 create 记录 [(change_type, record, 是否重新生成 topic)]。
+    """
+
+    def __init__(self, feed, skipped, skipped_count=0, regenerate=(), changed=()):
+        self.feed = feed
+        self.skipped = skipped
+        self.skipped_count = skipped_count
+        self.regenerate = regenerate
+        self.changed = changed
+
+    def __iter__(self):
+        for change_type, record in self.feed:
+            if not self.skipped or record_hash(change_type, record) not in self.skipped:
+                yield change_type, record
+
+    def get(self, change_type):
+        return (record for record_type, record in self if record_type == change_type)
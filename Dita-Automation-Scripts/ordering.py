@@ -0,0 +1,52 @@
+encoding = 'utf-8'
+
+
+def insert_sorted(parent, elements, sort_key, indent, last_indent, select=None):
+    """将 elements 按 sort_key 有序插入 parent，只调整相邻元素的 tail
+
+    parent 中参与排序的子元素由 select 决定（默认全部子节点）。已有子元素有序时，
+    新元素在一次线性合并中原地插入；已有子元素无序时，退回到整体重新排序，
+    结果与先追加再排序完全一致（相同 key 时已有元素在前）。
+    """
+    if not elements:
+        return
+
+    siblings = [child for child in parent if select is None or select(child)]
+    keys = [sort_key(child) for child in siblings]
+    new_elements = sorted(elements, key=sort_key)
+
+    if any(keys[i] > keys[i + 1] for i in range(len(keys) - 1)):
+        _resort(parent, siblings + list(elements), sort_key, indent, last_indent)
+        return
+
+    last = siblings[-1] if siblings else None
+    position = 0
+    for element in new_elements:
+        key = sort_key(element)
+        # 相同 key 时插入到已有元素之后，与稳定排序的结果一致
+        while position < len(siblings) and keys[position] <= key:
+            position += 1
+
+        if position < len(siblings):
+            siblings[position].addprevious(element)
+            element.tail = indent
+        else:
+            if last is None:
+                parent.append(element)
+            else:
+                last.addnext(element)
+                last.tail = indent
+            element.tail = last_indent
+            last = element
+
+
+def _resort(parent, children, sort_key, indent, last_indent):
+    """整体重新排序，并重写所有参与排序的子元素的 tail"""
+    for child in children:
+        if child.getparent() is parent:
+            parent.remove(child)
+
+    children.sort(key=sort_key)
+    for i, child in enumerate(children):
+        child.tail = indent if i < len(children) - 1 else last_indent
+        parent.append(child)
@@ -0,0 +1,66 @@
+encoding = 'utf-8'
+import os
+import pickle
+from workspace import atomic_write, file_stamp
+
+PARSE_CACHE_DIR = '.parse-cache'
+PARSE_CACHE_VERSION = 1
+
+
+class ParseCache:
+    """只读场景下的解析结果缓存：按文件路径、mtime 和大小保存从 XML 中提取出的紧凑数据
+
+    缓存的不是 XML 树本身（lxml 解析比反序列化再重建树更快），而是各调用方从树中提取的
+    结果，如 key 定义列表、引用列表。每个调用方使用自己的 name，保存为一个 pickle 文件。
+    depends 中的文件（如 DITAVAL）变化时整个缓存失效。
+    """
+
+    def __init__(self, cache_dir, name, depends=()):
+        self.path = os.path.join(cache_dir, f'{name}.pickle')
+        self._depends = {os.path.abspath(path): file_stamp(path) for path in depends}
+        self._entries = {}
+        self._modified = False
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') == PARSE_CACHE_VERSION and data.get('depends') == self._depends:
+                self._entries = data['entries']
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # 缓存不存在、损坏，或引用了已改名的类或模块时视为空缓存
+            self._entries = {}
+
+    def get(self, path):
+        """文件未变化时返回缓存的数据，否则返回 None"""
+        entry = self._entries.get(os.path.abspath(path))
+        if entry is not None and entry[0] == file_stamp(path):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, path, data):
+        self._entries[os.path.abspath(path)] = (file_stamp(path), data)
+        self._modified = True
+
+    def load(self, path, extract):
+        """返回 extract(path) 的结果，文件未变化时直接使用缓存"""
+        data = self.get(path)
+        if data is None:
+            data = extract(path)
+            self.put(path, data)
+        return data
+
+    def save(self):
+        """有新内容时写回缓存，已删除的文件同时移出缓存"""
+        if not self._modified:
+            return False
+        entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {'version': PARSE_CACHE_VERSION, 'depends': self._depends, 'entries': entries}
+        atomic_write(self.path, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        self._modified = False
+        return True
+
@@ -0,0 +1,62 @@
+encoding = 'utf-8'
+
+
+class Platform:
+    """一个平台在变更数据、根 map、keysmap 和 props 中使用的名称"""
+
+    __slots__ = ('name', 'bit', 'ditamap', 'keysmap', 'platform1', 'platform2', 'platform3')
+
+    def __init__(self, name, bit, ditamap, keysmap, platform1, platform2, platform3):
+        self.name = name
+        self.bit = bit
+        self.ditamap = ditamap
+        self.keysmap = keysmap
+        self.platform1 = platform1
+        self.platform2 = platform2
+        self.platform3 = platform3
+
+    def config(self):
+        """旧的 platform_configs 字典格式"""
+        return {'platform': self.name, 'platform1': self.platform1,
+                'platform2': self.platform2, 'platform3': self.platform3}
+
+
+# (变更数据中的平台名, 根 map, keysmap 平台名, platform1, platform2, platform3)
+# platform1-3 为 None 的平台不生成 topic 内容和 props；platforms 为 "all" 时按此顺序生成 props
+PLATFORM_TABLE = [
+    ('android', 'RTC_NG_API_Android.ditamap', 'java', 'java', 'Android', 'android'),
+    ('ios', 'RTC_NG_API_iOS.ditamap', 'ios', 'ios', 'iOS', 'ios'),
+    ('macos', 'RTC_NG_API_macOS.ditamap', 'macos', 'macos', 'macOS', 'mac'),
+    ('windows', 'RTC_NG_API_CPP.ditamap', 'cpp', 'cpp', 'CPP', 'cpp'),
+    ('flutter', 'RTC_NG_API_Flutter.ditamap', 'flutter', 'flutter', 'Flutter', 'flutter'),
+    ('unity', 'RTC_NG_API_Unity.ditamap', 'unity', 'unity', 'Unity', 'unity'),
+    ('electron', 'RTC_NG_API_Electron.ditamap', 'electron', 'electron', 'Electron', 'electron'),
+    ('rn', 'RTC_NG_API_RN.ditamap', 'rn', 'rn', 'RN', 'rn'),
+    ('unreal', 'RTC_NG_API_Unreal.ditamap', 'unreal', None, None, None),
+    ('cs', 'RTC_NG_API_CS.ditamap', 'cs', None, None, None),
+]
+
+PLATFORMS = [Platform(name, 1 << index, *names) for index, (name, *names) in enumerate(PLATFORM_TABLE)]
+PLATFORMS_BY_NAME = {platform.name: platform for platform in PLATFORMS}
+ALL_PLATFORMS = (1 << len(PLATFORMS)) - 1
+
+# 生成 topic 内容时使用的平台配置
+PLATFORM_CONFIGS = [platform.config() for platform in PLATFORMS if platform.platform1 is not None]
+
+
+def platform_mask(platforms):
+    """变更记录中 platforms 列表对应的位掩码，包含 "all" 时为所有平台"""
+    if 'all' in platforms:
+        return ALL_PLATFORMS
+    mask = 0
+    for name in platforms:
+        platform = PLATFORMS_BY_NAME.get(name)
+        if platform is not None:
+            mask |= platform.bit
+    return mask
+
+
+def keysmap_name(name):
+    """变更数据中的平台名对应的 keysmap 平台名，未知平台原样返回"""
+    platform = PLATFORMS_BY_NAME.get(name)
+    return platform.keysmap if platform is not None else name
@@ -0,0 +1,20 @@
+encoding = 'utf-8'
+import importlib.util
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
+
+
+@pytest.fixture
+def aio(tmp_path):
+    """以独立模块加载 all-in-one.py，base_dir 指向临时目录"""
+    spec = importlib.util.spec_from_file_location('all_in_one', os.path.join(SCRIPT_DIR, 'all-in-one.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.base_dir = str(tmp_path / 'dita')
+    return module
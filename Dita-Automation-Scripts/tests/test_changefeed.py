@@ -0,0 +1,54 @@
+encoding = 'utf-8'
+import json
+
+from changefeed import ChangeFeed, ChangeSet
+from platforms import PLATFORMS
+
+
+def write_feed(path, keys):
+    path.write_text(json.dumps({'api_changes': [{'key': key, 'change_type': 'modify', 'platforms': ['ios']}
+                                                for key in keys]}), encoding='utf-8')
+
+
+def test_change_set_reads_snapshot_after_feed_changes(tmp_path):
+    feed_path = tmp_path / 'data.json'
+    write_feed(feed_path, ['first', 'second'])
+    changes = ChangeSet(ChangeFeed(str(feed_path)))
+    write_feed(feed_path, ['edited'])
+
+    assert [record['key'] for record in changes.get('api_changes')] == ['first', 'second']
+    assert [record['key'] for _, record in changes] == ['first', 'second']
+    assert [record.data['key'] for record in changes.records('api_changes')] == ['first', 'second']
+
+
+def test_manifest_records_the_applied_snapshot(aio, tmp_path, monkeypatch):
+    feed_path = tmp_path / 'data.json'
+    write_feed(feed_path, ['applied'])
+
+    def apply_changes(*args):
+        # 运行期间变更数据被修改，修改留给下一次运行
+        write_feed(feed_path, ['edited'])
+
+    monkeypatch.setattr(aio, 'apply_changes', apply_changes)
+    monkeypatch.setattr('sys.argv', ['all-in-one.py', '--feed', str(feed_path), '--incremental'])
+    aio.main()
+
+    with open(tmp_path / 'dita' / aio.MANIFEST_NAME, encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert [entry['key'] for entry in manifest['records'].values()] == ['applied']
+
+
+def test_platform_view_filters_snapshot_by_mask(tmp_path):
+    feed_path = tmp_path / 'data.jsonl'
+    feed_path.write_text('\n'.join(json.dumps(entry) for entry in [
+        {'enum_changes': {'key': 'everywhere', 'platforms': ['all']}},
+        {'api_changes': {'key': 'ios_only', 'platforms': ['ios']}},
+        {'api_changes': {'key': 'android_only', 'platforms': ['android']}},
+    ]), encoding='utf-8')
+    changes = ChangeSet(ChangeFeed(str(feed_path)))
+    ios = next(platform for platform in PLATFORMS if platform.name == 'ios')
+
+    view = changes.for_platform(ios)
+    assert [record['key'] for record in view] == ['ios_only', 'everywhere']
+    assert len(view) == 2
+    assert len(changes) == 3
@@ -0,0 +1,67 @@
+encoding = 'utf-8'
+from lxml import etree
+
+from ditaval import ProfileSet, scan_topics
+
+
+def keep(rules, xml):
+    return ProfileSet([('profile', rules)]).keep_mask(etree.fromstring(xml))
+
+
+def test_value_rule_wins_over_attribute_and_global_default():
+    rules = [('exclude', None, None), ('exclude', 'props', None), ('include', 'props', 'ios')]
+    assert keep(rules, '<p props="ios"/>') == 1
+    assert keep(rules, '<p props="android"/>') == 0
+
+
+def test_attribute_default_wins_over_global_default():
+    rules = [('exclude', None, None), ('include', 'props', None)]
+    assert keep(rules, '<p props="anything"/>') == 1
+    assert keep([('include', None, None), ('exclude', 'props', None)], '<p props="anything"/>') == 0
+
+
+def test_global_default_applies_to_attributes_no_ditaval_names():
+    rules = [('exclude', None, None), ('include', 'props', 'ios')]
+    assert keep(rules, '<p audience="admin"/>') == 0
+    assert keep(rules, '<p/>') == 1
+    # 其他 profile 没有全局排除时不受影响
+    profiles = ProfileSet([('strict', rules), ('open', [('include', 'props', 'ios')])])
+    assert profiles.keep_mask(etree.fromstring('<p audience="admin"/>')) == 0b10
+
+
+def test_map_level_exclusion_drops_topic(tmp_path):
+    files = {
+        'config/filter-ios-rtc-ng.ditaval': '<val><prop action="exclude" att="props" val="android"/></val>',
+        'config/filter-android-rtc-ng.ditaval': '<val><prop action="exclude" att="props" val="ios"/></val>',
+        'config/keys-ios.ditamap': '''<map>
+            <keydef keys="Config" href="../API/class_config_android.dita" props="android"/>
+            <keydef keys="Config" href="../API/class_config.dita"/>
+        </map>''',
+        'RTC_NG_API_iOS.ditamap': '''<map>
+            <topicref href="config/keys-ios.ditamap" format="ditamap"/>
+            <topicref href="API/shared.dita"/>
+            <topicref href="API/android_only.dita" props="android"/>
+        </map>''',
+        'RTC_NG_API_Android.ditamap': '''<map>
+            <topicref href="API/shared.dita"/>
+            <topicref href="API/android_only.dita" props="android"/>
+        </map>''',
+    }
+    for name in ['shared', 'android_only', 'class_config', 'class_config_android', 'unreferenced']:
+        files[f'API/{name}.dita'] = f'<reference id="{name}"><title>{name}</title></reference>'
+    for name, content in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(content, encoding='utf-8')
+    profiles = ProfileSet.load(str(tmp_path / 'config'))
+
+    results = scan_topics(profiles, str(tmp_path / 'API'), str(tmp_path))
+    included = {file_name: profiles.names_of(mask) for file_name, (mask, _) in results.items()}
+    assert included == {
+        'android_only.dita': ['android'],
+        'class_config.dita': ['ios'],
+        'class_config_android.dita': [],
+        'shared.dita': ['android', 'ios'],
+        'unreferenced.dita': [],
+    }
+    # 只看 topic 本身时所有 topic 都被保留
+    assert all(mask == profiles.all_mask for mask, _ in scan_topics(profiles, str(tmp_path / 'API')).values())
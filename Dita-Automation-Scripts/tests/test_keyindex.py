@@ -0,0 +1,24 @@
+encoding = 'utf-8'
+from keyindex import KeyIndex
+
+KEYSMAP = '''<map>
+    <topichead navtitle="Core">
+        <keydef keys="joinChannel" href="../API/api_joinchannel.dita" props="ios"/>
+    </topichead>
+</map>
+'''
+
+
+def test_rebuild_reads_unchanged_keys_maps_from_parse_cache(tmp_path):
+    config_dir = tmp_path / 'config'
+    config_dir.mkdir()
+    (config_dir / 'keys-rtc-ng-api-ios.ditamap').write_text(KEYSMAP, encoding='utf-8')
+    cache_dir = str(tmp_path / 'cache')
+
+    with KeyIndex(str(tmp_path / 'index.sqlite'), str(config_dir), cache_dir=cache_dir) as index:
+        assert index.refresh() == ['keys-rtc-ng-api-ios.ditamap']
+        assert index._cache.misses == 1
+    with KeyIndex(str(tmp_path / 'index.sqlite'), str(config_dir), cache_dir=cache_dir) as index:
+        assert index.rebuild() == ['keys-rtc-ng-api-ios.ditamap']
+        assert (index._cache.hits, index._cache.misses) == (1, 0)
+        assert index.lookup('joinChannel', 'ios')[0]['navtitle'] == 'Core'
@@ -0,0 +1,48 @@
+encoding = 'utf-8'
+from lxml import etree
+from workspace import DitaWorkspace
+
+KEYSMAP = '''<?xml version="1.0" encoding="UTF-8"?>
+<map id="keys">
+    <topichead navtitle="Enums">
+        <keydef keys="existingEnum" href="../API/enum_existingenum.dita"/>
+    </topichead>
+</map>
+'''
+
+ENUM_RECORD = {
+    'key': 'BENCH_ENUM', 'change_type': 'create', 'attributes': 'enum', 'navtitle': 'Enums',
+    'keyword': {'ios': 'BenchEnum'}, 'platforms': ['ios'],
+    'description': {'enumerations': {'ios': [{'alias': 'BenchEnumA', 'value': '0', 'desc': 'a', 'change_type': 'create'},
+                                             {'alias': 'BenchEnumB', 'value': '1', 'desc': 'b', 'change_type': 'create'}]}},
+}
+
+
+def keys_in(tree):
+    return [keydef.get('keys') for keydef in tree.iter('keydef')]
+
+
+def test_enum_record_applied_twice_leaves_keysmap_unchanged(aio, tmp_path):
+    keysmap_file = tmp_path / 'keys-rtc-ng-api-ios.ditamap'
+    keysmap_file.write_text(KEYSMAP, encoding='utf-8')
+    workspace = DitaWorkspace(dry_run=True)
+
+    aio.process_keysmap(str(keysmap_file), 'ios', [ENUM_RECORD], workspace)
+    tree = workspace.load(str(keysmap_file))
+    assert keys_in(tree) == ['existingEnum', 'BenchEnum', 'BenchEnumA', 'BenchEnumB']
+    first = etree.tostring(tree)
+    workspace.flush()
+
+    success_messages, _ = aio.process_keysmap(str(keysmap_file), 'ios', [ENUM_RECORD], workspace)
+    assert etree.tostring(workspace.load(str(keysmap_file))) == first
+    assert not workspace.is_dirty(str(keysmap_file))
+    assert success_messages[-1].startswith('No changes made')
+
+
+def test_enum_record_adds_only_missing_aliases(aio, tmp_path):
+    keysmap_file = tmp_path / 'keys-rtc-ng-api-ios.ditamap'
+    keysmap_file.write_text(KEYSMAP.replace('existingEnum', 'BenchEnumA'), encoding='utf-8')
+    workspace = DitaWorkspace(dry_run=True)
+
+    aio.process_keysmap(str(keysmap_file), 'ios', [ENUM_RECORD], workspace)
+    assert keys_in(workspace.load(str(keysmap_file))) == ['BenchEnumA', 'BenchEnum', 'BenchEnumB']
@@ -0,0 +1,41 @@
+encoding = 'utf-8'
+import pytest
+from lxml import etree
+
+from topictemplates import REMOVE, TemplateNotSupported, compile_template, fill_tree
+
+
+def select_ph(root):
+    return {'id': (root, 'id')}, {'ph': root.find('.//ph')}
+
+
+def compile_from(tmp_path, xml):
+    path = tmp_path / 'Template.dita'
+    path.write_text(xml, encoding='utf-8')
+    return str(path)
+
+
+def test_compiled_output_matches_tree(tmp_path):
+    path = compile_from(tmp_path, '<reference id="r">\n    <shortdesc>Text <ph>x</ph> tail</shortdesc>\n</reference>\n')
+    compiled = compile_template(path, select_ph)
+    tree = etree.parse(path)
+    fill_tree(*select_ph(tree.getroot()), {'id': 'a&b', 'ph': 'c<d'})
+    assert compiled.render({'id': 'a&b', 'ph': 'c<d'}) == etree.tostring(
+        tree, encoding='UTF-8', xml_declaration=True, pretty_print=True)
+
+
+def test_template_whose_compiled_output_differs_is_rejected(tmp_path):
+    # 没有缩进的模板：插槽标记让 shortdesc 变成混合内容，lxml 不再为它缩进，与模板树的输出不一致
+    path = compile_from(tmp_path, '<reference id="r"><shortdesc><ph>x</ph></shortdesc></reference>')
+    with pytest.raises(TemplateNotSupported):
+        compile_template(path, select_ph)
+    # 结果同样缓存
+    with pytest.raises(TemplateNotSupported):
+        compile_template(path, select_ph)
+
+
+def test_removing_every_child_of_an_empty_parent_falls_back(tmp_path):
+    path = compile_from(tmp_path, '<reference id="r">\n    <shortdesc><ph>x</ph></shortdesc>\n</reference>\n')
+    compiled = compile_template(path, select_ph)
+    with pytest.raises(TemplateNotSupported):
+        compiled.render({'ph': REMOVE})
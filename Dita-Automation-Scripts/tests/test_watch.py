@@ -0,0 +1,60 @@
+encoding = 'utf-8'
+import collections
+import json
+import os
+import re
+import shutil
+
+import bench
+from conftest import SCRIPT_DIR
+
+
+class ScriptedWatcher:
+    """按顺序执行每一步（模拟外部修改），返回变化的文件；步骤用完后像 Ctrl+C 一样退出"""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def wait(self):
+        if not self.steps:
+            raise KeyboardInterrupt
+        return self.steps.pop(0)()
+
+    def close(self):
+        pass
+
+
+def duplicated_keys(config_dir):
+    duplicates = {}
+    for name in sorted(os.listdir(config_dir)):
+        if name.startswith('keys-rtc-ng-api'):
+            with open(os.path.join(config_dir, name), encoding='utf-8') as f:
+                counts = collections.Counter(re.findall(r'<keydef keys="([^"]+)"', f.read()))
+            repeated = sorted(key for key, count in counts.items() if count > 1)
+            if repeated:
+                duplicates[name] = repeated
+    return duplicates
+
+
+def test_watch_reapplying_enum_records_does_not_duplicate_keydefs(aio, tmp_path, monkeypatch):
+    dita_dir = tmp_path / 'dita'
+    shutil.copytree(os.path.join(SCRIPT_DIR, 'dita'), dita_dir)
+    config_dir = dita_dir / 'RTC-NG' / 'config'
+    feed_path = tmp_path / 'data.json'
+    feed = bench.generate_feed(str(dita_dir), 30)
+    assert feed['enum_changes']
+    feed_path.write_text(json.dumps(feed, ensure_ascii=False), encoding='utf-8')
+    before = duplicated_keys(config_dir)
+
+    def touch_keysmap_and_feed():
+        # 外部修改 keysmap 后，涉及它的枚举记录在下一次修改变更数据时重新应用
+        with open(config_dir / 'keys-rtc-ng-api-ios.ditamap', 'a', encoding='utf-8') as f:
+            f.write('<!-- edited -->\n')
+        feed_path.write_text(json.dumps(feed, ensure_ascii=False, indent=1), encoding='utf-8')
+        return {str(feed_path)}
+
+    monkeypatch.setattr(aio, 'make_watcher', lambda paths: ScriptedWatcher([touch_keysmap_and_feed]))
+    monkeypatch.setattr('sys.argv', ['all-in-one.py', '--feed', str(feed_path), '--watch'])
+    aio.main()
+
+    assert duplicated_keys(config_dir) == before
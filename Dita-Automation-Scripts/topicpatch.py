@@ -0,0 +1,180 @@
+encoding = 'utf-8'
+from lxml import etree
+import re
+from xml.sax.saxutils import unescape
+from instrument import recorder
+from workspace import DitaWorkspace
+
+# 标签扫描：注释、CDATA、处理指令、DOCTYPE、结束标签、开始标签
+_TOKEN = re.compile(
+    r'<!--.*?-->'
+    r'|<!\[CDATA\[.*?\]\]>'
+    r'|<\?.*?\?>'
+    r'|<!(?:[^\[>]|\[[^\]]*\])*>'
+    r'|</(?P<close>[^\s>]+)\s*>'
+    r'|<(?P<open>[^\s/>!?]+)(?P<attrs>(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(?P<empty>/?)>',
+    re.DOTALL)
+_ID_ATTR = re.compile(r'\sid\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_ATTR = re.compile(r'([^\s=/>]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+class ElementSpan:
+    """元素在原始文本中的位置：start/end 为整个元素，close_start 为结束标签的起点"""
+
+    __slots__ = ('tag', 'id', 'start', 'open_end', 'close_start', 'end', 'children')
+
+    def __init__(self, tag, element_id, start, open_end):
+        self.tag = tag
+        self.id = element_id
+        self.start = start
+        self.open_end = open_end
+        self.close_start = None
+        self.end = None
+        self.children = []
+
+    @property
+    def empty(self):
+        """自闭合元素，如 <parml/>"""
+        return self.close_start is None
+
+
+def scan_elements(text):
+    """扫描一遍文本，返回根元素的 ElementSpan 树"""
+    root = None
+    stack = []
+    for match in _TOKEN.finditer(text):
+        if match.group('close'):
+            span = stack.pop()
+            if span.tag != match.group('close'):
+                raise ValueError(f"结束标签 </{match.group('close')}> 与 <{span.tag}> 不匹配（位置 {match.start()}）")
+            span.close_start = match.start()
+            span.end = match.end()
+        elif match.group('open'):
+            id_match = _ID_ATTR.search(match.group('attrs'))
+            element_id = (id_match.group(1) if id_match.group(1) is not None else id_match.group(2)) if id_match else None
+            span = ElementSpan(match.group('open'), element_id, match.start(), match.end())
+            if stack:
+                stack[-1].children.append(span)
+            elif root is None:
+                root = span
+            if match.group('empty'):
+                span.end = match.end()
+            else:
+                stack.append(span)
+    if stack:
+        raise ValueError(f"元素 <{stack[-1].tag}> 没有结束标签")
+    return root
+
+
+def span_attributes(text, span):
+    """元素开始标签中的属性，如 {'href': 'API/toc_channel.dita'}"""
+    open_tag = text[span.start:span.open_end]
+    attributes = {}
+    for match in _ATTR.finditer(open_tag, len(span.tag) + 1):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        attributes[match.group(1)] = unescape(value, {'&quot;': '"', '&apos;': "'"})
+    return attributes
+
+
+def line_indent(text, position):
+    """position 所在行开头到 position 之间的空白"""
+    line_start = text.rfind('\n', 0, position) + 1
+    prefix = text[line_start:position]
+    return prefix if not prefix.strip() else ''
+
+
+class TopicPatch:
+    """对单个 topic 文件做结构化补丁：文件只读写一次，未修改区域的原始内容保持不变
+
+    section(section_id) 返回对应 section 的片段元素，修改通过 append 追加子元素；
+    save 时只把新元素序列化后插入到各自父元素的结束标签之前。文件通过 workspace 读写，
+    dry-run 时修改只保留在内存中。
+    """
+
+    def __init__(self, path, workspace=None):
+        self.path = path
+        self.workspace = workspace if workspace is not None else DitaWorkspace()
+        self.text = self.workspace.read(path).decode('utf-8')
+        recorder.parsed(path)
+        self._sections = {}
+        self._collect_sections(scan_elements(self.text))
+        self._fragments = {}
+        self._spans = {}
+        self._appended = []
+
+    def _collect_sections(self, span):
+        if span is None:
+            return
+        if span.tag == 'section' and span.id is not None and span.id not in self._sections:
+            self._sections[span.id] = span
+        for child in span.children:
+            self._collect_sections(child)
+
+    def section(self, section_id):
+        """解析并返回指定 id 的 section，找不到时返回 None；同一 section 只解析一次"""
+        if section_id in self._fragments:
+            return self._fragments[section_id]
+
+        span = self._sections.get(section_id)
+        if span is None:
+            return None
+        parser = etree.XMLParser(remove_blank_text=False, resolve_entities=False)
+        fragment = etree.fromstring(self.text[span.start:span.end], parser)
+        self._index(fragment, span)
+        self._fragments[section_id] = fragment
+        return fragment
+
+    def _index(self, element, span):
+        """片段中的元素与扫描得到的位置一一对应"""
+        self._spans[element] = span
+        children = [child for child in element if isinstance(child.tag, str)]
+        for child, child_span in zip(children, span.children):
+            self._index(child, child_span)
+
+    def append(self, parent, tag):
+        """在原有元素 parent 末尾追加子元素并记录，parent 必须来自 section()"""
+        if parent not in self._spans:
+            raise ValueError(f"<{parent.tag}> 不是 {self.path} 中的原有元素")
+        element = etree.SubElement(parent, tag)
+        self._appended.append((parent, element))
+        return element
+
+    @property
+    def inserted(self):
+        """追加的元素数量"""
+        return len(self._appended)
+
+    @property
+    def changed(self):
+        return bool(self._appended)
+
+    def render(self):
+        """返回应用所有修改后的文本"""
+        # 同一父元素的新元素按追加顺序拼接
+        inserts = {}
+        for parent, element in self._appended:
+            inserts.setdefault(parent, []).append(etree.tostring(element, encoding='unicode'))
+
+        edits = []
+        for parent, pieces in inserts.items():
+            span = self._spans[parent]
+            if span.empty:
+                # <parml/> 展开为 <parml>...</parml>
+                open_tag = self.text[span.start:span.end]
+                open_tag = open_tag[:-2].rstrip() + '>'
+                edits.append((span.start, span.end, open_tag + ''.join(pieces) + f'</{span.tag}>'))
+            else:
+                edits.append((span.close_start, span.close_start, ''.join(pieces)))
+
+        # 从后往前替换，前面的位置不受影响
+        text = self.text
+        for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+            text = text[:start] + replacement + text[end:]
+        return text
+
+    def save(self):
+        """有修改时写回文件，返回是否写入"""
+        if not self.changed:
+            return False
+        self.workspace.save(self.path, self.render().encode('utf-8'))
+        return True
@@ -0,0 +1,277 @@
+encoding = 'utf-8'
+from lxml import etree
+import copy
+import os
+import re
+from instrument import recorder
+
+# 已解析的模板，按路径缓存
+_parsed_templates = {}
+
+
+def new_from_template(template_path):
+    """返回模板的一份独立副本，每个模板在一次运行中只解析一次"""
+    path = os.path.normpath(template_path)
+    tree = _parsed_templates.get(path)
+    if tree is None:
+        tree = etree.parse(path)
+        _parsed_templates[path] = tree
+        recorder.parsed(path)
+    return copy.deepcopy(tree)
+
+
+def forget_templates(paths=None):
+    """丢弃已缓存的模板，下次使用时重新解析；paths 为 None 时丢弃全部"""
+    if paths is None:
+        _parsed_templates.clear()
+        _compiled_templates.clear()
+        return
+    for path in paths:
+        path = os.path.normpath(path)
+        _parsed_templates.pop(path, None)
+        for key in [key for key in _compiled_templates if key[0] == path]:
+            del _compiled_templates[key]
+
+
+# 预编译模板中插槽的标记，使用私用区字符，不会与模板内容冲突
+_MARK_OPEN = '\ue000'
+_MARK_CLOSE = '\ue001'
+_MARK = re.compile(f'{_MARK_OPEN}([BEA]):([^{_MARK_CLOSE}]*){_MARK_CLOSE}')
+
+# XML 中不允许出现的字符，lxml 遇到时会报错
+_INVALID_XML_CHARS = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+# 已编译的模板，按 (路径, 插槽选择函数) 缓存
+_compiled_templates = {}
+
+# 元素插槽的取值：删除整个元素（连同 tail）
+REMOVE = object()
+
+
+class TemplateNotSupported(ValueError):
+    """模板的结构无法预编译，调用方应改用逐个解析模板的方式"""
+
+
+class Raw:
+    """元素插槽的取值：已序列化的元素内容，tail 为 None 时保留模板中的 tail"""
+
+    __slots__ = ('inner', 'tail')
+
+    def __init__(self, inner, tail=None):
+        self.inner = inner
+        self.tail = tail
+
+
+class SlotValues(dict):
+    """插槽的取值，与 lxml 设置文本时一样在赋值时检查，不合法的值（包括之后会被覆盖的）立即报错"""
+
+    def __setitem__(self, name, value):
+        if isinstance(value, str):
+            _check_text(value)
+        elif value is not None and value is not REMOVE and not isinstance(value, Raw):
+            raise TypeError(f"不支持的值类型：{type(value).__name__}")
+        super().__setitem__(name, value)
+
+
+def _check_text(value):
+    if not isinstance(value, str):
+        raise TypeError(f"不支持的值类型：{type(value).__name__}")
+    if _INVALID_XML_CHARS.search(value):
+        raise ValueError("包含 XML 中不允许的字符")
+
+
+def escape_text(value):
+    """与 lxml 序列化元素文本时的转义一致"""
+    _check_text(value)
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\r', '&#13;')
+
+
+def escape_attribute(value):
+    """与 lxml 序列化属性值时的转义一致"""
+    _check_text(value)
+    return (value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+            .replace('\r', '&#13;').replace('\n', '&#10;').replace('\t', '&#9;'))
+
+
+def _start_tag(element):
+    """元素的开始标签、结束标签和空元素形式，与 lxml 的序列化一致"""
+    shallow = etree.Element(element.tag, element.attrib)
+    empty = etree.tostring(shallow, encoding='unicode')
+    shallow.text = ''
+    full = etree.tostring(shallow, encoding='unicode')
+    close = f'</{element.tag}>'
+    return full[:-len(close)], close, empty
+
+
+class CompiledTemplate:
+    """预先序列化的模板：静态文本和插槽交替排列，生成 topic 时只需填值拼接
+
+    attributes 为 {名称: (元素, 属性名)}，elements 为 {名称: 元素}。属性插槽填入属性值，
+    未填时保留模板中的值；元素插槽覆盖元素本身及其 tail，可以保留原样（不填）、填入文本
+    （替换元素的全部内容，None 为空元素）、填入 Raw 或 REMOVE。输出与
+    etree.tostring(tree, encoding='UTF-8', xml_declaration=True, pretty_print=True) 逐字节一致。
+    """
+
+    def __init__(self, tree, attributes, elements):
+        overlap = {element for element, _ in attributes.values()} & set(elements.values())
+        if overlap:
+            raise TemplateNotSupported("同一个元素不能同时作为属性插槽和元素插槽")
+        if any(element.getparent() is None for element in elements.values()):
+            raise TemplateNotSupported("根元素不能作为元素插槽")
+        self.names = set(attributes) | set(elements)
+        self._attributes = {name: element.get(attribute) for name, (element, attribute) in attributes.items()}
+        # 父元素没有文本、子元素都是元素插槽时，全部删除后 lxml 输出的是空元素标签，字符串模板得不到同样的结果
+        names_by_element = {element: name for name, element in elements.items()}
+        self._emptied_groups = []
+        for parent in {element.getparent() for element in elements.values()}:
+            if not parent.text and all(child in names_by_element for child in parent):
+                self._emptied_groups.append([names_by_element[child] for child in parent])
+
+        self._elements = {}
+        order = {element: index for index, element in enumerate(tree.getroot().iter())}
+        for name, element in sorted(elements.items(), key=lambda item: order[item[1]]):
+            open_tag, close_tag, empty = _start_tag(element)
+            self._elements[name] = (open_tag, close_tag, empty, element.tail or '')
+            # 按文档顺序插入标记，前一个插槽的结束标记总在后一个的开始标记之前
+            previous = element.getprevious()
+            begin = f'{_MARK_OPEN}B:{name}{_MARK_CLOSE}'
+            if previous is not None:
+                previous.tail = (previous.tail or '') + begin
+            else:
+                element.getparent().text = (element.getparent().text or '') + begin
+            element.tail = (element.tail or '') + f'{_MARK_OPEN}E:{name}{_MARK_CLOSE}'
+        for name, (element, attribute) in attributes.items():
+            element.set(attribute, f'{_MARK_OPEN}A:{name}{_MARK_CLOSE}')
+
+        text = etree.tostring(tree, encoding='UTF-8', xml_declaration=True, pretty_print=True).decode('utf-8')
+        if text.count(_MARK_OPEN) != 2 * len(elements) + len(attributes):
+            raise TemplateNotSupported("模板中含有用作插槽标记的私用区字符")
+        self._parts = self._nest(_MARK.split(text))
+
+    @staticmethod
+    def _nest(tokens):
+        """把 split 的结果整理为嵌套列表：字符串、('A', 名称) 或 ('E', 名称, 子列表)"""
+        root = []
+        stack = [root]
+        for index, token in enumerate(tokens):
+            kind = index % 3
+            if kind == 0:
+                if token:
+                    stack[-1].append(token)
+            elif kind == 1:
+                marker = token
+            elif marker == 'A':
+                stack[-1].append(('A', token))
+            elif marker == 'B':
+                children = []
+                stack[-1].append(('E', token, children))
+                stack.append(children)
+            else:
+                stack.pop()
+        return root
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def render(self, values):
+        """按插槽取值生成 topic 的 UTF-8 字节；取值无法用字符串模板生成时抛出 TemplateNotSupported"""
+        for names in self._emptied_groups:
+            if all(values.get(name) is REMOVE for name in names):
+                raise TemplateNotSupported("删除插槽后父元素为空")
+        output = []
+        self._render(self._parts, values, output)
+        return ''.join(output).encode('utf-8')
+
+    def _render(self, parts, values, output):
+        for part in parts:
+            if isinstance(part, str):
+                output.append(part)
+            elif part[0] == 'A':
+                name = part[1]
+                output.append(escape_attribute(values[name] if name in values else self._attributes[name]))
+            else:
+                name = part[1]
+                if name not in values:
+                    self._render(part[2], values, output)
+                    continue
+                value = values[name]
+                if value is REMOVE:
+                    continue
+                open_tag, close_tag, empty, tail = self._elements[name]
+                if isinstance(value, Raw):
+                    output.append(f'{open_tag}{value.inner}{close_tag}')
+                    output.append(tail if value.tail is None else value.tail)
+                elif value is None:
+                    output.append(empty + tail)
+                else:
+                    output.append(f'{open_tag}{escape_text(value)}{close_tag}{tail}')
+
+
+def fill_tree(attributes, elements, values):
+    """按 CompiledTemplate 的规则把插槽取值直接写入模板树，用于校验预编译的结果"""
+    for name, value in values.items():
+        if name in attributes:
+            element, attribute = attributes[name]
+            element.set(attribute, value)
+    for name, value in values.items():
+        if name not in elements:
+            continue
+        element = elements[name]
+        if value is REMOVE:
+            # lxml 删除元素时连同 tail 一起删除
+            element.getparent().remove(element)
+            continue
+        for child in list(element):
+            element.remove(child)
+        element.text = value
+
+
+# 编译后校验时元素插槽和属性插槽填入的文本，包含需要转义的字符
+_CHECK_TEXT = 'check <&> "\' \t\n\r'
+
+
+def _check_compiled(compiled, template_path, select):
+    """分别用字符串模板和模板树生成几组取值（模板原值、需要转义的文本、空元素、逐个删除元素）的 topic，
+    结果不一致时抛出 TemplateNotSupported"""
+    element_names = sorted(compiled._elements)
+    cases = [
+        {},
+        {name: f'{name} {_CHECK_TEXT}' for name in compiled.names},
+        {name: None for name in element_names},
+    ]
+    cases.extend({name: REMOVE} for name in element_names)
+    for values in cases:
+        try:
+            actual = compiled.render(values)
+        except TemplateNotSupported:
+            # render 本身拒绝的取值在运行时同样改用模板树生成
+            continue
+        tree = new_from_template(template_path)
+        fill_tree(*select(tree.getroot()), values)
+        expected = etree.tostring(tree, encoding='UTF-8', xml_declaration=True, pretty_print=True)
+        if actual != expected:
+            raise TemplateNotSupported(f"预编译模板的输出与模板树不一致：{template_path}")
+
+
+def compile_template(template_path, select):
+    """返回模板的 CompiledTemplate，每个模板和插槽选择函数只编译一次
+
+    select(root) 在模板的副本上选出插槽，返回 (attributes, elements)；模板不适合预编译时
+    返回 None，此时本函数同样返回 None。编译后用几组校验值分别按字符串模板和模板树生成，
+    结果不一致时抛出 TemplateNotSupported，调用方改用逐个解析模板的方式；结果同样缓存。
+    """
+    key = (os.path.normpath(template_path), select)
+    if key not in _compiled_templates:
+        tree = new_from_template(template_path)
+        slots = select(tree.getroot())
+        try:
+            compiled = CompiledTemplate(tree, *slots) if slots is not None else None
+            if compiled is not None:
+                _check_compiled(compiled, template_path, select)
+        except TemplateNotSupported as e:
+            compiled = e
+        _compiled_templates[key] = compiled
+    compiled = _compiled_templates[key]
+    if isinstance(compiled, TemplateNotSupported):
+        raise compiled
+    return compiled
@@ -0,0 +1,113 @@
+encoding = 'utf-8'
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from workspace import file_stamp
+
+# inotify 事件：写入完成、移入（编辑器先写临时文件再改名）、新建、删除
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+_EVENT = struct.Struct('iIII')
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 0.5
+# 收到第一个事件后等待文件写完的时间（秒）
+SETTLE_TIME = 0.2
+
+
+class PollingWatcher:
+    """按 mtime 和大小轮询文件变化，适用于所有平台"""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self._stamps = {path: file_stamp(path) for path in self.paths}
+
+    def wait(self):
+        """阻塞直到有文件变化，返回变化的文件路径集合"""
+        while True:
+            time.sleep(self.interval)
+            changed = self._changed()
+            if changed:
+                # 等文件写完再返回，期间的修改一并计入
+                time.sleep(SETTLE_TIME)
+                return changed | self._changed()
+
+    def _changed(self):
+        changed = set()
+        for path in self.paths:
+            stamp = file_stamp(path)
+            if stamp != self._stamps[path]:
+                self._stamps[path] = stamp
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux 下通过 inotify 监视文件所在目录，文件被改名替换时同样能收到事件"""
+
+    def __init__(self, paths):
+        self.paths = {os.path.abspath(path) for path in paths}
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._dirs = {}
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), IN_WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, f'无法监视目录：{directory}')
+            self._dirs[wd] = directory
+
+    def _read(self, timeout):
+        """读取 timeout 秒内的事件，返回其中涉及的被监视文件"""
+        changed = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        data = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            path = os.path.join(self._dirs.get(wd, ''), os.fsdecode(name))
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def wait(self):
+        """阻塞直到有文件变化，返回变化的文件路径集合"""
+        while True:
+            changed = self._read(None)
+            if changed:
+                # 合并短时间内的连续事件，如编辑器保存时的多次写入
+                while True:
+                    more = self._read(SETTLE_TIME)
+                    if not more:
+                        return changed
+                    changed |= more
+
+    def close(self):
+        os.close(self._fd)
+
+
+def make_watcher(paths):
+    """优先使用 inotify，不可用时（非 Linux、达到监视数量上限等）退回轮询"""
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(paths)
@@ -0,0 +1,269 @@
+encoding = 'utf-8'
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor
+import difflib
+import os
+import shutil
+import tempfile
+from instrument import recorder
+
+# 后台写入线程数
+WRITER_THREADS = 4
+
+
+def file_stamp(path):
+    """文件的 (mtime, 大小)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_temp(path, data):
+    """将内容写入目标文件所在目录下的临时文件并落盘，返回临时文件路径"""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # 覆盖已有文件时保留原来的权限
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        else:
+            os.chmod(temp_path, 0o644)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return temp_path
+
+
+def atomic_write(path, data):
+    """先写临时文件再原子替换，中途失败不会留下写了一半的文件"""
+    os.replace(write_temp(path, data), path)
+
+
+def _backup(path):
+    """在同一目录下为原文件保留一份备份，优先使用硬链接"""
+    fd, backup_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f".{os.path.basename(path)}.", suffix='.bak')
+    os.close(fd)
+    os.remove(backup_path)
+    try:
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+    return backup_path
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class DitaWorkspace:
+    """单次运行共享的 DITA 文件会话：每个文件最多解析一次，所有修改在结束时统一写回
+
+    save() 在后台线程中把内容写入临时文件，commit() 是唯一的提交点：等待所有写入完成后
+    逐个原子替换到目标位置，任何一步失败都会恢复全部原文件。dry_run 为 True 时所有写入
+    只保存在内存中，可通过 diffs() 查看将要产生的修改。
+    """
+
+    def __init__(self, dry_run=False, writers=WRITER_THREADS):
+        self.dry_run = dry_run
+        self._trees = {}
+        self._dirty = []
+        self._staged = {}
+        self._writers = writers
+        self._executor = None
+        self._pending = {}
+        # 已缓存文件在磁盘上的 (mtime, 大小)，用于发现被其他程序修改的文件
+        self._stamps = {}
+
+    def load(self, path):
+        """获取文件对应的 ElementTree，首次访问时才解析"""
+        path = os.path.normpath(path)
+        tree = self._trees.get(path)
+        if tree is None:
+            if path in self._staged:
+                tree = etree.fromstring(self._staged[path]).getroottree()
+            else:
+                self._stamps[path] = file_stamp(path)
+                tree = etree.parse(path)
+            self._trees[path] = tree
+            recorder.parsed(path)
+        return tree
+
+    def mark_dirty(self, path):
+        """标记文件已修改，flush 时写回"""
+        path = os.path.normpath(path)
+        if path not in self._trees:
+            raise KeyError(f"文件未通过 workspace 加载：{path}")
+        if path not in self._dirty:
+            self._dirty.append(path)
+
+    def is_dirty(self, path):
+        return os.path.normpath(path) in self._dirty
+
+    def exists(self, path):
+        """文件在磁盘上存在，或本次运行中已被写入"""
+        return os.path.normpath(path) in self._staged or os.path.exists(path)
+
+    def read(self, path):
+        """读取文件内容（bytes），优先返回本次运行中已写入但尚未提交的内容"""
+        staged = self._staged.get(os.path.normpath(path))
+        if staged is not None:
+            return staged
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def save(self, path, data):
+        """写入文件内容（bytes）：交给后台线程写入临时文件，commit 时才替换目标文件"""
+        path = os.path.normpath(path)
+        self._staged[path] = data
+        if self.dry_run:
+            return
+
+        recorder.written(len(data))
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._writers)
+        previous = self._pending.get(path)
+        self._pending[path] = self._executor.submit(write_temp, path, data)
+        # 同一文件重复写入时，之前的临时文件作废
+        if previous is not None:
+            previous.add_done_callback(_discard_future)
+
+    def staged(self):
+        """本次运行中写入的所有文件内容，供子进程交回主进程"""
+        return dict(self._staged)
+
+    def flush(self):
+        """将所有已修改的 map 各序列化一次并交给 save，返回成功和错误信息列表"""
+        success_messages = []
+        error_messages = []
+
+        for path in self._dirty:
+            try:
+                self.save(path, etree.tostring(self._trees[path], encoding='UTF-8', xml_declaration=True))
+                success_messages.append(f"Staged {path}")
+            except Exception as e:
+                error_messages.append(f"Error writing to {path}: {str(e)}")
+
+        self._dirty = []
+        return success_messages, error_messages
+
+    def commit(self):
+        """等待后台写入完成，将所有文件一次性替换到位；失败时恢复全部原文件"""
+        success_messages = []
+        error_messages = []
+        pending, self._pending = self._pending, {}
+
+        temp_paths = {}
+        for path, future in pending.items():
+            try:
+                temp_paths[path] = future.result()
+            except Exception as e:
+                error_messages.append(f"Error writing to {path}: {str(e)}")
+        self._shutdown()
+
+        if error_messages:
+            for temp_path in temp_paths.values():
+                _remove_quietly(temp_path)
+            error_messages.append("写入失败，已回滚，所有文件保持不变")
+            return success_messages, error_messages
+
+        # 逐个替换，已替换的文件记录备份以便回滚
+        replaced = []
+        try:
+            for path, temp_path in temp_paths.items():
+                backup_path = _backup(path) if os.path.exists(path) else None
+                try:
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if backup_path is not None:
+                        _remove_quietly(backup_path)
+                    raise
+                replaced.append((path, backup_path))
+        except Exception as e:
+            error_messages.append(f"Error replacing {path}: {str(e)}")
+            for replaced_path, backup_path in reversed(replaced):
+                if backup_path is None:
+                    _remove_quietly(replaced_path)
+                else:
+                    os.replace(backup_path, replaced_path)
+            for temp_path in temp_paths.values():
+                if os.path.exists(temp_path):
+                    _remove_quietly(temp_path)
+            error_messages.append("替换失败，已回滚，所有文件保持不变")
+            return success_messages, error_messages
+
+        # 已提交的内容不再保留在内存中，之后按需从磁盘读取（--watch 会长期复用同一个 workspace）
+        for path, backup_path in replaced:
+            if backup_path is not None:
+                _remove_quietly(backup_path)
+            self._staged.pop(path, None)
+            self._stamps[path] = file_stamp(path)
+            success_messages.append(f"Wrote {path}")
+        return success_messages, error_messages
+
+    def discard_changed(self):
+        """丢弃磁盘上已被其他程序修改的文件的缓存，下次访问时重新读取，返回这些文件
+
+        用于在多次提交之间复用同一个 workspace（如 --watch）。
+        """
+        changed = [path for path, stamp in self._stamps.items() if file_stamp(path) != stamp]
+        for path in changed:
+            self._trees.pop(path, None)
+            self._staged.pop(path, None)
+            del self._stamps[path]
+        return changed
+
+    def rollback(self):
+        """放弃所有尚未提交的写入，目标文件保持不变；内存中已修改的树一并丢弃"""
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            _discard_future(future)
+        self._shutdown()
+        self._trees = {}
+        self._dirty = []
+        self._staged = {}
+        self._stamps = {}
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def diffs(self, root):
+        """逐个返回 dry-run 中各文件相对磁盘内容的 unified diff，路径相对 root 显示"""
+        for path in sorted(self._staged):
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    before = f.read().decode('utf-8').splitlines(keepends=True)
+                from_file = f"a/{name}"
+            else:
+                before = []
+                from_file = '/dev/null'
+            after = self._staged[path].decode('utf-8').splitlines(keepends=True)
+            lines = []
+            for line in difflib.unified_diff(before, after, from_file, f"b/{name}"):
+                # 与 git diff 一致，标出缺少结尾换行的行，保证 diff 可以直接 apply
+                if not line.endswith('\n'):
+                    line += '\n\\ No newline at end of file\n'
+                lines.append(line)
+            if lines:
+                yield ''.join(lines)
+
+
+def _discard_future(future):
+    """删除已作废的后台写入产生的临时文件"""
+    try:
+        temp_path = future.result()
+    except Exception:
+        return
+    _remove_quietly(temp_path)